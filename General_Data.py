@@ -1,13 +1,19 @@
 import streamlit as st
-from sched14a import get_sched14a_df
-from extractdata import extract_lite_data_gpt
+from sched14a import fetch_sched14a_df
+from companyindex import normalize_ticker
+from extractdata import extract_lite_data_batch
+from diagnostics import show_diagnostics
 from datetime import datetime
 import pandas as pd
+import time
 
 api_key = "APIKEY"
+
 col_names = {'file': 'File', 'ticker': 'Ticker', 'title': 'Company Name', 'filingDate': 'Filing Date', 'form': 'Form', 'primaryDocDescription': 'Document Description', 'cik': 'CIK', 'accessionNumber': 'Accession Number', 'fileNumber': 'File Number', 'filmNumber': 'Film Number', 'reportDate': 'Report Date'}
 
 def main():
+    show_diagnostics()
+
     if "email" not in st.session_state:
         st.session_state.email = ""
 
@@ -40,11 +46,22 @@ def main():
             only_links = st.checkbox('Only Show Links in a Dataframe', value=False, key='only_links')
         st.markdown("<p style='font-size: small;'><em>Note that if you check both boxes, only the Links dataframe will show up. Disable the second checkbox to get more data.</em></p>", unsafe_allow_html=True)
 
-        if st.button("Get Schedule 14A Links") or tickers_input:
+        # Only the button starts a query; toggling a checkbox reruns the script but reuses the submitted one
+        submitted = st.button("Get Schedule 14A Links")
+        if submitted:
+            st.session_state.query = (tickers_input, start_year, end_year)
+
+        if "query" in st.session_state:
+            tickers_input, start_year, end_year = st.session_state.query
             if tickers_input:
-                tickers = [ticker.strip() for ticker in tickers_input.split(",")]
+                # Normalized like fetch_sched14a_df's jobs and Ticker column, so BRK.B matches its rows and pending entry
+                tickers = list(dict.fromkeys(normalize_ticker(ticker) for ticker in tickers_input.split(",") if ticker.strip()))
                 email = st.session_state.email
-                df = get_sched14a_df(tickers, start_year, end_year, email)
+                df, pending, errors = fetch_sched14a_df(tickers, start_year, end_year, email)
+                if pending:
+                    st.info(f"Still loading {', '.join(pending)}; the tables below fill in as each ticker arrives.")
+                for ticker, error in errors.items():
+                    st.warning(f"Failed to retrieve filings for {ticker}: {error}")
                 df.drop(columns=['filmNumber'], inplace=True)
 
                 df.rename(columns={'doc_url': 'file'}, inplace=True)
@@ -65,10 +82,15 @@ def main():
                     df['Total Compensation'] = 'NA'
                     df['Metrics'] = 'NA'
 
-                    df['Notes'] = df['File'].apply(lambda x: extract_lite_data_gpt(x, api_key=api_key, return_json=True, headers={'User-Agent': st.session_state.email}))
+                    df['Notes'] = 'NA'
 
-                    for idx, row in df.iterrows():
-                        data = extract_lite_data_gpt(row['File'], api_key=api_key, return_json=True, headers={'User-Agent': st.session_state.email})
+                    # One concurrent pass over all filings; each distinct file is only sent to the API once
+                    results = extract_lite_data_batch(df['File'].tolist(), api_key=api_key, headers={'User-Agent': st.session_state.email}, return_json=True)
+
+                    for idx, data in zip(df.index, results):
+                        if not isinstance(data, dict):
+                            df.at[idx, 'Notes'] = str(data)
+                            continue
                         lines = []
                         for key, value in data.items():
                             if isinstance(value, list):
@@ -114,7 +136,7 @@ def main():
 
                 else:
                     if separate_dfs == True:
-                        for company in tickers:
+                        for company in [ticker for ticker in tickers if ticker not in pending]:
                             company_df = df[df['Ticker'] == company]
                             st.write(f"DataFrame for {company}:")
                             st.data_editor(
@@ -175,6 +197,10 @@ def main():
                             alerts_text = "<br>".join(alerts)
                             st.markdown(f"""<span style='color:red;'><i>Alert: The following companies have more than one file per year: <br>{alerts_text}</i></span>""", unsafe_allow_html=True)
 
+                if pending:
+                    time.sleep(0.5)
+                    st.rerun()
+
             else:
                 st.error("Please enter at least one ticker.")
 
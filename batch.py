@@ -0,0 +1,250 @@
+import os
+import sys
+import json
+import time
+import argparse
+import datetime
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from sched14a import get_sched14a_df, iter_extract_text
+from companyindex import normalize_ticker
+from fullindex import resolve_document_url
+from extractdata import extract_lite_data_batch, extract_full_data_gpt
+
+class JsonlWriter:
+    '''
+    Appends records to one JSON-lines file. position() is the file size, so a checkpoint can record
+    it and truncate() drops whatever a crashed run wrote after its last checkpoint.
+    '''
+    def __init__(self, path):
+        self.path = f'{path}.jsonl'
+        self.file = open(self.path, 'ab')
+
+    def write(self, records):
+        for record in records:
+            self.file.write(json.dumps(record, default=str).encode('utf-8') + b'\n')
+        self.file.flush()
+
+    def position(self):
+        return self.file.tell()
+
+    def truncate(self, position):
+        self.file.truncate(position)
+        self.file.seek(position)
+
+class ParquetWriter:
+    '''
+    Writes each batch of records as its own part file in a directory, since Parquet files can't be appended to.
+    position() is the number of parts.
+    '''
+    def __init__(self, path):
+        self.directory = path
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _parts(self):
+        return sorted(name for name in os.listdir(self.directory) if name.startswith('part-') and name.endswith('.parquet'))
+
+    def write(self, records):
+        if records:
+            pd.DataFrame(records).to_parquet(os.path.join(self.directory, f'part-{len(self._parts()):05d}.parquet'), index=False)
+
+    def position(self):
+        return len(self._parts())
+
+    def truncate(self, position):
+        for name in self._parts()[position:]:
+            os.remove(os.path.join(self.directory, name))
+
+class Checkpoint:
+    '''
+    Progress of a run, saved atomically to checkpoint.json in the output directory after every batch
+    together with the position of each output, so a resumed run can cut off any rows written after it.
+    '''
+    def __init__(self, directory, settings):
+        self.path = os.path.join(directory, 'checkpoint.json')
+        self.data = {'settings': settings, 'done': {}, 'positions': {}}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                data = json.load(f)
+            if data['settings'] != settings:
+                raise SystemExit(f'{self.path} was written with different settings {data["settings"]}; use a new output directory')
+            self.data = data
+
+    def done(self, stage):
+        return set(self.data['done'].get(stage, []))
+
+    def restore(self, writers):
+        for name, writer in writers.items():
+            writer.truncate(self.data['positions'].get(name, 0))
+
+    def save(self, stage, keys, writers):
+        self.data['done'].setdefault(stage, []).extend(keys)
+        self.data['positions'] = {name: writer.position() for name, writer in writers.items()}
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.data, f)
+        os.replace(tmp_path, self.path)
+
+class Progress:
+    '''
+    Prints a single live status line with the throughput of the current stage.
+    '''
+    def __init__(self, stage, total, unit):
+        self.stage = stage
+        self.total = total
+        self.unit = unit
+        self.count = 0
+        self.filings = 0
+        self.start = time.monotonic()
+
+    def update(self, count=0, filings=0):
+        self.count += count
+        self.filings += filings
+        minutes = max(time.monotonic() - self.start, 1e-9) / 60
+        sys.stderr.write(f'\r[{self.stage}] {self.count}/{self.total} {self.unit}, {self.filings} filings, {self.filings / minutes:,.1f} filings/min   ')
+        sys.stderr.flush()
+
+    def close(self):
+        sys.stderr.write('\n')
+
+def read_tickers(path):
+    '''
+    One ticker per line (commas also separate); blank lines and lines starting with # are skipped. Tickers are
+    normalized like get_sched14a_df's errors, so a failed BRK.B is left out of the checkpoint as BRK-B.
+    '''
+    tickers = []
+    with open(path) as f:
+        for line in f:
+            line = line.split('#', 1)[0]
+            tickers.extend(normalize_ticker(ticker) for ticker in line.split(',') if ticker.strip())
+    return list(dict.fromkeys(tickers))
+
+def _records(df):
+    df = df.astype(object).where(df.notna(), None)
+    return [{column: value.isoformat() if isinstance(value, (datetime.date, pd.Timestamp)) else value for column, value in row.items()}
+            for row in df.to_dict('records')]
+
+def _read_filings(writer):
+    if isinstance(writer, JsonlWriter):
+        with open(writer.path) as f:
+            return pd.DataFrame([json.loads(line) for line in f if line.strip()])
+    parts = [pd.read_parquet(os.path.join(writer.directory, name)) for name in writer._parts()]
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+
+def run(args):
+    os.makedirs(args.output, exist_ok=True)
+    writer_class = ParquetWriter if args.format == 'parquet' else JsonlWriter
+    writers = {name: writer_class(os.path.join(args.output, name)) for name in ('filings', 'texts', 'gpt')}
+    settings = {'start_year': args.start_year, 'end_year': args.end_year, 'source': args.source, 'format': args.format, 'gpt': args.gpt}
+    checkpoint = Checkpoint(args.output, settings)
+    checkpoint.restore(writers)
+
+    # Stage 1: filing metadata, a batch of tickers at a time
+    tickers = read_tickers(args.tickers)
+    done = checkpoint.done('filings')
+    remaining = [ticker for ticker in tickers if ticker not in done]
+    progress = Progress('filings', len(tickers), 'tickers')
+    progress.update(len(tickers) - len(remaining))
+    for start in range(0, len(remaining), args.batch_size):
+        batch = remaining[start:start + args.batch_size]
+        df = get_sched14a_df(batch, args.start_year, args.end_year, args.email, max_workers=args.workers, source=args.source)
+        writers['filings'].write(_records(df))
+        # Tickers that failed for a transient reason are left out of the checkpoint so the next run retries them
+        failed = {ticker for ticker, error in df.attrs.get('errors', {}).items() if error != 'Ticker not found'}
+        checkpoint.save('filings', [ticker for ticker in batch if ticker not in failed], writers)
+        progress.update(len(batch), len(df))
+    progress.close()
+
+    if not args.text and not args.gpt:
+        return
+    filings = _read_filings(writers['filings'])
+    if filings.empty:
+        return
+    filings = filings.drop_duplicates('accessionNumber')
+
+    # Stage 2: document text, streamed from the download/parse pipeline
+    if args.text:
+        done = checkpoint.done('texts')
+        todo = filings[~filings['accessionNumber'].isin(done)]
+        progress = Progress('texts', len(filings), 'filings')
+        progress.update(len(filings) - len(todo))
+        tickers_by_accession = dict(zip(filings['accessionNumber'], filings['ticker']))
+        pending, last_save = [], time.monotonic()
+        for accession, data in iter_extract_text(todo, args.email, download_workers=args.workers, parse_workers=args.parse_workers):
+            writers['texts'].write([{'accessionNumber': accession, 'ticker': tickers_by_accession[accession], 'text': data['Text'],
+                                     'images': data['Images'], 'tables': data['Tables']}])
+            pending.append(accession)
+            progress.update(1, 1)
+            if len(pending) >= args.batch_size or time.monotonic() - last_save > 30:
+                checkpoint.save('texts', pending, writers)
+                pending, last_save = [], time.monotonic()
+        checkpoint.save('texts', pending, writers)
+        progress.close()
+
+    # Stage 3: GPT extraction
+    if args.gpt:
+        headers = {'User-Agent': args.email}
+        done = checkpoint.done('gpt')
+        todo = filings[~filings['accessionNumber'].isin(done)]
+        progress = Progress('gpt', len(filings), 'filings')
+        progress.update(len(filings) - len(todo))
+        query = None
+        if args.query_file:
+            with open(args.query_file) as f:
+                query = f.read()
+        for start in range(0, len(todo), args.batch_size):
+            batch = todo.iloc[start:start + args.batch_size]
+            # --source full_index filings point at their index page; the primary document is looked up here
+            resolve = lambda row: resolve_document_url(row[0], headers, row[1])
+            with ThreadPoolExecutor(max_workers=args.workers) as executor:
+                urls = list(executor.map(resolve, zip(batch['doc_url'], batch['form'])))
+            if args.gpt == 'lite':
+                results = extract_lite_data_batch(urls, api_key=args.api_key, headers=headers, return_json=True)
+            else:
+                extract = lambda url: extract_full_data_gpt(url, query=query, api_key=args.api_key, headers=headers)
+                with ThreadPoolExecutor(max_workers=args.workers) as executor:
+                    results = list(executor.map(extract, urls))
+
+            records, succeeded = [], []
+            for accession, ticker, url, result in zip(batch['accessionNumber'], batch['ticker'], urls, results):
+                # Failed extractions are reported as strings or None and are retried by the next run
+                if result is None or (isinstance(result, str) and result.startswith('ERROR WITH URL')):
+                    continue
+                records.append({'accessionNumber': accession, 'ticker': ticker, 'doc_url': url, 'result': json.dumps(result, default=str)})
+                succeeded.append(accession)
+            writers['gpt'].write(records)
+            checkpoint.save('gpt', succeeded, writers)
+            progress.update(len(batch), len(succeeded))
+        progress.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Build a Schedule 14A dataset for a list of tickers without the Streamlit pages. '
+                                                 'Rerunning with the same output directory resumes from the last checkpoint.')
+    parser.add_argument('tickers', help='file with one ticker per line')
+    parser.add_argument('--start-year', type=int, required=True)
+    parser.add_argument('--end-year', type=int, required=True)
+    parser.add_argument('--email', required=True, help='contact address sent in the SEC User-Agent')
+    parser.add_argument('--output', required=True, help='directory for the results and checkpoint.json')
+    parser.add_argument('--format', choices=['jsonl', 'parquet'], default='jsonl', help='parquet needs pyarrow')
+    parser.add_argument('--source', choices=['submissions', 'full_index', 'store'], default='submissions', help='see get_sched14a_df')
+    parser.add_argument('--text', action='store_true', help='also download and extract each filing')
+    parser.add_argument('--gpt', choices=['lite', 'full'], help='also run a GPT extractor on each filing')
+    parser.add_argument('--api-key', default=os.environ.get('OPENAI_API_KEY'), help='defaults to $OPENAI_API_KEY')
+    parser.add_argument('--query-file', help='request text for --gpt full')
+    parser.add_argument('--batch-size', type=int, default=25, help='tickers or filings per checkpoint')
+    parser.add_argument('--workers', type=int, default=10, help='concurrent requests; the shared rate limiter keeps them within 10 req/s')
+    parser.add_argument('--parse-workers', type=int, default=None, help='processes parsing documents (default: all cores)')
+    args = parser.parse_args()
+
+    if args.gpt and not args.api_key:
+        parser.error('--gpt needs --api-key or $OPENAI_API_KEY')
+    if args.gpt == 'full' and not args.query_file:
+        parser.error('--gpt full needs --query-file')
+    if args.format == 'parquet':
+        if importlib.util.find_spec('pyarrow') is None:
+            parser.error('--format parquet needs pyarrow')
+    run(args)
+
+if __name__ == '__main__':
+    main()
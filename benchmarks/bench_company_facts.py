@@ -0,0 +1,87 @@
+# Times and measures peak memory of flattening a large synthetic companyfacts JSON (~27 MB) into the
+# get_companyFactsDataFrame frame, against the original per-datapoint dict loop it replaced. Also times
+# the three loads get_companyData makes (company facts, annual facts, quarterly facts) with the JSON
+# parse included, which the memoized loader serves from one parse.
+# Run from the repository root: python benchmarks/bench_company_facts.py
+
+import os
+import sys
+import json
+import time
+import tracemalloc
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import edgar
+from edgar import _companyFactsFrame, get_companyFactsDataFrame
+
+def make_company_facts(n_facts=3000, n_points=60):
+    us_gaap = {}
+    for f in range(n_facts):
+        items = []
+        for k in range(n_points):
+            year = 2000 + k // 4
+            item = {'end': f'{year}-{3 * (k % 4) + 3:02d}-28', 'val': (f * 7919 + k * 104729) % 10 ** 9, 'accn': f'0000320193-{year % 100:02d}-{k:06d}',
+                    'fy': year, 'fp': f'Q{k % 4 + 1}' if k % 4 < 3 else 'FY', 'form': '10-Q' if k % 4 < 3 else '10-K', 'filed': f'{year + 1}-01-15'}
+            if f % 2:
+                item = {'start': f'{year}-01-01', **item}
+            if k % 5 == 0:
+                item['frame'] = f'CY{year}Q{k % 4 + 1}'
+            items.append(item)
+        us_gaap[f'Fact{f:05d}'] = {'label': f'Fact number {f}', 'description': '', 'units': {'USD' if f % 3 else 'shares': items}}
+    return {'cik': 320193, 'entityName': 'Synthetic Inc.', 'facts': {'us-gaap': us_gaap}}
+
+def legacy_companyFactsFrame(us_gaap_data):
+    df_data = []
+    for fact, details in us_gaap_data.items():
+        for unit in details['units']:
+            for item in details['units'][unit]:
+                row = item.copy()
+                row['fact'] = fact
+                df_data.append(row)
+
+    df = pd.DataFrame(df_data)
+    df['end'] = pd.to_datetime(df['end'])
+    df['start'] = pd.to_datetime(df['start'])
+    df = df.drop_duplicates(subset=['fact', 'end', 'val'])
+    df.set_index('end', inplace=True)
+    return df
+
+def measure(fn, *args):
+    # Timed and traced in separate runs since tracemalloc slows allocation-heavy code unevenly
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+if __name__ == '__main__':
+    raw = json.dumps(make_company_facts())
+    print(f'companyfacts JSON: {len(raw) / 1e6:.1f} MB')
+    us_gaap = json.loads(raw)['facts']['us-gaap']
+
+    legacy, legacy_time, legacy_peak = measure(legacy_companyFactsFrame, us_gaap)
+    columnar, columnar_time, columnar_peak = measure(_companyFactsFrame, us_gaap)
+
+    # Same rows and values once the categorical columns are compared as strings
+    as_strings = columnar.astype({'fact': str, 'accn': str, 'form': str}).reindex(columns=legacy.columns)
+    pd.testing.assert_frame_equal(as_strings, legacy, check_dtype=False)
+
+    print(f'legacy:   {legacy_time:.2f}s, peak {legacy_peak / 1e6:.0f} MB, frame {legacy.memory_usage(deep=True).sum() / 1e6:.0f} MB')
+    print(f'columnar: {columnar_time:.2f}s, peak {columnar_peak / 1e6:.0f} MB, frame {columnar.memory_usage(deep=True).sum() / 1e6:.0f} MB')
+    print(f'{legacy_time / columnar_time:.1f}x faster, {legacy_peak / columnar_peak:.1f}x less peak memory')
+
+    start = time.perf_counter()
+    for _ in range(3):
+        legacy_companyFactsFrame(json.loads(raw)['facts']['us-gaap'])
+    legacy_time = time.perf_counter() - start
+
+    edgar.get_companyFactsData = lambda headers, cik: json.loads(raw)
+    start = time.perf_counter()
+    for _ in range(3):
+        get_companyFactsDataFrame({}, '0000320193')
+    memoized_time = time.perf_counter() - start
+    print(f'get_companyData loads: legacy {legacy_time:.2f}s, memoized {memoized_time:.2f}s ({legacy_time / memoized_time:.1f}x faster, downloads not counted)')
@@ -0,0 +1,64 @@
+# Times extractdata.parse_html against the original html.parser + per-table re-parse on a large proxy.
+# Pass the path of a saved DEF 14A to use it, otherwise a synthetic ~2 MB proxy is generated.
+# Run from the repository root: python benchmarks/bench_get_text_and_images.py [fixture.htm]
+
+import os
+import sys
+import time
+import tracemalloc
+from urllib.parse import urljoin
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from extractdata import parse_html
+
+URL = 'https://www.sec.gov/Archives/edgar/data/1166691/000120677424000396/cmcsa4208891-def14a.htm'
+
+def make_proxy(n_sections=400):
+    parts = ['<html><head><title>DEF 14A</title><style>td { font-size: 8pt; }</style></head><body>',
+             '<div style="text-align:center"><b>UNITED STATES<br>SECURITIES AND EXCHANGE COMMISSION</b><br>Washington, D.C. 20549</div>']
+    for i in range(n_sections):
+        parts.append(f'<div id="s{i}"><p style="font-family:Times">Section {i}. The Compensation Committee approved a target bonus of '
+                     f'<b>{100 + i}%</b> of base salary &amp; a payout of $1,{i:03d},000 for fiscal 20{i % 25:02d}.</p>'
+                     f'<!-- page {i} --><img src="g{i}.jpg" alt="chart">')
+        rows = ''.join(f'<tr><td><span>Metric {r}</span></td><td>&nbsp;</td><td style="text-align:right">$</td>'
+                       f'<td style="text-align:right"><font>{r * 1000 + i:,}</font></td><td>({r}.{i % 10})</td></tr>' for r in range(25))
+        nested = '<table><tr><td>Footnote</td><td>(1)</td></tr></table>' if i % 10 == 0 else ''
+        parts.append(f'<table style="width:100%"><tr><th>Metric</th><th>Value</th></tr>{rows}<tr><td>{nested}</td></tr></table></div>')
+    parts.append('<script>var x = 1;</script></body></html>')
+    return ''.join(parts).encode('utf-8')
+
+def legacy_parse_html(content, url):
+    soup = BeautifulSoup(content, 'html.parser')
+    text = soup.get_text(separator='\n', strip=True)
+    images = [urljoin(url, img.get('src')) for img in soup.find_all('img') if img.get('src')]
+    tables = []
+    for table in soup.find_all('table'):
+        table_text = BeautifulSoup(str(table), 'html.parser').get_text(separator=' ', strip=True)
+        if table_text != '':
+            tables.append(table_text)
+    return text, images, tables
+
+def measure(fn, content):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(content, URL)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], 'rb') as f:
+            content = f.read()
+    else:
+        content = make_proxy()
+
+    legacy, legacy_time, legacy_peak = measure(legacy_parse_html, content)
+    current, current_time, current_peak = measure(parse_html, content)
+    assert legacy == current, 'parse_html output differs from the BeautifulSoup implementation'
+
+    print(f'{len(content) / 1e6:.1f} MB document, {len(current[2])} tables, {len(current[1])} images')
+    print(f'html.parser + table re-parse: {legacy_time:.2f}s, peak {legacy_peak / 1e6:.0f} MB')
+    print(f'lxml single pass:             {current_time:.2f}s, peak {current_peak / 1e6:.0f} MB')
@@ -0,0 +1,65 @@
+# Times the row construction in get_sched14a_df on synthetic submissions for 500 tickers,
+# against the original iterrows loop it replaced.
+# Run from the repository root: python benchmarks/bench_sched14a_df.py
+
+import os
+import sys
+import time
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sched14a import SCHED14A_COLUMNS, _build_sched14a_df
+
+def make_frames(n_tickers=500, n_filings=400):
+    frames = []
+    for i in range(n_tickers):
+        cik = str(100000 + i).zfill(10)
+        forms = ['DEF 14A' if k % 10 == 0 else '10-Q' for k in range(n_filings)]
+        allForms = pd.DataFrame({
+            'accessionNumber': [f'{cik}-{k % 25:02d}-{k:06d}' for k in range(n_filings)],
+            'filingDate': [f'{2000 + k % 25}-{1 + k % 12:02d}-{1 + (k // 25) % 28:02d}' for k in range(n_filings)],
+            'reportDate': [f'{1999 + k % 25}-12-31' if k % 3 else '' for k in range(n_filings)],
+            'form': forms,
+            'primaryDocDescription': forms,
+            'primaryDocument': [f'doc{k}.htm' for k in range(n_filings)],
+            'fileNumber': ['001-00001'] * n_filings,
+            'filmNumber': ['2200001'] * n_filings,
+        })
+        frames.append((f'T{i}', cik, f'Company {i}', allForms))
+    return frames
+
+def legacy_build_sched14a_df(frames, start_year, end_year):
+    tickers_data = pd.DataFrame({'ticker': [t for t, _, _, _ in frames], 'cik_str': [c for _, c, _, _ in frames], 'title': [n for _, _, n, _ in frames]})
+    exec_comp_form_data = []
+    for ticker, _, _, company_data in frames:
+        pattern = '|'.join(['DEF 14A', 'PREC14A', 'FORM DEF 14A', 'FORM PREC14A', 'DEFINITIVE PROXY STATEMENT'])
+        exec_comp = company_data[company_data['form'].str.contains('14A', na=False) & company_data['primaryDocDescription'].str.contains(pattern, na=False)].copy()
+        exec_comp.loc[:, 'filingDate'] = pd.to_datetime(exec_comp['filingDate'], errors='coerce').dt.date
+        exec_comp.loc[:, 'reportDate'] = pd.to_datetime(exec_comp['reportDate'], errors='coerce').dt.date
+        exec_comp_sorted = exec_comp.sort_values(by='filingDate', ascending=False)
+        exec_comp_sorted['filingDate'] = pd.to_datetime(exec_comp_sorted['filingDate'], errors='coerce')
+        filtered_df = exec_comp_sorted[(exec_comp_sorted['filingDate'].notnull()) & (exec_comp_sorted['filingDate'].dt.year.between(start_year, end_year))]
+        for idx, row in filtered_df.copy().iterrows():
+            row['ticker'] = ticker
+            row['title'] = tickers_data[tickers_data['ticker'] == ticker]['title'].values[0]
+            row['cik'] = tickers_data[tickers_data['ticker'] == ticker]['cik_str'].values[0]
+            row['doc_url'] = f"https://www.sec.gov/Archives/edgar/data/{row['cik']}/{row['accessionNumber'].replace('-', '')}/{row['primaryDocument']}"
+            exec_comp_form_data.append(row.to_dict())
+    df = pd.DataFrame(exec_comp_form_data)
+    df['filingDate'] = pd.to_datetime(df['filingDate'], errors='coerce').dt.date
+    df['reportDate'] = pd.to_datetime(df['reportDate'], errors='coerce').dt.date
+    return df.reindex(columns=SCHED14A_COLUMNS)
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+if __name__ == '__main__':
+    frames = make_frames()
+    legacy, legacy_time = timed(legacy_build_sched14a_df, frames, 2010, 2020)
+    vectorized, vectorized_time = timed(_build_sched14a_df, frames, 2010, 2020)
+    pd.testing.assert_frame_equal(legacy.reset_index(drop=True), vectorized)
+    print(f'{len(frames)} tickers, {len(vectorized)} rows')
+    print(f'iterrows loop: {legacy_time:.3f}s')
+    print(f'vectorized:    {vectorized_time:.3f}s ({legacy_time / vectorized_time:.0f}x faster)')
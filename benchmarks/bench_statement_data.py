@@ -0,0 +1,96 @@
+# Times edgar._get_statementData on R-file statements against the original BeautifulSoup parser it replaced,
+# and checks both give the same concepts, dates and amounts. The original checked "in Thousands" before
+# "in Millions", scaled per-share and share rows like dollars, and dropped every amount of tables "unless
+# otherwise specified"; the copy below keeps its traversal but takes its units from edgar._unitMultipliers
+# and _rowMultiplier, so only the parsing is compared. tests/test_statements.py checks the amounts themselves.
+# Pass saved R files (e.g. tests/fixtures/R4.htm) to check and time them, otherwise synthetic statements are generated.
+# Run from the repository root: python benchmarks/bench_statement_data.py [R2.htm R4.htm ...]
+
+import os
+import sys
+import time
+import numpy as np
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from edgar import _get_statementData, _get_statementFrame, _standardize_date, _unitMultipliers, _rowMultiplier
+from standin import make_statement
+import pandas as pd
+
+def legacy_get_statementDates(soup):
+    table_headers = soup.find_all('th', {'class': 'th'})
+    dates = [str(th.div.string) for th in table_headers if th.div and th.div.string]
+    dates = [_standardize_date(date).replace('.', '') for date in dates]
+    return pd.to_datetime(dates)
+
+def legacy_get_statementData(soup):
+    columns = []
+    values_set = []
+    date_time_index = legacy_get_statementDates(soup)
+
+    for table in soup.find_all('table'):
+        table_header = table.find('th')
+        amount_multiplier, share_multiplier = _unitMultipliers(table_header.get_text() if table_header else '')
+
+        for row in table.select('tr'):
+            onclick_elements = row.select('td.pl a, td.pl.custom a')
+            if not onclick_elements:
+                continue
+
+            onclick_attr = onclick_elements[0]['onclick']
+            column_title = onclick_attr.split('defref_')[-1].split("',")[0]
+            columns.append(column_title)
+            unit_multiplier = _rowMultiplier(column_title, amount_multiplier, share_multiplier)
+
+            values = [np.nan] * len(date_time_index)
+
+            for i, cell in enumerate(row.select('td.text, td.nump, td.num')):
+                if 'text' in cell.get('class'):
+                    continue
+
+                value = ''.join(filter(lambda x: x in '1234567890.', cell.text.replace('$', '').replace(',', '').replace('(', '').replace(')', '').strip()))
+
+                if value:
+                    value = float(value)
+                    sign = 1 if 'nump' in cell.get('class') else -1
+                    values[i] = sign * value * unit_multiplier
+
+            values_set.append(values)
+
+    return columns, values_set, date_time_index
+
+def best_of(fn, *args, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        documents = {path: open(path, 'rb').read() for path in sys.argv[1:]}
+    else:
+        dates = ['Dec. 31, 2023', 'Dec. 31, 2022', 'Dec. 31, 2021']
+        documents = {f'synthetic {unit} ({n_rows} rows)': make_statement('Consolidated Statements of Operations', unit, dates, n_rows=n_rows, seed=n_rows).encode('utf-8')
+                     for unit in ('$ in Thousands', '$ in Millions', 'In Millions, except Per Share data, unless otherwise specified')
+                     for n_rows in (80, 400)}
+
+    for name, content in documents.items():
+        columns, values, dates = _get_statementData(content)
+        legacy_columns, legacy_values, legacy_dates = legacy_get_statementData(BeautifulSoup(content, 'lxml'))
+        assert columns == legacy_columns, name
+        assert dates.equals(legacy_dates), name
+        np.testing.assert_allclose(values, np.array(legacy_values, dtype=float).reshape(values.shape), rtol=1e-12, err_msg=name)
+        # A soup from the older helpers still works
+        assert _get_statementFrame(BeautifulSoup(content, 'lxml'), name).equals(_get_statementFrame(content, name)), name
+
+        # get_statementDF used to soup the file first, so that parse is part of the original's time
+        legacy_time = best_of(lambda: legacy_get_statementData(BeautifulSoup(content, 'lxml')))
+        soup = BeautifulSoup(content, 'lxml')
+        legacy_soup_time = best_of(legacy_get_statementData, soup)
+        new_time = best_of(_get_statementData, content)
+        print(f'{name}: {len(columns)} rows x {len(dates)} dates, {np.isfinite(values).sum()} amounts')
+        print(f'  original {legacy_time * 1000:.1f} ms ({legacy_soup_time * 1000:.1f} ms on a ready soup), '
+              f'lxml {new_time * 1000:.1f} ms: {legacy_time / new_time:.1f}x faster ({legacy_soup_time / new_time:.1f}x without the soup parse)')
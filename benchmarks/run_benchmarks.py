@@ -0,0 +1,196 @@
+# Offline benchmark suite. Starts the stand-in EDGAR/OpenAI server from standin.py on a fixture set, runs each
+# case in a fresh process with an empty cache directory, and records wall time, peak traced memory and the
+# requests each case made, compared against baselines.json. Exits 1 when a case regresses past the tolerance.
+# Run from the repository root:
+#   python benchmarks/run_benchmarks.py [--fixtures DIR] [--cases NAME ...] [--update-baselines]
+# Without --fixtures a synthetic set is generated (see standin.make_fixtures); use standin.py record for real filings.
+# Nothing leaves the machine: EDGAR requests go to the stand-in through http_client.base_url, OpenAI requests through
+# OPENAI_BASE_URL, and tiktoken gets stand-in encodings instead of downloading its vocabularies.
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import tracemalloc
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+sys.path.insert(0, BENCHMARK_DIR)
+from standin import StandInServer, make_fixtures, install_offline_encodings, EMBEDDING_DIM
+
+BASELINES_PATH = os.path.join(BENCHMARK_DIR, 'baselines.json')
+EMAIL = 'benchmarks@example.com'
+# Absolute slack added to the relative tolerance, so millisecond cases don't fail on scheduler noise
+NOISE = {'seconds': 0.01, 'peak_mb': 0.5}
+
+def _case_sched14a_df(manifest):
+    from sched14a import get_sched14a_df
+    return lambda: get_sched14a_df(manifest['tickers'], manifest['start_year'], manifest['end_year'], EMAIL)
+
+def _case_text_and_images(manifest):
+    from extractdata import get_text_and_images
+    return lambda: get_text_and_images(manifest['proxy_url'], {'User-Agent': EMAIL})
+
+def _case_statement_data(manifest):
+    # Only the parse is timed; the R file is downloaded beforehand
+    from httpcache import http_cache
+    from edgar import _get_statementData
+    content = http_cache.get(manifest['statement_file'], headers={'User-Agent': EMAIL}).content
+    return lambda: _get_statementData(content)
+
+def _case_statements(manifest):
+    from edgar import Filing
+    filing = Filing({'User-Agent': EMAIL}, manifest['cik'], manifest['accession'])
+    return lambda: filing.get_statements(['balance_sheet', 'income_statement', 'cash_flow_statement'])
+
+def _case_company_facts(manifest):
+    from edgar import get_companyFactsDataFrame
+    return lambda: get_companyFactsDataFrame({'User-Agent': EMAIL}, manifest['cik'])
+
+def _case_strings_ranked(manifest):
+    import numpy as np
+    import pandas as pd
+    from extractdata import strings_ranked_by_relatedness
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'Text': [f'Chunk {i} of the proxy statement.' for i in range(manifest['chunks'])],
+                       'Embeddings': list(rng.standard_normal((manifest['chunks'], EMBEDDING_DIM), dtype=np.float32))})
+    return lambda: strings_ranked_by_relatedness(manifest['query'], df, top_n=20, api_key='benchmark')
+
+CASES = {
+    'get_sched14a_df': _case_sched14a_df,
+    'get_text_and_images': _case_text_and_images,
+    '_get_statementData': _case_statement_data,
+    'Filing.get_statements': _case_statements,
+    'get_companyFactsDataFrame': _case_company_facts,
+    'strings_ranked_by_relatedness': _case_strings_ranked,
+}
+
+def run_child(case, fixtures, server, trace):
+    '''
+    Runs one case in this process against the stand-in at server and prints {'seconds': ...} or {'peak_bytes': ...} as JSON.
+    '''
+    with open(os.path.join(fixtures, 'manifest.json')) as f:
+        manifest = json.load(f)
+    from httpclient import http_client
+    http_client.base_url = server
+    # The stand-in is local, so SEC's rate limit would only add sleeps; the request counts show what it would cost
+    http_client.rate_limiter = None
+    install_offline_encodings()
+    fn = CASES[case](manifest)
+    if trace:
+        tracemalloc.start()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(json.dumps({'peak_bytes': peak}))
+    else:
+        start = time.perf_counter()
+        fn()
+        print(json.dumps({'seconds': time.perf_counter() - start}))
+
+def measure(case, fixtures, server, trace=False):
+    # A fresh cache directory per run, so every case starts cold
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # OPENAI_BASE_URL is the OpenAI client's own setting; the cases create their clients internally
+        env = dict(os.environ, SCHED14A_CACHE_DIR=cache_dir, OPENAI_BASE_URL=f'{server.url}/v1', OPENAI_API_KEY='benchmark')
+        command = [sys.executable, os.path.abspath(__file__), '--child', case, '--fixtures', fixtures, '--server', server.url] + (['--trace'] if trace else [])
+        result = subprocess.run(command, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f'exit status {result.returncode}')
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def run_case(case, fixtures, server, repeat):
+    '''
+    Returns {'seconds', 'peak_mb', 'requests': {endpoint: count}}. The fastest of repeat timed runs is kept;
+    requests are counted over the first one.
+    '''
+    before, _ = server.snapshot()
+    seconds = [measure(case, fixtures, server)['seconds']]
+    after, _ = server.snapshot()
+    seconds += [measure(case, fixtures, server)['seconds'] for _ in range(repeat - 1)]
+    peak = measure(case, fixtures, server, trace=True)['peak_bytes']
+    return {'seconds': round(min(seconds), 4), 'peak_mb': round(peak / 1e6, 2), 'requests': dict(sorted((after - before).items()))}
+
+def compare(results, baselines, tolerance):
+    '''
+    Returns the regressions: time or peak memory more than tolerance above the baseline, or any endpoint
+    requested more often than before.
+    '''
+    regressions = []
+    for case, result in results.items():
+        baseline = baselines.get(case)
+        if baseline is None or 'error' in result:
+            continue
+        for metric in ('seconds', 'peak_mb'):
+            if result[metric] > baseline[metric] * (1 + tolerance) + NOISE[metric]:
+                regressions.append(f'{case}: {metric} {result[metric]} vs baseline {baseline[metric]}')
+        for endpoint, count in result['requests'].items():
+            if count > baseline['requests'].get(endpoint, 0):
+                regressions.append(f"{case}: {count} requests to {endpoint} vs baseline {baseline['requests'].get(endpoint, 0)}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline benchmarks against a stand-in EDGAR and OpenAI server.')
+    parser.add_argument('--fixtures', help='fixture directory with a manifest.json (default: generate a synthetic set)')
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES))
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per case; the fastest is kept')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative increase in time and memory')
+    parser.add_argument('--baselines', default=BASELINES_PATH)
+    parser.add_argument('--update-baselines', action='store_true', help='save these results as the new baselines')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--trace', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--server', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return run_child(args.child, args.fixtures, args.server, args.trace)
+
+    with tempfile.TemporaryDirectory() as generated:
+        fixtures = args.fixtures
+        if fixtures is None:
+            fixtures = generated
+            make_fixtures(fixtures)
+        fixtures = os.path.abspath(fixtures)
+        server = StandInServer(fixtures).start()
+
+        results = {}
+        for case in args.cases:
+            try:
+                results[case] = run_case(case, fixtures, server, args.repeat)
+            except Exception as e:
+                results[case] = {'error': str(e)}
+            result = results[case]
+            if 'error' in result:
+                print(f'{case:32} failed: {result["error"]}')
+            else:
+                requests = ', '.join(f'{endpoint} {count}' for endpoint, count in result['requests'].items()) or 'none'
+                print(f'{case:32} {result["seconds"]:8.3f}s {result["peak_mb"]:9.1f} MB   requests: {requests}')
+        server.shutdown()
+
+    baselines = {}
+    if os.path.exists(args.baselines):
+        with open(args.baselines) as f:
+            baselines = json.load(f)
+
+    if args.update_baselines:
+        baselines.update({case: result for case, result in results.items() if 'error' not in result})
+        with open(args.baselines, 'w') as f:
+            json.dump(baselines, f, indent=1, sort_keys=True)
+            f.write('\n')
+        print(f'Saved baselines to {args.baselines}')
+        return
+
+    regressions = compare(results, baselines, args.tolerance)
+    for regression in regressions:
+        print(f'REGRESSION {regression}')
+    missing = [case for case in results if case not in baselines and 'error' not in results[case]]
+    if missing:
+        print(f'No baseline for {", ".join(missing)}; run with --update-baselines to record one')
+    if regressions or any('error' in result for result in results.values()):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,293 @@
+# Local stand-in for EDGAR and the OpenAI API used by run_benchmarks.py.
+# GET /<host>/<path> replays the fixture saved at <fixtures>/<host>/<path>, which is where HttpClient sends
+# https://<host>/<path> when its base_url is the server's URL, with an ETag that If-None-Match turns into a 304. POST /v1/embeddings and /v1/chat/completions
+# answer like the OpenAI API with deterministic fake data. Requests are counted per endpoint.
+# install_offline_encodings stands in for the tiktoken encodings, which tiktoken would otherwise download.
+#
+# make_fixtures writes a synthetic fixture set; record saves live EDGAR responses for a manifest instead:
+#   python benchmarks/standin.py record fixtures/ --email you@example.com --tickers AAPL MSFT --cik 0000320193 --accession 0000320193-23-000106 --proxy-url https://...
+#   python benchmarks/standin.py serve fixtures/ --port 8765
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+import threading
+import collections
+from urllib.parse import urlsplit
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from httpclient import endpoint_of
+
+EMBEDDING_DIM = 256
+CONTENT_TYPES = {'.json': 'application/json', '.xml': 'application/xml', '.htm': 'text/html', '.html': 'text/html', '.txt': 'text/plain'}
+
+def fixture_path(directory, url):
+    parts = urlsplit(url)
+    return os.path.join(directory, parts.netloc, parts.path.lstrip('/'))
+
+def _write(directory, url, content):
+    path = fixture_path(directory, url)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content.encode('utf-8') if isinstance(content, str) else content)
+
+def make_submissions(cik, ticker, n_filings=400, first_year=2000, last_year=2024):
+    # Newest first like EDGAR; every tenth filing is a proxy statement
+    rows = collections.defaultdict(list)
+    for k in range(n_filings):
+        year = last_year - k * (last_year - first_year + 1) // n_filings
+        form = 'DEF 14A' if k % 10 == 0 else ('10-K' if k % 10 == 5 else '10-Q')
+        rows['accessionNumber'].append(f'{cik}-{year % 100:02d}-{k:06d}')
+        rows['filingDate'].append(f'{year}-{12 - k % 12:02d}-{1 + k % 28:02d}')
+        rows['reportDate'].append(f'{year - 1}-12-31' if form != 'DEF 14A' else '')
+        rows['form'].append(form)
+        rows['primaryDocDescription'].append(form)
+        rows['primaryDocument'].append(f'{ticker.lower()}{k}.htm')
+        rows['fileNumber'].append('001-00001')
+        rows['filmNumber'].append(str(22000000 + k))
+    return dict(rows)
+
+def make_statement(title, unit, dates, n_rows=80, seed=0):
+    # Laid out like EDGAR's R files: a link to the XBRL concept per row, [Abstract] heading rows with text
+    # cells, negative amounts in parentheses with class num, and blank or dashed cells
+    header = ''.join(f'<th class="th"><div>{date}</div></th>' for date in dates)
+    rows = []
+    for r in range(n_rows):
+        if r % 10 == 0:
+            cells = ''.join('<td class="text">&#160;<span></span></td>' for _ in dates)
+            concept, label = f'Concept{seed}x{r}Abstract', f'Section {r} [Abstract]'
+        else:
+            cells = ''
+            for c in range(len(dates)):
+                amount = (seed * 7919 + r * 104729 + c * 613) % 10 ** 7
+                amount = amount / 100 if r % 9 == 0 else amount
+                if (r + c) % 13 == 0:
+                    cells += '<td class="nump">&#160;<span></span></td>'
+                elif (r + c) % 4 == 0:
+                    cells += f'<td class="num">{"$ " if r % 7 == 1 else ""}({amount:,})<span></span></td>'
+                else:
+                    cells += f'<td class="nump">{"$ " if r % 7 == 1 else ""}{amount:,}<span></span></td>'
+            concept, label = f'Concept{seed}x{r}', f'Concept {r}'
+        footnote = '<sup>[1]</sup>' if r % 17 == 0 else ''
+        rows.append(f'<tr class="{"re" if r % 2 else "ro"}"><td class="pl " style="border-bottom: 0px;" valign="top"><a class="a" href="javascript:void(0);" '
+                    f"onclick=\"top.Show.showAR( this, 'defref_us-gaap_{concept}', window );\">{label}</a>{footnote}</td>{cells}</tr>")
+    return (f'<html><head><title></title></head><body><table class="report" border="0" cellspacing="2" id="idm1">'
+            f'<tr><th class="tl" colspan="1" rowspan="2"><div style="width: 200px;"><strong>{title} - USD ($)<br> {unit}</strong></div></th>'
+            f'<th class="th" colspan="{len(dates)}">12 Months Ended</th></tr><tr>{header}</tr>{"".join(rows)}</table></body></html>')
+
+def make_filing_summary(statements):
+    reports = ''.join(f'<Report instance="r.htm"><IsDefault>false</IsDefault><HtmlFileName>{file_name}</HtmlFileName>'
+                      f'<LongName>{position + 2} - Statement - {name}</LongName><ShortName>{name}</ShortName><MenuCategory>Statements</MenuCategory></Report>'
+                      for position, (name, file_name) in enumerate(statements))
+    return f'<?xml version="1.0" encoding="utf-8"?><FilingSummary><Version>3.23.2</Version><MyReports>{reports}</MyReports></FilingSummary>'
+
+def make_fixtures(directory, n_tickers=20, n_companies=10000, n_filings=400, proxy_sections=400, n_facts=1000, fact_points=40, n_chunks=5000):
+    '''
+    Writes a deterministic synthetic fixture set and its manifest.json, which tells the benchmarks what to request.
+    '''
+    from bench_get_text_and_images import make_proxy
+    from bench_company_facts import make_company_facts
+
+    tickers = [f'T{i:03d}' for i in range(n_tickers)]
+    company_tickers = {str(i): {'cik_str': 1000 + i, 'ticker': tickers[i] if i < n_tickers else f'X{i:05d}', 'title': f'Company {i} Inc.'}
+                       for i in range(n_companies)}
+    _write(directory, 'https://www.sec.gov/files/company_tickers.json', json.dumps(company_tickers))
+
+    for i, ticker in enumerate(tickers):
+        cik = str(1000 + i).zfill(10)
+        submissions = {'cik': cik, 'name': f'Company {i} Inc.', 'tickers': [ticker],
+                       'filings': {'recent': make_submissions(cik, ticker, n_filings, first_year=2012), 'files': []}}
+        # Every other company also has an older page, as long-lived filers do
+        if i % 2:
+            name = f'CIK{cik}-submissions-001.json'
+            submissions['filings']['files'].append({'name': name, 'filingCount': n_filings // 2, 'filingFrom': '2000-01-01', 'filingTo': '2011-12-31'})
+            _write(directory, f'https://data.sec.gov/submissions/{name}', json.dumps(make_submissions(cik, ticker, n_filings // 2, 2000, 2011)))
+        _write(directory, f'https://data.sec.gov/submissions/CIK{cik}.json', json.dumps(submissions))
+
+    cik, accession = '0000001000', '0000001000-24-000010'
+    proxy_url = f'https://www.sec.gov/Archives/edgar/data/1000/{accession.replace("-", "")}/t000proxy.htm'
+    _write(directory, proxy_url, make_proxy(proxy_sections))
+
+    base_link = f'https://www.sec.gov/Archives/edgar/data/1000/{accession.replace("-", "")}'
+    dates = ['Dec. 31, 2023', 'Dec. 31, 2022', 'Dec. 31, 2021']
+    statements = [('Consolidated Balance Sheets', 'R2.htm'), ('Consolidated Statements of Operations', 'R4.htm'), ('Consolidated Statements of Cash Flows', 'R7.htm')]
+    _write(directory, f'{base_link}/FilingSummary.xml', make_filing_summary(statements))
+    for seed, (name, file_name) in enumerate(statements):
+        _write(directory, f'{base_link}/{file_name}', make_statement(name, 'In Millions, except Per Share data, unless otherwise specified' if seed == 2 else '$ in Millions', dates, seed=seed))
+
+    facts = make_company_facts(n_facts, fact_points)
+    _write(directory, f'https://data.sec.gov/api/xbrl/companyfacts/CIK{cik}.json', json.dumps(facts))
+
+    manifest = {'tickers': tickers, 'start_year': 2005, 'end_year': 2024, 'proxy_url': proxy_url,
+                'cik': cik, 'accession': accession, 'statement_file': f'{base_link}/R4.htm',
+                'chunks': n_chunks, 'query': 'What was the total compensation of the CEO?'}
+    with open(os.path.join(directory, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=1)
+    return manifest
+
+def record(directory, email, tickers, cik, accession, proxy_url, start_year=2005, end_year=2024, statement='income_statement', n_chunks=5000):
+    '''
+    Runs the benchmarked calls against live EDGAR and saves every response as a fixture, with a manifest
+    that replays the same requests.
+    '''
+    import tempfile
+    # Every request has to reach the network to be recorded, so nothing may come from a warm local cache
+    os.environ['SCHED14A_CACHE_DIR'] = tempfile.mkdtemp()
+    from httpclient import HttpClient, http_client
+    from httpcache import http_cache
+    from edgar import Filing, get_companyFactsDataFrame
+    from sched14a import get_sched14a_df
+    from extractdata import get_text_and_images
+
+    class RecordingClient(HttpClient):
+        def get(self, url, headers=None, **kwargs):
+            response = super().get(url, headers=headers, **kwargs)
+            if response.status_code == 200:
+                _write(directory, url, response.content)
+            return response
+
+    http_cache.client = RecordingClient(rate_limiter=http_client.rate_limiter)
+
+    headers = {'User-Agent': email}
+    get_sched14a_df(tickers, start_year, end_year, email)
+    get_text_and_images(proxy_url, headers)
+    filing = Filing(headers, cik, accession)
+    statement_file = filing.get_statementLink(statement)
+    filing.get_statements(['balance_sheet', 'income_statement', 'cash_flow_statement'])
+    get_companyFactsDataFrame(headers, cik)
+
+    manifest = {'tickers': [ticker.upper() for ticker in tickers], 'start_year': start_year, 'end_year': end_year, 'proxy_url': proxy_url,
+                'cik': cik, 'accession': accession, 'statement_file': statement_file,
+                'chunks': n_chunks, 'query': 'What was the total compensation of the CEO?'}
+    with open(os.path.join(directory, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=1)
+    return manifest
+
+def fake_embedding(text, dim=EMBEDDING_DIM):
+    seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'little')
+    return np.random.default_rng(seed).standard_normal(dim, dtype=np.float32).round(6).tolist()
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _count(self, endpoint, sent):
+        with self.server.lock:
+            self.server.counts[endpoint] += 1
+            self.server.bytes_sent[endpoint] += sent
+
+    def _send(self, status, body, content_type='application/json', headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        host, _, path = self.path.lstrip('/').partition('/')
+        url = f'https://{host}/{path.split("?", 1)[0]}'
+        file = fixture_path(self.server.directory, url)
+        if not os.path.isfile(file):
+            self._count(endpoint_of(url), 0)
+            return self._send(404, b'{"error": "no fixture"}')
+        with open(file, 'rb') as f:
+            body = f.read()
+        # Like EDGAR, replays carry an ETag and a matching If-None-Match gets an empty 304
+        etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+        if self.headers.get('If-None-Match') == etag:
+            self._count(endpoint_of(url), 0)
+            return self._send(304, b'', headers={'ETag': etag})
+        self._count(endpoint_of(url), len(body))
+        self._send(200, body, CONTENT_TYPES.get(os.path.splitext(file)[1], 'application/octet-stream'), headers={'ETag': etag})
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        if self.path.endswith('/embeddings'):
+            inputs = request['input'] if isinstance(request['input'], list) else [request['input']]
+            data = [{'object': 'embedding', 'index': i, 'embedding': fake_embedding(text)} for i, text in enumerate(inputs)]
+            response = {'object': 'list', 'data': data, 'model': request['model'], 'usage': {'prompt_tokens': len(inputs), 'total_tokens': len(inputs)}}
+            endpoint = 'openai/embeddings'
+        elif self.path.endswith('/chat/completions'):
+            content = json.dumps({'CEO name': 'Jane Doe', 'Year covered': '2023', 'Total compensation': '12,345,678'})
+            response = {'id': 'chatcmpl-standin', 'object': 'chat.completion', 'created': 0, 'model': request['model'],
+                        'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': content}}],
+                        'usage': {'prompt_tokens': 1, 'completion_tokens': 1, 'total_tokens': 2}}
+            endpoint = 'openai/chat'
+        else:
+            return self._send(404, b'{"error": {"message": "unknown endpoint"}}')
+        body = json.dumps(response).encode('utf-8')
+        self._count(endpoint, len(body))
+        self._send(200, body)
+
+def install_offline_encodings(names=('cl100k_base', 'o200k_base')):
+    '''
+    Registers byte-level BPE encodings under tiktoken's encoding names, so counting tokens never downloads the
+    real vocabularies. Every byte is one token, so counts are higher than the real ones; the benchmarks only
+    use them to size chunks and embedding batches.
+    '''
+    import tiktoken
+    import tiktoken.registry
+    for name in names:
+        tiktoken.registry.ENCODINGS[name] = tiktoken.Encoding(
+            name=name, pat_str=r"'s|'t|'re|'ve|'m|'ll|'d| ?\p{L}+| ?\p{N}+| ?[^\s\p{L}\p{N}]+|\s+(?!\S)|\s+",
+            mergeable_ranks={bytes([i]): i for i in range(256)}, special_tokens={'<|endoftext|>': 256})
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, directory, port=0):
+        super().__init__(('127.0.0.1', port), StandInHandler)
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.counts = collections.Counter()
+        self.bytes_sent = collections.Counter()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def snapshot(self):
+        with self.lock:
+            return collections.Counter(self.counts), collections.Counter(self.bytes_sent)
+
+def main():
+    parser = argparse.ArgumentParser(description='Stand-in EDGAR and OpenAI server for the offline benchmarks.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    make_parser = subparsers.add_parser('make', help='write the synthetic fixture set')
+    make_parser.add_argument('directory')
+    serve_parser = subparsers.add_parser('serve', help='serve a fixture directory')
+    serve_parser.add_argument('directory')
+    serve_parser.add_argument('--port', type=int, default=8765)
+    record_parser = subparsers.add_parser('record', help='save live EDGAR responses as fixtures')
+    record_parser.add_argument('directory')
+    record_parser.add_argument('--email', required=True, help='contact address sent in the SEC User-Agent')
+    record_parser.add_argument('--tickers', nargs='+', required=True)
+    record_parser.add_argument('--cik', required=True, help='10-digit CIK of the filing used for the statement and companyfacts benchmarks')
+    record_parser.add_argument('--accession', required=True, help='accession number of a 10-K or 10-Q of that company')
+    record_parser.add_argument('--proxy-url', required=True, help='URL of a DEF 14A document')
+    args = parser.parse_args()
+
+    if args.command == 'make':
+        make_fixtures(args.directory)
+    elif args.command == 'record':
+        record(args.directory, args.email, args.tickers, args.cik, args.accession, args.proxy_url)
+    else:
+        server = StandInServer(args.directory, args.port)
+        print(f'Serving {args.directory} on {server.url}; set http_client.base_url = {server.url!r} and OPENAI_BASE_URL={server.url}/v1')
+        server.serve_forever()
+
+if __name__ == '__main__':
+    main()
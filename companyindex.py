@@ -0,0 +1,105 @@
+import os
+import gzip
+import json
+import time
+import threading
+import pandas as pd
+from httpcache import CACHE_DIR, http_cache
+
+COMPANY_TICKERS_URL = 'https://www.sec.gov/files/company_tickers.json'
+INDEX_PATH = os.path.join(CACHE_DIR, 'company_index.json.gz')
+
+def normalize_ticker(ticker):
+    # Class shares show up as BRK.B, BRK/B or BRK-B depending on the source; EDGAR uses BRK-B
+    return ticker.strip().upper().replace('.', '-').replace('/', '-')
+
+class CompanyIndex:
+    '''
+    In-memory ticker -> (CIK, title) lookup built from company_tickers.json.
+    '''
+    def __init__(self, tickers, ciks, titles, fetched_at=None):
+        self.tickers = list(tickers)
+        self.ciks = [str(cik).zfill(10) for cik in ciks]
+        self.titles = list(titles)
+        self.fetched_at = time.time() if fetched_at is None else fetched_at
+        self._frame = None
+
+        # Keep the first entry for a ticker, which is how the old DataFrame filters resolved duplicates
+        self.entries = {}
+        for ticker, cik, title in zip(self.tickers, self.ciks, self.titles):
+            self.entries.setdefault(normalize_ticker(ticker), (cik, title))
+
+    @classmethod
+    def from_company_tickers(cls, company_tickers):
+        rows = list(company_tickers.values())
+        return cls([row['ticker'] for row in rows], [row['cik_str'] for row in rows], [row['title'] for row in rows])
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data['ticker'], data['cik'], data['title'], fetched_at=data['fetched_at'])
+
+    def save(self, path=INDEX_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = {'fetched_at': self.fetched_at, 'ticker': self.tickers, 'cik': [int(cik) for cik in self.ciks], 'title': self.titles}
+        # Write to a temporary file first so a crash never leaves a truncated index behind
+        tmp_path = f'{path}.tmp'
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    def age(self):
+        return time.time() - self.fetched_at
+
+    def lookup(self, ticker):
+        '''
+        Returns (cik, title) for a ticker, or None if it is unknown.
+        '''
+        return self.entries.get(normalize_ticker(ticker))
+
+    def get_cik(self, ticker):
+        entry = self.lookup(ticker)
+        return entry[0] if entry else None
+
+    def __contains__(self, ticker):
+        return normalize_ticker(ticker) in self.entries
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def to_frame(self):
+        '''
+        Same layout as the DataFrame returned by edgar.get_companyIdentifiers.
+        '''
+        if self._frame is None:
+            self._frame = pd.DataFrame({'cik_str': self.ciks, 'ticker': self.tickers, 'title': self.titles}, index=[str(i) for i in range(len(self.tickers))])
+        return self._frame
+
+_company_index = None
+_company_index_lock = threading.Lock()
+
+def get_company_index(headers, ttl=24 * 60 * 60, path=INDEX_PATH):
+    '''
+    Returns the process-wide CompanyIndex, loading it from path on first use and refreshing
+    it from EDGAR once it is older than ttl seconds. A stale index is kept if the refresh fails.
+    '''
+    global _company_index
+    with _company_index_lock:
+        if _company_index is None and os.path.exists(path):
+            try:
+                _company_index = CompanyIndex.load(path)
+            except (OSError, ValueError, KeyError) as e:
+                print(f'Failed to load company index from {path}: {e}')
+
+        if _company_index is None or _company_index.age() > ttl:
+            try:
+                response = http_cache.get(COMPANY_TICKERS_URL, headers=headers)
+                response.raise_for_status()
+                _company_index = CompanyIndex.from_company_tickers(response.json())
+                _company_index.save(path)
+            except Exception as e:
+                if _company_index is None:
+                    raise
+                print(f'Failed to refresh company index, using the copy from {time.ctime(_company_index.fetched_at)}: {e}')
+        return _company_index
@@ -0,0 +1,44 @@
+import streamlit as st
+import pandas as pd
+import metrics
+
+def _histogram_table(histograms, label):
+    return pd.DataFrame([{label: name, 'Count': stats['count'], 'Total (s)': round(stats['sum'], 3), 'Mean (s)': round(stats['mean'], 3)}
+                         for name, stats in histograms.items()])
+
+def show_diagnostics():
+    '''
+    Optional sidebar panel with where the time went in this server process: per-stage timings, EDGAR
+    latency, bytes and tokens, cache hit rates and rate limiter waits. Also starts the Prometheus endpoint
+    when $SCHED14A_METRICS_PORT is set.
+    '''
+    metrics.serve()
+    if not st.sidebar.checkbox('Show diagnostics', value=False, key='show_diagnostics'):
+        return
+
+    data = metrics.snapshot()
+    with st.sidebar.expander('Diagnostics', expanded=True):
+        st.caption('Totals since this Streamlit server started; every session shares them.')
+
+        stages = {stage: data['stages'][stage] for stage in metrics.STAGES if stage in data['stages']}
+        stages.update({stage: stats for stage, stats in data['stages'].items() if stage not in stages})
+        if stages:
+            st.write('Pipeline stages')
+            st.dataframe(_histogram_table(stages, 'Stage'), hide_index=True)
+        if data['http_latency']:
+            st.write('EDGAR requests')
+            st.dataframe(_histogram_table(data['http_latency'], 'Endpoint'), hide_index=True)
+
+        counters = data['counters']
+        downloaded = sum(counters.get('downloaded_bytes', {}).values())
+        tokens = {direction: sum(value for key, value in counters.get('llm_tokens', {}).items() if dict(key)['direction'] == direction)
+                  for direction in ('sent', 'received')}
+        waits = data['rate_limiter'].values()
+        st.write(f"Downloaded {downloaded / 1e6:,.1f} MB · {tokens['sent']:,} tokens sent, {tokens['received']:,} received · "
+                 f"rate limiter wait {sum(stats['wait_seconds'] for stats in waits):,.1f}s over {sum(stats['throttled'] for stats in waits):,} requests")
+
+        st.write('Caches')
+        st.dataframe(pd.DataFrame([{'Cache': cache, 'Hits': stats['hits'], 'Misses': stats['misses'], 'Hit rate': f"{stats['hit_rate']:.0%}", 'Entries': stats['entries']}
+                                   for cache, stats in data['caches'].items()]), hide_index=True)
+
+        st.download_button('Download Prometheus metrics', metrics.prometheus_text(), file_name='metrics.prom', mime='text/plain')
@@ -1,16 +1,26 @@
 # Some code adapted from GGRusty
 # https://github.com/GGRusty/Edgar_Video_content/blob/main/Part_4/edgar_functions.py
 
+import re
 import requests
 import logging
 import calendar
+import operator
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
 from bs4 import BeautifulSoup
-from ratelimiter import RateLimiter
+from lxml import etree
+import lxml.html
+from httpclient import http_client
+from httpcache import http_cache
+from metrics import metrics
+from companyindex import CompanyIndex, get_company_index
 
-rate_limiter = RateLimiter(10, 1)
-s = requests.Session()
+# Every request made through http_client (and so http_cache) already waits on this
+rate_limiter = http_client.rate_limiter
 
 pd.options.display.float_format = (lambda x: "{:,.0f}".format(x) if int(x)==x else "{:,.2f}".format(x))
 
@@ -72,12 +82,11 @@ statement_keys_map = {
 }
 
 def get_companyIdentifiers(headers):
-    companyTickers = requests.get('https://www.sec.gov/files/company_tickers.json', headers=headers)
-    companyIdentifiers = pd.DataFrame.from_dict(companyTickers.json(), orient='index')
-    companyIdentifiers['cik_str'] = companyIdentifiers['cik_str'].astype(str).str.zfill(10)
-    return companyIdentifiers
+    return get_company_index(headers).to_frame()
 
 def get_cik(ticker, companyIdentifiers):
+    if isinstance(companyIdentifiers, CompanyIndex):
+        return companyIdentifiers.get_cik(ticker)
     filtered_df = companyIdentifiers[companyIdentifiers['ticker'] == ticker]
     if not filtered_df.empty:
         return filtered_df['cik_str'].values[0]
@@ -87,14 +96,49 @@ def get_cik(ticker, companyIdentifiers):
 def get_submissionMetadata(headers, cik):
     if cik==None:
         return None
-    submissionMetadata = requests.get(f"https://data.sec.gov/submissions/CIK{cik}.json", headers=headers)
+    submissionMetadata = http_cache.get(f"https://data.sec.gov/submissions/CIK{cik}.json", headers=headers)
     submissionMetadata.raise_for_status()
     return submissionMetadata.json()
 
-def get_allForms(submissionMetadata):
+def _get_submissionsPage(headers, name):
+    submissionsPage = http_cache.get(f"https://data.sec.gov/submissions/{name}", headers=headers)
+    submissionsPage.raise_for_status()
+    return submissionsPage.json()
+
+def get_olderSubmissions(headers, submissionMetadata, start_year=None, end_year=None, max_workers=4):
+    '''
+    Fetches the paginated CIK##########-submissions-###.json files listed in filings.files that overlap
+    start_year to end_year (None leaves that side open). Pages entirely outside the range are never
+    requested, so nothing is fetched when filings.recent already covers it.
+    '''
+    pages = []
+    for page in submissionMetadata['filings'].get('files', []):
+        if start_year is not None and int(page['filingTo'][:4]) < start_year:
+            continue
+        if end_year is not None and int(page['filingFrom'][:4]) > end_year:
+            continue
+        pages.append(page['name'])
+
+    if len(pages) <= 1 or max_workers <= 1:
+        return [_get_submissionsPage(headers, name) for name in pages]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(pages))) as executor:
+        return list(executor.map(lambda name: _get_submissionsPage(headers, name), pages))
+
+def get_allForms(submissionMetadata, headers=None, start_year=None, end_year=None):
+    '''
+    Returns the filings in submissionMetadata as a DataFrame. filings.recent only holds the latest ~1000 filings;
+    pass headers to also pull in the older paginated files that overlap start_year to end_year.
+    '''
     if submissionMetadata==None:
         return None
-    return pd.DataFrame(submissionMetadata['filings']['recent'])
+    allForms = pd.DataFrame(submissionMetadata['filings']['recent'])
+    if headers is None:
+        return allForms
+
+    olderSubmissions = get_olderSubmissions(headers, submissionMetadata, start_year=start_year, end_year=end_year)
+    if not olderSubmissions:
+        return allForms
+    return pd.concat([allForms] + [pd.DataFrame(page) for page in olderSubmissions], ignore_index=True)
 
 def get_formAccessionNumbers(allForms, form):
     if allForms is None or allForms.empty:
@@ -131,11 +175,10 @@ def _is_statement_file(short_name_tag, long_name_tag, file_name):
 
 def _get_financialStatementDataFileStructure(headers, cik, formAccessionNumber):
     try:
-        session = requests.Session()
         cik_url, accession_url = cik.lstrip('0'), formAccessionNumber.replace('-', '')
         base_link = f'https://www.sec.gov/Archives/edgar/data/{cik_url}/{accession_url}'
         filing_summary_link = f'{base_link}/FilingSummary.xml'
-        filing_summary_response = session.get(filing_summary_link, headers=headers).content.decode('utf-8')
+        filing_summary_response = http_cache.get(filing_summary_link, headers=headers).content.decode('utf-8')
 
         filing_summary_soup = BeautifulSoup(filing_summary_response, 'lxml-xml')
         statement_file_names_dict = {}
@@ -152,119 +195,224 @@ def _get_financialStatementDataFileStructure(headers, cik, formAccessionNumber):
         print(f"An error occurred while fetching financial statement data: {e}")
         return {}
 
-def _get_financialStatementSoup(headers, cik, statement_name, formAccessionNumber, statement_keys_map):
+class Filing:
     '''
-    statement name should be one of 'balance_sheet', 'income_statement', or 'cash_flow_statement'
+    The financial statements of one filing. FilingSummary.xml is downloaded and parsed once, on first use,
+    and shared by every statement requested from the same object.
     '''
-    session = requests.Session()
+    def __init__(self, headers, cik, formAccessionNumber, statement_keys_map=statement_keys_map):
+        self.headers = headers
+        self.cik = cik
+        self.accessionNumber = formAccessionNumber.replace('-', '')
+        self.statement_keys_map = statement_keys_map
+        self.base_link = f"https://www.sec.gov/Archives/edgar/data/{cik.lstrip('0')}/{self.accessionNumber}"
+        self._statement_file_names = None
+
+    @property
+    def statement_file_names(self):
+        if self._statement_file_names is None:
+            self._statement_file_names = _get_financialStatementDataFileStructure(self.headers, self.cik, self.accessionNumber)
+        return self._statement_file_names
+
+    def get_statementLink(self, statement_name):
+        '''
+        statement name should be one of 'balance_sheet', 'income_statement', or 'cash_flow_statement'
+        '''
+        for possible_key in self.statement_keys_map.get(statement_name.lower(), []):
+            file_name = self.statement_file_names.get(possible_key.lower())
+            if file_name:
+                return f'{self.base_link}/{file_name}'
+        raise ValueError(f'Could not find statement file name for {statement_name}')
 
-    base_link = f'https://www.sec.gov/Archives/edgar/data/{cik}/{formAccessionNumber}'
-    statemet_file_name_dict = _get_financialStatementDataFileStructure(headers, cik, formAccessionNumber)
-    statement_link = None
+    def get_statementContent(self, statement_name):
+        '''
+        Returns (statement link, raw bytes of the statement file).
+        '''
+        statement_link = self.get_statementLink(statement_name)
+        try:
+            statement_response = http_cache.get(statement_link, headers=self.headers)
+            statement_response.raise_for_status()
+            return statement_link, statement_response.content
 
-    for possible_key in statement_keys_map.get(statement_name.lower(), []):
-        file_name = statemet_file_name_dict.get(possible_key.lower())
-        if file_name:
-            statement_link = f'{base_link}/{file_name}'
-            break
+        except requests.RequestException as e:
+            raise ValueError(f"Error fetching the statement: {e}")
 
-    if not statement_link:
-        raise ValueError(f'Could not find statement file name for {statement_name}')
-    
-    try:
-        statement_response = session.get(statement_link, headers=headers)
-        statement_response.raise_for_status()
+    def get_statementSoup(self, statement_name):
+        statement_link, content = self.get_statementContent(statement_name)
         if statement_link.endswith('.xml'):
-            return BeautifulSoup(statement_response.content, 'lxml-xml', from_encoding='utf-8')
+            return BeautifulSoup(content, 'lxml-xml', from_encoding='utf-8')
         else:
-            return BeautifulSoup(statement_response.content, 'lxml')
-        
-    except requests.RequestException as e:
-        raise ValueError(f"Error fetching the statement: {e}")
-    
+            return BeautifulSoup(content, 'lxml')
+
+    def get_statementDF(self, statement_name):
+        try:
+            # The statement parser reads the raw file with lxml, so no soup is built here
+            _, content = self.get_statementContent(statement_name)
+        except Exception as e:
+            logging.error(f'Failed to get statement file: {e} for accession number: {self.accessionNumber}')
+            return None
+        return _get_statementFrame(content, self.accessionNumber)
+
+    def get_statements(self, statement_names, max_workers=3):
+        '''
+        Returns {statement_name: DataFrame or None}. The statement files are downloaded concurrently
+        once FilingSummary.xml has been read.
+        '''
+        self.statement_file_names
+        if len(statement_names) <= 1 or max_workers <= 1:
+            return {statement_name: self.get_statementDF(statement_name) for statement_name in statement_names}
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(statement_names))) as executor:
+            return dict(zip(statement_names, executor.map(self.get_statementDF, statement_names)))
+
+def _get_financialStatementSoup(headers, cik, statement_name, formAccessionNumber, statement_keys_map):
+    '''
+    statement name should be one of 'balance_sheet', 'income_statement', or 'cash_flow_statement'
+    '''
+    return Filing(headers, cik, formAccessionNumber, statement_keys_map).get_statementSoup(statement_name)
+
 def _standardize_date(date):
     for abbr, full in zip(calendar.month_abbr[1:], calendar.month_name[1:]):
         date = date.replace(abbr, full)
     return date
 
-def _get_statementDates(soup):
-    table_headers = soup.find_all('th', {'class': 'th'})
-    dates = [str(th.div.string) for th in table_headers if th.div and th.div.string]
-    dates = [_standardize_date(date).replace('.', '') for date in dates]
+# Everything but the digits and decimal point of a cell, e.g. "$ (1,234.5)" -> "1234.5"
+NON_NUMERIC = re.compile(r'[^0-9.]+')
+
+def _has_class(name):
+    return f'contains(concat(" ", normalize-space(@class), " "), " {name} ")'
+
+_DATE_HEADERS = etree.XPath(f'//th[{_has_class("th")}]')
+_TABLES = etree.XPath('//table')
+_FIRST_HEADER = etree.XPath('(.//th)[1]')
+# The row label cells and value cells of a table, in document order
+_CELLS = etree.XPath(f'.//td[{_has_class("pl")} or {_has_class("text")} or {_has_class("nump")} or {_has_class("num")}]')
+
+def _statementTree(document):
+    # Accepts the raw statement file, or a BeautifulSoup of it from the older soup-based helpers
+    if isinstance(document, BeautifulSoup):
+        document = str(document)
+    if isinstance(document, bytes):
+        return lxml.html.document_fromstring(document, parser=lxml.html.HTMLParser(encoding='utf-8'))
+    if isinstance(document, str):
+        return lxml.html.document_fromstring(document)
+    return document
+
+def _single_string(element):
+    # Same as bs4's .string: the text of an element whose only child is a string, or a single child with one
+    if len(element) == 0:
+        return element.text
+    if len(element) == 1 and element.text is None and element[0].tail is None:
+        return _single_string(element[0])
+    return None
+
+def _get_statementDates(document):
+    tree = _statementTree(document)
+    dates = []
+    for th in _DATE_HEADERS(tree):
+        divs = th.iter('div')
+        div = next(divs, None)
+        date = _single_string(div) if div is not None else None
+        if date:
+            dates.append(_standardize_date(date).replace('.', ''))
     index_dates = pd.to_datetime(dates)
     return index_dates
 
-def _keep_numbers_and_decimals_only_in_string(mixed_string):
-    num = '1234567890.'
-    allowed = list(filter(lambda x: x in num, mixed_string))
-    return ''.join(allowed)
+# The units of a statement header, e.g. "$ in Millions", "shares in Thousands, $ in Millions" or
+# "In Millions, except Per Share data, unless otherwise specified"
+_UNITS = re.compile(r'(\$|shares|share data)?\s*in (Thousands|Millions)', re.IGNORECASE)
 
-def _get_statementData(soup):
-    columns = []
-    values_set = []
-    date_time_index = _get_statementDates(soup)
-
-    for table in soup.find_all('table'):
-        unit_multiplier = 1
-        special_case = False
-
-        table_header = table.find('th')
-        if table_header:
-            header_text = table_header.get_text()
-            if 'in Thousands' in header_text:
-                unit_multiplier = 1
-            elif 'in Millions' in header_text:
-                unit_multiplier = 1000
-            if 'unless otherwise specified' in header_text:
-                special_case = True
-        
-        for row in table.select('tr'):
-            onclick_elements = row.select('td.pl a, td.pl.custom a')
-            if not onclick_elements:
-                continue
+# Per-share concepts, e.g. EarningsPerShareBasic or IncomeLossFromContinuingOperationsPerDilutedShare
+PER_SHARE = re.compile(r'Per(Basic|Diluted|BasicAndDiluted)?Share')
+# Share-count concepts, e.g. CommonStockSharesOutstanding, WeightedAverageNumberOfDilutedSharesOutstanding or
+# StockRepurchasedDuringPeriodShares, but not dollar concepts that mention shares such as
+# ProceedsFromIssuanceOfSharesUnderIncentiveAndShareBasedCompensationPlansIncludingStockOptions
+SHARE_COUNT = re.compile(r'Shares$|NumberOf\w*Shares|Shares(Outstanding|Issued|Authorized|Subscribed)|DuringPeriodShares')
 
-            onclick_attr = onclick_elements[0]['onclick']
-            column_title = onclick_attr.split('defref_')[-1].split("',")[0]
-            columns.append(column_title)
+def _unitMultipliers(header_text):
+    '''
+    Returns the multipliers that bring a table's dollar amounts and share counts to thousands, from the
+    "in Thousands"/"in Millions" of its header. "$ in ..." only applies to dollar amounts and "shares in ..."
+    only to share counts; a unit without either applies to both, unless shares have their own unit.
+    '''
+    amount_scale, share_scale, share_unit = 1.0, 1.0, False
+    for kind, unit in _UNITS.findall(header_text):
+        scale = 1000.0 if unit.lower() == 'millions' else 1.0
+        if kind.lower() in ('shares', 'share data'):
+            share_scale, share_unit = scale, True
+            continue
+        amount_scale = scale
+        if not kind and not share_unit:
+            share_scale = scale
+    return amount_scale, share_scale
+
+def _rowMultiplier(concept, amount_scale, share_scale):
+    # Per-share amounts are stated in dollars whatever the header says
+    if PER_SHARE.search(concept):
+        return 1.0
+    return share_scale if SHARE_COUNT.search(concept) else amount_scale
+
+def _get_statementData(document):
+    '''
+    Returns (columns, values, dates) for an R-file statement: the XBRL concept of each row, a float array with
+    one row per concept and one column per date, and the dates. document is the raw file or a soup of it.
 
-            values = [np.NaN] * len(date_time_index)
+    Dollar amounts are in thousands: "in Millions" tables are multiplied by 1000 and negative amounts (class num)
+    get their sign back. Share counts are scaled by the header too, unless it gives shares their own unit, and
+    per-share amounts are kept as stated (see _unitMultipliers).
+    '''
+    tree = _statementTree(document)
+    date_time_index = _get_statementDates(tree)
+    n_dates = len(date_time_index)
 
-            for i, cell in enumerate(row.select('td.text, td.nump, td.num')):
-                if 'text' in cell.get('class'):
+    columns = []
+    # Numeric cells are gathered by position first, then converted and scaled together
+    positions, strings, signs, scales = [], [], [], []
+    for table in _TABLES(tree):
+        table_header = _FIRST_HEADER(table)
+        header_text = table_header[0].text_content() if table_header else ''
+        amount_scale, share_scale = _unitMultipliers(header_text)
+
+        # A row counts once its label cell links to a concept; its value cells are numbered from there
+        row, i = None, 0
+        for cell in _CELLS(table):
+            classes = cell.get('class', '').split()
+            if 'pl' in classes:
+                if cell.getparent() is row:
                     continue
-
-                value = _keep_numbers_and_decimals_only_in_string(cell.text.replace('$', '').replace(',', '').replace('(', '').replace(')', '').strip())
-
-                if value:
-                    value = float(value)
-                    if special_case:
-                        value /= 1000
-                    else:
-                        if 'nump' in cell.get('class'):
-                            values[i] = value * unit_multiplier
-                        else:
-                            values[i] = -value * unit_multiplier
-            
-            values_set.append(values)
-    
-    return columns, values_set, date_time_index
-
-def get_statementDF(headers, cik, statement_name, formAccessionNumber, statement_keys_map):
-    formAccessionNumber = formAccessionNumber.replace('-', '')
-    try:
-        soup = _get_financialStatementSoup(headers, cik, statement_name, formAccessionNumber, statement_keys_map)
-    except Exception as e:
-        logging.error(f'Failed to get statement soup: {e} for accession number: {formAccessionNumber}')
-        return None
-    
-    if soup:
+                link = next(cell.iter('a'), None)
+                onclick = link.get('onclick') if link is not None else None
+                if onclick is None:
+                    continue
+                row, i = cell.getparent(), 0
+                columns.append(onclick.split('defref_')[-1].split("',")[0])
+                scale = _rowMultiplier(columns[-1], amount_scale, share_scale)
+                continue
+            if cell.getparent() is not row:
+                continue
+            i += 1
+            if 'text' in classes or i > n_dates:
+                continue
+            value = NON_NUMERIC.sub('', cell.text_content())
+            if value:
+                positions.append((len(columns) - 1) * n_dates + i - 1)
+                strings.append(value)
+                signs.append(1.0 if 'nump' in classes else -1.0)
+                scales.append(scale)
+
+    values = np.full((len(columns), n_dates), np.nan)
+    if strings:
+        values.flat[positions] = np.array(strings).astype(np.float64) * np.array(signs) * np.array(scales)
+    return columns, values, date_time_index
+
+def _get_statementFrame(document, formAccessionNumber):
+    if document is not None:
         try:
-            columns, values_set, date_time_index = _get_statementData(soup)
-            transposed_values_set = list(zip(*values_set))
-            df = pd.DataFrame(transposed_values_set, columns=columns, index=date_time_index)
+            with metrics.span('parse'):
+                columns, values, date_time_index = _get_statementData(document)
+            df = pd.DataFrame(values, index=columns, columns=date_time_index)
 
             if not df.empty:
-                df = df.T.drop_duplicates()
+                df = df.drop_duplicates()
             else:
                 logging.warning(f'Empty DataFrame for accession number: {formAccessionNumber}')
                 return None
@@ -273,35 +421,112 @@ def get_statementDF(headers, cik, statement_name, formAccessionNumber, statement
             logging.error(f'Error processing statement: {e}')
             return None
 
+def get_statementDF(headers, cik, statement_name, formAccessionNumber, statement_keys_map):
+    return Filing(headers, cik, formAccessionNumber, statement_keys_map).get_statementDF(statement_name)
+
 def get_companyFactsData(headers, cik):
-    companyFacts = requests.get(f'https://data.sec.gov/api/xbrl/companyfacts/CIK{cik}.json', headers=headers)
+    companyFacts = http_cache.get(f'https://data.sec.gov/api/xbrl/companyfacts/CIK{cik}.json', headers=headers)
     return companyFacts.json()
 
-def get_companyFactsDataFrame(headers, cik):
-    companyFacts = get_companyFactsData(headers, cik)
-    us_gaap_data = companyFacts['facts']['us-gaap']
-    df_data = []
+# Datapoint fields of companyfacts, in the order EDGAR writes them; start and frame are only on some datapoints
+COMPANY_FACT_FIELDS = ['start', 'end', 'val', 'accn', 'fy', 'fp', 'form', 'filed', 'frame']
+_FACT_FIELD_GETTERS = {field: operator.itemgetter(field) for field in COMPANY_FACT_FIELDS}
+_OPTIONAL_FACT_FIELDS = {'start', 'frame'}
+
+def _factDates(values):
+    # EDGAR dates are ISO strings, which NumPy parses several times faster than pd.to_datetime
+    if None in values:
+        # NumPy is slow on None (start is missing on instant facts); there are few distinct dates, so each is
+        # parsed once and None becomes NaT
+        codes, uniques = pd.factorize(np.array(values, dtype=object))
+        parsed = _factDates(uniques.tolist())
+        return np.append(parsed, np.datetime64('NaT', 'ns'))[codes]
+    try:
+        return np.array(values, dtype='datetime64[D]').astype('datetime64[ns]')
+    except ValueError:
+        return pd.to_datetime(values).to_numpy()
+
+def _factCategorical(values):
+    # Factorizing an object array is faster than pd.Categorical on a list; sorted like pd.Categorical's categories
+    codes, uniques = pd.factorize(np.array(values, dtype=object), sort=True)
+    return pd.Categorical.from_codes(codes, categories=uniques)
+
+def _companyFactsFrame(us_gaap_data):
+    '''
+    Flattens the us-gaap facts into one column per field without building a dict per datapoint.
+    fact, form and accn repeat heavily, so they are categorical.
+    '''
+    columns = {field: [] for field in COMPANY_FACT_FIELDS}
+    facts, counts = [], []
     for fact, details in us_gaap_data.items():
-        for unit in details['units']:
-            for item in details['units'][unit]:
-                row = item.copy()
-                row['fact'] = fact
-                df_data.append(row)
-    
-    df = pd.DataFrame(df_data)
-    df['end'] = pd.to_datetime(df['end'])
-    df['start'] = pd.to_datetime(df['start'])
+        n = 0
+        for items in details['units'].values():
+            for field, column in columns.items():
+                if field in _OPTIONAL_FACT_FIELDS:
+                    column += [item.get(field) for item in items]
+                    continue
+                try:
+                    column += list(map(_FACT_FIELD_GETTERS[field], items))
+                except KeyError:
+                    column += [item.get(field) for item in items]
+            n += len(items)
+        facts.append(fact)
+        counts.append(n)
+
+    # Sorted categories keep pivot_table's columns in the same alphabetical order as with plain strings
+    order = np.argsort(facts, kind='stable')
+    rank = np.empty(len(facts), dtype=np.int64)
+    rank[order] = np.arange(len(facts))
+    # Object arrays rather than lists, so pandas doesn't run type inference over every column
+    df = pd.DataFrame({
+        'start': _factDates(columns['start']),
+        'end': _factDates(columns['end']),
+        'val': pd.to_numeric(pd.Series(columns['val'], dtype=object)),
+        'accn': _factCategorical(columns['accn']),
+        'fy': np.array(columns['fy']),
+        'fp': np.array(columns['fp'], dtype=object),
+        'form': _factCategorical(columns['form']),
+        'filed': np.array(columns['filed'], dtype=object),
+        'frame': np.array(columns['frame'], dtype=object),
+        'fact': pd.Categorical.from_codes(np.repeat(rank, counts), categories=pd.Index(facts)[order]),
+    })
     df = df.drop_duplicates(subset=['fact', 'end', 'val'])
-    df.set_index('end', inplace=True)
-    labels_dict = {fact: details['label'] for fact, details in us_gaap_data.items()}
-    return df, labels_dict
+    return df.set_index('end')
+
+_companyFactsFrames = {}
+_companyFactsLock = threading.Lock()
+
+def get_companyFactsDataFrame(headers, cik, ttl=600, max_entries=8):
+    '''
+    Returns (df, labels_dict). Results are memoized per CIK for ttl seconds, so get_companyData and the
+    annual and quarterly facts share one download and parse. Every caller gets its own copy, so changing
+    it doesn't change what the next caller sees.
+    '''
+    with _companyFactsLock:
+        entry = _companyFactsFrames.get(cik)
+    if entry and time.monotonic() - entry[0] < ttl:
+        df, labels_dict = entry[1]
+        return df.copy(), dict(labels_dict)
+
+    companyFacts = get_companyFactsData(headers, cik)
+    us_gaap_data = companyFacts['facts']['us-gaap']
+    with metrics.span('parse'):
+        labels_dict = {fact: details['label'] for fact, details in us_gaap_data.items()}
+        result = (_companyFactsFrame(us_gaap_data), labels_dict)
+
+    with _companyFactsLock:
+        _companyFactsFrames[cik] = (time.monotonic(), result)
+        # Dicts keep insertion order, so the first keys are the oldest loads
+        while len(_companyFactsFrames) > max_entries:
+            del _companyFactsFrames[next(iter(_companyFactsFrames))]
+    return result[0].copy(), dict(result[1])
 
 def get_annualFacts(headers, cik, allForms):
     accession_data = get_formAccessionNumbers(allForms, '10-K')['accessionNumber']
     df, label_dict = get_companyFactsDataFrame(headers, cik)
     ten_k = df[df['accn'].isin(accession_data)]
     ten_k = ten_k[ten_k.index.isin(accession_data.index)]
-    pivot = ten_k.pivot_table(values='val', columns='fact', index='end')
+    pivot = ten_k.pivot_table(values='val', columns='fact', index='end', observed=True)
     pivot.rename(columns=label_dict, inplace=True)
     return pivot.T
 
@@ -310,29 +535,25 @@ def get_quarterlyFacts(headers, cik, allForms):
     df, label_dict = get_companyFactsDataFrame(headers, cik)
     ten_q = df[df['accn'].isin(accession_data)]
     ten_q = ten_q[ten_q.index.isin(accession_data.index)]
-    pivot = ten_q.pivot_table(values='val', columns='fact', index='end')
+    pivot = ten_q.pivot_table(values='val', columns='fact', index='end', observed=True)
     pivot.rename(columns=label_dict, inplace=True)
     return pivot.T
 
 def get_companyConcept(headers, cik):
-    companyConcept = requests.get((f'https://data.sec.gov/api/xbrl/companyconcept/CIK{cik}' f'/us-gaap/Assets.json'), headers=headers)
+    companyConcept = http_cache.get((f'https://data.sec.gov/api/xbrl/companyconcept/CIK{cik}' f'/us-gaap/Assets.json'), headers=headers)
     return pd.DataFrame.from_dict((companyConcept.json()['units']['USD']))    
 
 def get_companyData(headers, ticker, form, companyIdentifiers):
-    rate_limiter.wait()
     cik = get_cik(ticker=ticker, companyIdentifiers=companyIdentifiers)
     submissionMetadata = get_submissionMetadata(headers=headers, cik=cik)
     allForms = get_allForms(submissionMetadata=submissionMetadata)
     formAccessionNumber = get_recentFormAccession(allForms=allForms, form=form)
 
-    # Get document data
-    balanceSheet = get_statementDF(headers, cik, 'balance_sheet', formAccessionNumber, statement_keys_map)         
-    incomeStatement = get_statementDF(headers, cik, 'income_statement', formAccessionNumber, statement_keys_map)         
-    cashFlowStatement = get_statementDF(headers, cik, 'cash_flow_statement', formAccessionNumber, statement_keys_map) 
-    documentData = {'Balance Sheet': balanceSheet, 'Income Statement': incomeStatement, 'Cash Flow Statement': cashFlowStatement}        
+    # Get document data; FilingSummary.xml is read once for all three statements
+    statements = Filing(headers, cik, formAccessionNumber).get_statements(['balance_sheet', 'income_statement', 'cash_flow_statement'])
+    documentData = {'Balance Sheet': statements['balance_sheet'], 'Income Statement': statements['income_statement'], 'Cash Flow Statement': statements['cash_flow_statement']}
 
     # Get financial indicators reported
-    rate_limiter.wait()
     companyFactsDF = get_companyFactsDataFrame(headers=headers, cik=cik)[0]
 
     # Get annual and quarterly facts
@@ -340,7 +561,6 @@ def get_companyData(headers, ticker, form, companyIdentifiers):
     quarterlyFactsDF = get_quarterlyFacts(headers, cik, allForms)
 
     # Get XBRL disclosures, assets data
-    rate_limiter.wait()
     assetsData = get_companyConcept(headers=headers, cik=cik)
 
     get_documentText(headers, cik, form, formAccessionNumber, allForms)
@@ -348,11 +568,10 @@ def get_companyData(headers, ticker, form, companyIdentifiers):
 
 def get_documentText(headers, cik, form, formAccessionNumber, allForms):
     # TODO: doesn't work well for DJT, doesn't even pick up colomn ids for TSLA
-    session = requests.Session()
     doc_link = get_documentLink(allForms, form)
     formAccessionNumber = formAccessionNumber.replace('-', '')
     base_link = f'https://www.sec.gov/Archives/edgar/data/{cik}/{formAccessionNumber}/{doc_link}'
-    response = requests.get(base_link, headers=headers)
+    response = http_cache.get(base_link, headers=headers)
 
     if response.status_code == 200:
         soup = BeautifulSoup(response.text, 'html.parser')
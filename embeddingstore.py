@@ -0,0 +1,160 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from httpcache import CACHE_DIR
+
+class EmbeddingStore:
+    '''
+    Persistent, content-addressed store of embedding vectors keyed by (model, sha256 of the text).
+
+    Vectors are float32 rows appended to one flat file per (model, dimension), which is read
+    through np.memmap, and an SQLite index maps each key to its row. Once the files grow past
+    max_bytes the least recently used rows are dropped and the files are rewritten.
+    '''
+    def __init__(self, directory=None, max_bytes=1024 ** 3):
+        self.directory = directory or os.path.join(CACHE_DIR, 'embeddings')
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.memmaps = {}
+        self.hits = 0
+        self.misses = 0
+        self._db = None
+        self._db_lock = threading.Lock()
+
+    @property
+    def db(self):
+        '''
+        The SQLite index, created with the store directory on first use so importing this module touches no disk.
+        '''
+        if self._db is None:
+            with self._db_lock:
+                if self._db is None:
+                    os.makedirs(self.directory, exist_ok=True)
+                    db = sqlite3.connect(os.path.join(self.directory, 'index.sqlite'), check_same_thread=False)
+                    db.execute('''CREATE TABLE IF NOT EXISTS vectors (
+                        key TEXT PRIMARY KEY, model TEXT, dim INTEGER, row INTEGER, accessed_at REAL)''')
+                    db.execute('CREATE INDEX IF NOT EXISTS vectors_accessed_at ON vectors (accessed_at)')
+                    db.commit()
+                    self._db = db
+        return self._db
+
+    @staticmethod
+    def key(model, text):
+        return hashlib.sha256(f'{model}\0{text}'.encode('utf-8')).hexdigest()
+
+    def _path(self, model, dim):
+        return os.path.join(self.directory, f"{re.sub(r'[^A-Za-z0-9_.-]', '_', model)}-{dim}.f32")
+
+    def _matrix(self, model, dim):
+        path = self._path(model, dim)
+        if path not in self.memmaps:
+            if not os.path.exists(path) or os.path.getsize(path) == 0:
+                return None
+            self.memmaps[path] = np.memmap(path, dtype=np.float32, mode='r').reshape(-1, dim)
+        return self.memmaps[path]
+
+    def get_many(self, model, texts):
+        '''
+        Returns a list with a float32 vector for every text that is in the store and None for the rest.
+        '''
+        keys = [self.key(model, text) for text in texts]
+        found = {}
+        with self.lock:
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                query = f"SELECT key, dim, row FROM vectors WHERE model = ? AND key IN ({','.join('?' * len(batch))})"
+                for key, dim, row in self.db.execute(query, [model] + batch):
+                    found[key] = (dim, row)
+
+            vectors = []
+            for key in keys:
+                if key in found:
+                    dim, row = found[key]
+                    matrix = self._matrix(model, dim)
+                    vectors.append(np.array(matrix[row]) if matrix is not None and row < len(matrix) else None)
+                else:
+                    vectors.append(None)
+
+            now = time.time()
+            self.db.executemany('UPDATE vectors SET accessed_at = ? WHERE key = ?', [(now, key) for key in found])
+            self.db.commit()
+
+            hits = sum(vector is not None for vector in vectors)
+            self.hits += hits
+            self.misses += len(vectors) - hits
+        return vectors
+
+    def put_many(self, model, texts, vectors):
+        if not texts:
+            return
+        matrix = np.asarray(vectors, dtype=np.float32)
+        dim = matrix.shape[1]
+        path = self._path(model, dim)
+        now = time.time()
+        # Opening the index also creates the directory the vector file goes in
+        db = self.db
+        with self.lock:
+            first_row = os.path.getsize(path) // (dim * 4) if os.path.exists(path) else 0
+            with open(path, 'ab') as f:
+                f.write(matrix.tobytes())
+            self.memmaps.pop(path, None)
+            # Re-embedded texts point at their new row; the old one is reclaimed by the next eviction
+            db.executemany('''INSERT INTO vectors VALUES (?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET
+                model = excluded.model, dim = excluded.dim, row = excluded.row, accessed_at = excluded.accessed_at''', [
+                (self.key(model, text), model, dim, first_row + i, now) for i, text in enumerate(texts)])
+            db.commit()
+        self._evict()
+
+    def _evict(self):
+        with self.lock:
+            # Measure the files rather than the index so rows orphaned by re-inserted keys count too
+            total = sum(os.path.getsize(os.path.join(self.directory, name)) for name in os.listdir(self.directory) if name.endswith('.f32'))
+            if total <= self.max_bytes:
+                return
+
+            # Keep the most recently used rows that fit in 90% of the limit, then rewrite each file with only those
+            budget = self.max_bytes * 0.9
+            keep = {}
+            for key, model, dim, row, accessed_at in self.db.execute('SELECT key, model, dim, row, accessed_at FROM vectors ORDER BY accessed_at DESC'):
+                if budget < dim * 4:
+                    break
+                budget -= dim * 4
+                keep.setdefault((model, dim), []).append((key, row, accessed_at))
+
+            for model, dim in {(model, dim) for model, dim in self.db.execute('SELECT DISTINCT model, dim FROM vectors')}:
+                path = self._path(model, dim)
+                rows = sorted(keep.get((model, dim), []), key=lambda item: item[1])
+                matrix = self._matrix(model, dim)
+                kept = np.array(matrix[[row for _, row, _ in rows]]) if rows and matrix is not None else np.empty((0, dim), dtype=np.float32)
+                self.memmaps.pop(path, None)
+                tmp_path = f'{path}.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.write(kept.astype(np.float32).tobytes())
+                os.replace(tmp_path, path)
+                self.db.execute('DELETE FROM vectors WHERE model = ? AND dim = ?', (model, dim))
+                self.db.executemany('INSERT INTO vectors (key, model, dim, row, accessed_at) VALUES (?, ?, ?, ?, ?)', [
+                    (key, model, dim, new_row, accessed_at) for new_row, (key, _, accessed_at) in enumerate(rows)])
+            self.db.commit()
+
+    def stats(self):
+        entries, size = 0, 0
+        # Nothing has been stored yet if the index was never opened, and reading stats shouldn't create it
+        if self._db is not None:
+            with self.lock:
+                entries, size = self._db.execute('SELECT COUNT(*), COALESCE(SUM(dim * 4), 0) FROM vectors').fetchone()
+        with self.lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / lookups if lookups else 0.0,
+            'entries': entries,
+            'bytes': size,
+        }
+
+embedding_store = EmbeddingStore()
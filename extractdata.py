@@ -1,67 +1,486 @@
-import requests
-from bs4 import BeautifulSoup
+from lxml import etree
 from urllib.parse import urljoin
 import pandas as pd
+import numpy as np
 import re
-from openai import OpenAI
+import openai
+from openai import OpenAI, AsyncOpenAI
 import tiktoken
-from scipy import spatial
 import json
+import asyncio
+import random
+import time
+import collections
+import contextlib
+import functools
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from httpcache import http_cache
+from embeddingstore import embedding_store
+from llmcache import llm_cache
+from metrics import metrics
+
+# bs4's get_text skips the contents of these tags, so the lxml walk does too
+SKIPPED_TAGS = {'script', 'style', 'template'}
+
+class _ProxyHTMLTarget:
+    '''
+    lxml parser target that collects the document text, image URLs and per-table text in a single
+    pass over the parser events, without building a tree. Strings are stripped and empty ones dropped,
+    matching BeautifulSoup's get_text(strip=True).
+    '''
+    def __init__(self, url):
+        self.url = url
+        self.text = []
+        self.images = []
+        self.tables = []
+        self.open_tables = []
+        self.pending = []
+        self.skip_depth = 0
+
+    def _flush(self):
+        if not self.pending:
+            return
+        string = ''.join(self.pending).strip()
+        self.pending = []
+        if string:
+            self._add_string(string)
+            for _, table_strings in self.open_tables:
+                table_strings.append(string)
+
+    def _add_string(self, string):
+        self.text.append(string)
+
+    def _add_image(self, image_url):
+        self.images.append(image_url)
+
+    def _open_table(self):
+        # Reserve the slot now so nested tables come out in document order, like soup.find_all('table')
+        self.tables.append('')
+        return len(self.tables) - 1
+
+    def _close_table(self, position, table_text):
+        self.tables[position] = table_text
+
+    def start(self, tag, attrib):
+        self._flush()
+        if tag in SKIPPED_TAGS:
+            self.skip_depth += 1
+        elif tag == 'img':
+            src = attrib.get('src')
+            if src:
+                self._add_image(urljoin(self.url, src))
+        elif tag == 'table':
+            self.open_tables.append((self._open_table(), []))
+
+    def end(self, tag):
+        self._flush()
+        if tag in SKIPPED_TAGS:
+            self.skip_depth = max(self.skip_depth - 1, 0)
+        elif tag == 'table' and self.open_tables:
+            position, table_strings = self.open_tables.pop()
+            self._close_table(position, ' '.join(table_strings))
+
+    def data(self, data):
+        if not self.skip_depth:
+            self.pending.append(data)
+
+    def comment(self, text):
+        self._flush()
+
+    def close(self):
+        self._flush()
+        return '\n'.join(self.text), self.images, [table for table in self.tables if table != '']
+
+# Text blocks in streaming mode end after one of these once they are long enough
+BLOCK_TAGS = {'p', 'div', 'tr', 'table', 'li', 'ul', 'ol', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'br', 'hr', 'center'}
+
+class _StreamingProxyHTMLTarget(_ProxyHTMLTarget):
+    '''
+    Variant of _ProxyHTMLTarget that queues ('text', block), ('table', table_text) and ('image', url)
+    events instead of accumulating the whole document, so memory stays bounded by block_size and
+    max_table_chars. A table whose text grows past max_table_chars is given up as a table: what it has
+    buffered, nested tables included, is emitted as text blocks and the rest of it streams as ordinary
+    text. Tables nested more than max_table_depth deep are kept as part of the table around them.
+    '''
+    def __init__(self, url, block_size, tables_in_text=True, max_table_chars=256 * 1024, max_table_depth=8):
+        super().__init__(url)
+        self.block_size = block_size
+        self.tables_in_text = tables_in_text
+        self.max_table_chars = max_table_chars
+        self.max_table_depth = max_table_depth
+        self.block = []
+        self.block_length = 0
+        self.events = collections.deque()
+        # Characters buffered per open table, and how many of the outermost open tables were given up
+        self.table_lengths = []
+        self.spilled = 0
+        self.flattened = 0
+
+    def _flush(self):
+        if not self.pending:
+            return
+        string = ''.join(self.pending).strip()
+        self.pending = []
+        if not string:
+            return
+        self._add_string(string)
+        for i in range(self.spilled, len(self.open_tables)):
+            self.open_tables[i][1].append(string)
+            self.table_lengths[i] += len(string) + 1
+        # An enclosing table has buffered at least as much as any table inside it, so it overflows first
+        if len(self.open_tables) > self.spilled and self.table_lengths[self.spilled] > self.max_table_chars:
+            self._spill()
+
+    def _spill(self):
+        _, strings = self.open_tables[self.spilled]
+        if not self.tables_in_text:
+            for string in strings:
+                self._append_block(string)
+        for i in range(self.spilled, len(self.open_tables)):
+            self.open_tables[i][1].clear()
+            self.table_lengths[i] = 0
+        self.spilled = len(self.open_tables)
+
+    def _add_string(self, string):
+        if len(self.open_tables) > self.spilled and not self.tables_in_text:
+            return
+        self._append_block(string)
+
+    def _append_block(self, string):
+        self.block.append(string)
+        self.block_length += len(string) + 1
+        # Don't let a document without block-level tags grow a block without bound
+        if self.block_length >= max(4 * self.block_size, 16384):
+            self._emit_block()
+
+    def _emit_block(self):
+        if self.block:
+            self.events.append(('text', '\n'.join(self.block)))
+            self.block = []
+            self.block_length = 0
+
+    def _add_image(self, image_url):
+        self.events.append(('image', image_url))
+
+    def _open_table(self):
+        self.table_lengths.append(0)
+        return None
+
+    def _close_table(self, position, table_text):
+        self.table_lengths.pop()
+        self.spilled = min(self.spilled, len(self.open_tables))
+        if table_text != '':
+            self.events.append(('table', table_text))
+
+    def start(self, tag, attrib):
+        if tag == 'table' and len(self.open_tables) >= self.max_table_depth:
+            self._flush()
+            self.flattened += 1
+            return
+        super().start(tag, attrib)
+
+    def end(self, tag):
+        if tag == 'table' and self.flattened:
+            self._flush()
+            self.flattened -= 1
+        else:
+            super().end(tag)
+        if tag in BLOCK_TAGS and self.block_length >= self.block_size:
+            self._emit_block()
+
+    def close(self):
+        self._flush()
+        self._emit_block()
+
+def parse_html(content, url, record=True):
+    '''
+    Returns (text, images, tables) for an HTML document given as bytes or str. With record=False the parse
+    isn't timed into metrics, for worker processes whose metrics never reach the parent.
+    '''
+    with metrics.span('parse') if record else contextlib.nullcontext():
+        parser = etree.HTMLParser(target=_ProxyHTMLTarget(url), huge_tree=True)
+        parser.feed(content)
+        return parser.close()
+
+def iter_text_and_images(url, headers, chunk_size=64 * 1024, block_size=4096, tables_in_text=True, max_table_chars=256 * 1024, max_table_depth=8):
+    '''
+    Streaming counterpart of get_text_and_images for very large documents. Yields ('text', block),
+    ('table', table_text) and ('image', image_url) tuples while the document is still downloading.
+    Text blocks are roughly block_size characters and end on block-level tags (block_size=1 gives one
+    block per paragraph); a nested table is yielded before the table that contains it. With
+    tables_in_text=False table contents only come through the 'table' events, except for tables larger
+    than max_table_chars, which come through as text blocks (see _StreamingProxyHTMLTarget).
+    '''
+    target = _StreamingProxyHTMLTarget(url, block_size, tables_in_text=tables_in_text, max_table_chars=max_table_chars, max_table_depth=max_table_depth)
+    parser = etree.HTMLParser(target=target, huge_tree=True)
+    # Parsing is interleaved with the download, so its time is added up and recorded once per document
+    parse_seconds = 0.0
+    try:
+        for chunk in http_cache.stream(url, headers=headers, chunk_size=chunk_size):
+            start = time.perf_counter()
+            parser.feed(chunk)
+            parse_seconds += time.perf_counter() - start
+            while target.events:
+                yield target.events.popleft()
+        start = time.perf_counter()
+        parser.close()
+        parse_seconds += time.perf_counter() - start
+    finally:
+        metrics.observe('parse', parse_seconds)
+    while target.events:
+        yield target.events.popleft()
 
 def get_text_and_images(url, headers):
-    response = requests.get(url, headers=headers)
+    response = http_cache.get(url, headers=headers)
     if response.status_code != 200:
         print(f"Failed to retrieve the webpage. Status code: {response.status_code}")
         return None
-    soup = BeautifulSoup(response.content, 'html.parser')
-    text = soup.get_text(separator='\n', strip=True)
-    
-    images = []
-    for img in soup.find_all('img'):
-        src = img.get('src')
-        if src:
-            img_url = urljoin(url, src)
-            images.append(img_url)
-            
-    tables = []
-    for table in soup.find_all('table'):
-        if table is not None:
-            table_soup = BeautifulSoup(str(table), 'html.parser')
-            table_text = table_soup.get_text(separator=' ', strip=True)
-            if table_text != '':
-                tables.append(table_text)
-    
-    return text, images, tables
+    return parse_html(response.content, url)
+
+@functools.lru_cache(maxsize=None)
+def _get_encoding(model):
+    # Building an encoding is expensive, so each model's is created once per process
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding('cl100k_base')
 
 def count_tokens(text, model="gpt-3.5-turbo"):
-    encoding = tiktoken.encoding_for_model(model)
-    return len(encoding.encode(text))
+    return len(_get_encoding(model).encode(text))
+
+# Sentence-ish boundaries used to split paragraphs or tables that don't fit in one chunk
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?;:])\s+')
+
+def _shingles(text, size):
+    words = re.sub(r'\W+', ' ', text.lower()).split()
+    if len(words) <= size:
+        return {tuple(words)}
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def deduplicate_chunks(chunks, threshold=0.9, shingle_size=5):
+    """Drops chunks whose word shingles have a Jaccard similarity of at least threshold with an earlier kept
+    chunk, keeping the first. This catches exact repeats, repeats differing only in case, punctuation or
+    whitespace, and boilerplate repeated with small edits (a changed date or name)."""
+    unique = []
+    kept_shingles = []
+    # shingle -> indexes of kept chunks containing it, so each chunk is only compared with chunks it overlaps
+    postings = collections.defaultdict(list)
+    for chunk in chunks:
+        shingles = _shingles(chunk, shingle_size)
+        overlaps = collections.Counter(i for shingle in shingles for i in postings.get(shingle, ()))
+        if any(shared / (len(shingles) + len(kept_shingles[i]) - shared) >= threshold for i, shared in overlaps.items()):
+            continue
+        for shingle in shingles:
+            postings[shingle].append(len(unique))
+        kept_shingles.append(shingles)
+        unique.append(chunk)
+    return unique
+
+def _split_block(block, encoding, max_tokens, overlap):
+    tokens = len(encoding.encode(block))
+    if tokens <= max_tokens:
+        return [(block, tokens)]
+
+    pieces, current, current_tokens = [], [], 0
+    for sentence in SENTENCE_BOUNDARY.split(block):
+        sentence_tokens = encoding.encode(sentence)
+        if current and current_tokens + len(sentence_tokens) > max_tokens:
+            pieces.append((' '.join(current), current_tokens))
+            current, current_tokens = [], 0
+        if len(sentence_tokens) <= max_tokens:
+            current.append(sentence)
+            current_tokens += len(sentence_tokens)
+            continue
+        # No usable boundary inside this sentence, so fall back to overlapping token windows
+        step = max(max_tokens - overlap, 1)
+        for start in range(0, len(sentence_tokens), step):
+            window = sentence_tokens[start:start + max_tokens]
+            pieces.append((encoding.decode(window), len(window)))
+            if start + max_tokens >= len(sentence_tokens):
+                break
+    if current:
+        pieces.append((' '.join(current), current_tokens))
+    return pieces
+
+def chunk_text(blocks, max_tokens=256, overlap=32, model='text-embedding-3-large'):
+    """Packs paragraphs and tables into chunks of at most max_tokens tokens without splitting them, unless a
+    single block is too long; those are split on sentence boundaries, then on token windows overlapping by
+    overlap tokens. Repeated boilerplate is dropped both before and after packing."""
+    with metrics.span('chunk'):
+        encoding = _get_encoding(model)
+        chunks, current, current_tokens = [], [], 0
+        for block in deduplicate_chunks(blocks):
+            for piece, tokens in _split_block(block, encoding, max_tokens, overlap):
+                if current and current_tokens + tokens > max_tokens:
+                    chunks.append(' '.join(current))
+                    current, current_tokens = [], 0
+                current.append(piece)
+                current_tokens += tokens
+        if current:
+            chunks.append(' '.join(current))
+        return deduplicate_chunks(chunks)
+
+def pack_context(strings, max_tokens, model='gpt-4o'):
+    """Returns the leading strings (highest ranked first) that fit together in max_tokens tokens."""
+    encoding = _get_encoding(model)
+    packed, used = [], 0
+    for string in strings:
+        tokens = len(encoding.encode(string))
+        if used + tokens > max_tokens:
+            break
+        packed.append(string)
+        used += tokens
+    return packed
+
+def _embedding_batches(texts, encoding, batch_size, max_batch_tokens):
+    batch, batch_tokens = [], 0
+    for i, text in enumerate(texts):
+        tokens = len(encoding.encode(text))
+        if batch and (len(batch) >= batch_size or batch_tokens + tokens > max_batch_tokens):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(i)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+def get_embeddings(client, texts, model='text-embedding-3-large', batch_size=256, max_batch_tokens=200000, max_concurrency=4, store=embedding_store):
+    """Embeds texts in batches of at most batch_size inputs and max_batch_tokens tokens, with up to
+    max_concurrency requests in flight. Embeddings are returned as float32 arrays in the same order as texts.
+    Texts already in store are not sent again; pass store=None to always call the API."""
+    embeddings = store.get_many(model, texts) if store is not None else [None] * len(texts)
+    missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+    if not missing:
+        return embeddings
+
+    encoding = _get_encoding(model)
+
+    def embed(batch):
+        response = client.embeddings.create(input=[texts[i] for i in batch], model=model)
+        metrics.add('llm_requests', kind='embeddings', model=model)
+        if response.usage is not None:
+            metrics.add('llm_tokens', response.usage.prompt_tokens, direction='sent', model=model)
+        # The API tags each embedding with the position of its input, which is what we rely on for ordering
+        return batch, [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    missing_texts = [texts[i] for i in missing]
+    with metrics.span('embed'):
+        batches = [[missing[j] for j in batch] for batch in _embedding_batches(missing_texts, encoding, batch_size, max_batch_tokens)]
+        with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(batches)))) as executor:
+            for batch, batch_embeddings in executor.map(embed, batches):
+                for i, embedding in zip(batch, batch_embeddings):
+                    embeddings[i] = np.asarray(embedding, dtype=np.float32)
+                if store is not None:
+                    store.put_many(model, [texts[i] for i in batch], batch_embeddings)
+    return embeddings
+
+def embedding_matrix(embeddings) -> np.ndarray:
+    """Stacks embeddings into one contiguous float32 matrix with unit-length rows, so cosine similarity is a dot product."""
+    matrix = np.array(np.vstack(list(embeddings)), dtype=np.float32, order='C')
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    matrix /= norms
+    return matrix
+
+def _top_n(strings, scores, top_n):
+    top_n = min(top_n, len(scores))
+    if top_n <= 0:
+        return (), ()
+    # argpartition finds the top_n in O(n); only those get sorted
+    top = np.argpartition(-scores, top_n - 1)[:top_n]
+    top = top[np.argsort(-scores[top], kind='stable')]
+    return tuple(strings[i] for i in top), tuple(float(scores[i]) for i in top)
 
 def strings_ranked_by_relatedness(
-    query: str,
+    query,
     df: pd.DataFrame,
-    relatedness_fn=lambda x, y: 1 - spatial.distance.cosine(x, y),
+    relatedness_fn=None,
     top_n: int = 100,
-    api_key: str = "APIKEY"
-) -> tuple[list[str], list[float]]:
-    """Returns a list of strings and relatednesses, sorted from most related to least."""
+    api_key: str = "APIKEY",
+    matrix: np.ndarray = None,
+    embedding_model: str = "text-embedding-3-large"
+):
+    """Returns a list of strings and relatednesses, sorted from most related to least.
+
+    query may also be a list of queries, in which case they are embedded in one request and ranked with one
+    matrix product, and a list of (strings, relatednesses) is returned. Pass matrix=embedding_matrix(df['Embeddings'])
+    to reuse the normalized chunk matrix across calls. relatedness_fn falls back to scoring row by row."""
+    queries = [query] if isinstance(query, str) else list(query)
     client = OpenAI(api_key=api_key)
-    query_embedding_response = client.embeddings.create(
-        model="text-embedding-3-large",
-        input=query,
-    )
-    query_embedding = query_embedding_response.data[0].embedding
-    strings_and_relatednesses = [
-        (row["Text"], relatedness_fn(query_embedding, row["Embeddings"]))
-        for i, row in df.iterrows()
-    ]
-    strings_and_relatednesses.sort(key=lambda x: x[1], reverse=True)
-    strings, relatednesses = zip(*strings_and_relatednesses)
-    return strings[:top_n], relatednesses[:top_n]
+    query_embeddings = get_embeddings(client, queries, model=embedding_model)
+    strings = df["Text"].tolist()
+
+    with metrics.span('rank'):
+        if relatedness_fn is not None:
+            scores = np.array([[relatedness_fn(query_embedding, embedding) for embedding in df["Embeddings"]] for query_embedding in query_embeddings])
+        else:
+            if matrix is None:
+                matrix = embedding_matrix(df["Embeddings"])
+            scores = embedding_matrix(query_embeddings) @ matrix.T
+
+        results = [_top_n(strings, query_scores, top_n) for query_scores in scores]
+    return results[0] if isinstance(query, str) else results
+
+# Transient API failures worth retrying; anything else (bad request, auth) is raised straight away
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError)
+
+def _parse_json(raw):
+    try:
+        return json.loads(raw.strip())
+    except ValueError as e:
+        print(f'Completion was not valid JSON: {e}')
+        return None
+
+async def _create_completion(client, retries=5, backoff=1.0, cache=llm_cache, attempt_key=None, parse_json=False, **kwargs):
+    """Returns the text of a chat completion, or (text, parsed JSON or None) with parse_json=True. Results are
+    served from and saved to cache, except parse_json replies that didn't parse; attempt_key tells deliberate
+    repeats of an identical request apart."""
+    if cache is not None:
+        params = {name: value for name, value in kwargs.items() if name not in ('model', 'messages')}
+        if attempt_key is not None:
+            params['attempt_key'] = attempt_key
+        key = cache.key(kwargs['model'], kwargs['messages'], **params)
+        cached = cache.get(key)
+        if cached is not None and not parse_json:
+            return cached[0]
+        if cached is not None:
+            # The entry may come from a call that didn't ask for JSON
+            parsed = cached[1] if cached[1] is not None else _parse_json(cached[0])
+            if parsed is not None:
+                return cached[0], parsed
+
+    with metrics.span('llm'):
+        for attempt in range(retries + 1):
+            try:
+                metrics.add('llm_requests', kind='chat', model=kwargs['model'])
+                completion = await client.chat.completions.create(**kwargs)
+                break
+            except RETRYABLE_ERRORS as e:
+                if attempt == retries:
+                    raise
+                delay = backoff * 2 ** attempt * (0.5 + random.random())
+                print(f'Completion attempt {attempt + 1} failed ({e}), retrying in {delay:.1f}s')
+                await asyncio.sleep(delay)
+    if completion.usage is not None:
+        metrics.add('llm_tokens', completion.usage.prompt_tokens, direction='sent', model=kwargs['model'])
+        metrics.add('llm_tokens', completion.usage.completion_tokens, direction='received', model=kwargs['model'])
+
+    raw = completion.choices[0].message.content
+    parsed = _parse_json(raw) if parse_json else None
+    # A reply that should have been JSON but wasn't is not kept, so asking again gets a fresh completion
+    if cache is not None and (parsed is not None or not parse_json):
+        cache.put(key, kwargs['model'], raw, parsed)
+    return (raw, parsed) if parse_json else raw
+
+async def extract_lite_data_gpt_async(url, chunk_size=1024, overlap=256, return_json=False, embedding_model='text-embedding-3-large', llm_model='gpt-4o', headers="ENTER EMAIL", api_key='APIKEY', client=None, use_cache=True):
+    if client is None:
+        async with AsyncOpenAI(api_key=api_key, max_retries=0) as client:
+            return await extract_lite_data_gpt_async(url, chunk_size=chunk_size, overlap=overlap, return_json=return_json, embedding_model=embedding_model, llm_model=llm_model, headers=headers, api_key=api_key, client=client, use_cache=use_cache)
+    cache = llm_cache if use_cache else None
 
-def extract_lite_data_gpt(url, chunk_size=1024, overlap=256, return_json=False, embedding_model='text-embedding-3-large', llm_model='gpt-4o', headers="ENTER EMAIL", api_key='APIKEY'):
     url = url.rsplit('/', 1)[0] + "/R2.htm"
-    result = get_text_and_images(url, headers)
+    result = await asyncio.to_thread(get_text_and_images, url, headers)
     if result == None:
         return f'ERROR WITH URL {url}'
     else:
@@ -74,7 +493,6 @@ def extract_lite_data_gpt(url, chunk_size=1024, overlap=256, return_json=False,
 
     all_data = " ".join(text.split('\n') + (tables))
 
-    client = OpenAI(api_key=api_key)
     text = all_data.replace("\n", " ")
 
     query_text = f"""What were the bonus targets for the company? This is often reported in some financial metric for the company like EBITDA, Revenue, FCF, but can include other company-specific metrics.
@@ -102,20 +520,18 @@ def extract_lite_data_gpt(url, chunk_size=1024, overlap=256, return_json=False,
         {"role": "user", "content": "Query: " + query_text + "\n Relevant texts:" + all_data}
     ]
 
-    simplified_request = client.chat.completions.create(
+    raw, structured_dict = await _create_completion(
+        client,
+        cache=cache,
+        parse_json=True,
         model=llm_model,
         messages=conversation,
         temperature=0.2,
         max_tokens=300,
         top_p=0.2
     )
-    
-    try:
-        structured_data = simplified_request.choices[0].message.content.strip()
-        structured_dict = json.loads(structured_data)
+    if structured_dict is not None:
         return structured_dict
-    except Exception as e:
-        print(f'Initial attempt failed: {e}')       
 
     reformat_conversation = [
         {"role": "system", "content": """You are an expert computer scientiest. Your task is to help me extract the following data in JSON format. Return your answer in JSON format return it as a JSON object:
@@ -126,12 +542,18 @@ def extract_lite_data_gpt(url, chunk_size=1024, overlap=256, return_json=False,
         **Total CEO Compensation $**
 
         If any information is not found in the provided text, mark it as "NA". Please do not start your response with "json", and instead just return the dictionary."""},
-        {"role": "user", "content": "Data:" + simplified_request.choices[0].message.content.strip()}
+        {"role": "user", "content": "Data:" + raw.strip()}
     ]
 
+    attempts = 0
     while attempts < 5:
         try:
-            simplified_request = client.chat.completions.create(
+            # attempt_key keeps each retry its own cache entry, so a cached bad answer isn't replayed five times
+            _, structured_dict = await _create_completion(
+                client,
+                cache=cache,
+                attempt_key=attempts,
+                parse_json=True,
                 model="gpt-3.5-turbo-0125",
                 messages=reformat_conversation,
                 max_tokens=200,
@@ -139,16 +561,17 @@ def extract_lite_data_gpt(url, chunk_size=1024, overlap=256, return_json=False,
                 stop=None,
                 temperature=0.7,
             )
-
-            structured_data = simplified_request.choices[0].message.content.strip()
-            structured_dict = json.loads(structured_data)
-            return structured_dict
+            if structured_dict is not None:
+                return structured_dict
+            print(f'Attempt {attempts + 1} failed: response was not valid JSON')
 
         except Exception as e:
             print(f'Attempt {attempts + 1} failed: {e}')
-            attempts += 1
+        attempts += 1
 
-    simplified_request = client.chat.completions.create(
+    structured_data = await _create_completion(
+        client,
+        cache=cache,
         model="gpt-3.5-turbo-0125",
         messages=conversation,
         max_tokens=200,
@@ -156,49 +579,83 @@ def extract_lite_data_gpt(url, chunk_size=1024, overlap=256, return_json=False,
         stop=None,
         temperature=0.2,
     )
-
-    structured_data = simplified_request.choices[0].message.content.strip()
-    return structured_data
-
-def extract_full_data_gpt(url, query, api_key, chunk_size=1024, overlap=256, embedding_model='text-embedding-3-large', llm_model='gpt-4o', single_shot=True, headers="ENTER EMAIL"):
-    result = get_text_and_images(url, headers)
-    if result == None:
-        return f'ERROR WITH URL {url}'
-    else:
-        text = result[0]
-        tables = result[2]
-
-    text = '\n'.join([text_item for text_item in text.split('\n') if bool(re.search(r'\d', text_item))])
-    tables= [table for table in tables if bool(re.search(r'\d', table) and not re.search(r'\b2024\b|\b20\s24\b', table))]
-
-    all_data = " ".join(text.split('\n') + (tables))
-    client = OpenAI(api_key=api_key)
-    text = all_data.replace("\n", " ")
-    text_chunks = []
-    start_idx = 0
-
-    while start_idx < len(text):
-        end_idx = min(start_idx + chunk_size, len(text))
-        text_chunks.append(text[start_idx:end_idx])
-        start_idx += chunk_size - overlap
-
-    embeddings = [client.embeddings.create(input = [text_piece], model=embedding_model).data[0].embedding for text_piece in text_chunks]
-
-    df = pd.DataFrame({
-        'Text': text_chunks,
-        'Embeddings': embeddings
-    })
+    return structured_data.strip()
+
+def extract_lite_data_gpt(url, chunk_size=1024, overlap=256, return_json=False, embedding_model='text-embedding-3-large', llm_model='gpt-4o', headers="ENTER EMAIL", api_key='APIKEY', use_cache=True):
+    return asyncio.run(extract_lite_data_gpt_async(url, chunk_size=chunk_size, overlap=overlap, return_json=return_json, embedding_model=embedding_model, llm_model=llm_model, headers=headers, api_key=api_key, use_cache=use_cache))
+
+async def extract_lite_data_batch_async(urls, api_key, headers, max_concurrency=8, **kwargs):
+    """Runs the lite extraction for every distinct URL with at most max_concurrency filings in flight, sharing one client.
+    Returns a dict of url -> result; a filing that fails after all retries gets an error string instead."""
+    unique_urls = list(dict.fromkeys(urls))
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async with AsyncOpenAI(api_key=api_key, max_retries=0) as client:
+        async def extract(url):
+            async with semaphore:
+                try:
+                    return await extract_lite_data_gpt_async(url, headers=headers, api_key=api_key, client=client, **kwargs)
+                except Exception as e:
+                    print(f'Extraction failed for {url}: {e}')
+                    return f'ERROR WITH URL {url}: {e}'
+
+        results = await asyncio.gather(*(extract(url) for url in unique_urls))
+    return dict(zip(unique_urls, results))
+
+def extract_lite_data_batch(urls, api_key, headers, max_concurrency=8, **kwargs):
+    """Synchronous wrapper around extract_lite_data_batch_async; returns results in the same order as urls."""
+    results = asyncio.run(extract_lite_data_batch_async(urls, api_key, headers, max_concurrency=max_concurrency, **kwargs))
+    return [results[url] for url in urls]
+
+async def extract_full_data_gpt_async(url, query, api_key, chunk_size=256, overlap=32, embedding_model='text-embedding-3-large', llm_model='gpt-4o', single_shot=True, headers="ENTER EMAIL", embedding_batch_size=256, embedding_concurrency=4, context_tokens=12000, client=None, use_cache=True):
+    # chunk_size and overlap are in tokens; context_tokens caps the retrieved text sent with each completion
+    if client is None:
+        async with AsyncOpenAI(api_key=api_key, max_retries=0) as client:
+            return await extract_full_data_gpt_async(url, query, api_key, chunk_size=chunk_size, overlap=overlap, embedding_model=embedding_model, llm_model=llm_model, single_shot=single_shot, headers=headers,
+                                                     embedding_batch_size=embedding_batch_size, embedding_concurrency=embedding_concurrency, context_tokens=context_tokens, client=client, use_cache=use_cache)
+    cache = llm_cache if use_cache else None
+
+    def retrieve(queries, top_n):
+        # Download, chunk, embed and rank are blocking, so this runs in a worker thread
+        blocks = []
+        try:
+            for kind, value in iter_text_and_images(url, headers, block_size=1, tables_in_text=False):
+                if kind == 'text' and re.search(r'\d', value):
+                    blocks.append(value.replace('\n', ' '))
+                elif kind == 'table' and re.search(r'\d', value) and not re.search(r'\b2024\b|\b20\s24\b', value):
+                    blocks.append(value)
+        except requests.RequestException as e:
+            print(f"Failed to retrieve the webpage: {e}")
+            return None
+
+        text_chunks = chunk_text(blocks, max_tokens=chunk_size, overlap=overlap, model=embedding_model)
+        if not text_chunks:
+            print(f'No numeric text found in {url}')
+            return None
+        embeddings = get_embeddings(OpenAI(api_key=api_key), text_chunks, model=embedding_model, batch_size=embedding_batch_size, max_concurrency=embedding_concurrency)
+
+        df = pd.DataFrame({
+            'Text': text_chunks,
+            'Embeddings': embeddings
+        })
+        ranked = strings_ranked_by_relatedness(queries, df, top_n=top_n, api_key=api_key, matrix=embedding_matrix(embeddings), embedding_model=embedding_model)
+        return [pack_context(strings, context_tokens, model=llm_model) for strings, relatednesses in ranked]
 
     if single_shot==True:
 
-        strings, relatednesses = strings_ranked_by_relatedness(query, df, top_n=100, api_key=api_key)
+        ranked = await asyncio.to_thread(retrieve, [query], 100)
+        if ranked is None:
+            return f'ERROR WITH URL {url}'
+        strings = ranked[0]
 
         conversation = [
             {"role": "system", "content": "You are an expert financial analyst. Your task is to help me analyze Schedule 14A files and piece together executive compensation."},
             {"role": "user", "content": "Query: " + query + "\n Relevant texts:" + ' '.join(strings)}
         ]
 
-        completion = client.chat.completions.create(
+        completion = await _create_completion(
+            client,
+            cache=cache,
             model=llm_model,
             messages=conversation,
             temperature=0.2,
@@ -206,7 +663,7 @@ def extract_full_data_gpt(url, query, api_key, chunk_size=1024, overlap=256, emb
             top_p=0.2
         )
 
-        return completion.choices[0].message.content
+        return completion
     else:
         query_text_1 = """What were the metrics used for the bonus targets for the company? This is often reported in some financial metric for the company like EBITDA, Revenue, FCF, but can include other company-specific metrics.
 
@@ -229,34 +686,6 @@ def extract_full_data_gpt(url, query, api_key, chunk_size=1024, overlap=256, emb
 
         Please only return the names of the metrics used. You should also consolidate them (i.e. FCF and Adjusted FCF should be in one category). Your response should be one sentence with comma separated metrics."""
 
-        strings, relatednesses = strings_ranked_by_relatedness(query_text_1, df, top_n=50, api_key=api_key)
-
-        conversation_1 = [
-            {"role": "system", "content": "You are an expert financial analyst. Your task is to help me analyze Schedule 14A files and piece together executive compensation. Your goal is to return the metrics used for determining the bonus of the CEO. There should be 2-4 of them."},
-            {"role": "user", "content": "Query: " + query_text_1 + "\n Relevant texts:" + " ".join(strings)}
-        ]
-
-        completion_1 = client.chat.completions.create(
-            model=llm_model,
-            messages=conversation_1,
-            temperature=0.2,
-            max_tokens=40,
-            top_p=0.2
-        )
-
-        conversation_2 = [
-            {"role": "system", "content": "You are an expert financial analyst. Your task is to help me analyze Schedule 14A files and piece together executive compensation. Your goal is to extract data."},
-            {"role": "user", "content": f"Query: For each of these metrics {completion_1.choices[0].message.content}, please give me the proxy target and actual values. Keep your response as short as possible." + "\n Relevant texts:" + ' '.join(strings)}
-        ]
-
-        completion_2 = client.chat.completions.create(
-            model=llm_model,
-            messages=conversation_2,
-            temperature=0.2,
-            max_tokens=200,
-            top_p=0.2
-        )
-
         query_text_3 = """Looking at the executive compensation data, please fill out the data below:
 
         CEO name:
@@ -273,19 +702,64 @@ def extract_full_data_gpt(url, query, api_key, chunk_size=1024, overlap=256, emb
 
         Refrain from making any calculations. Only report what is found in the report; if something is not in the report, write NA."""
 
+        # Rank the chunks for the metrics question and the final fill-in question in one batched call
+        ranked = await asyncio.to_thread(retrieve, [query_text_1, query_text_3], 50)
+        if ranked is None:
+            return f'ERROR WITH URL {url}'
+        strings, strings_3 = ranked
+
+        async def metrics_and_targets():
+            conversation_1 = [
+                {"role": "system", "content": "You are an expert financial analyst. Your task is to help me analyze Schedule 14A files and piece together executive compensation. Your goal is to return the metrics used for determining the bonus of the CEO. There should be 2-4 of them."},
+                {"role": "user", "content": "Query: " + query_text_1 + "\n Relevant texts:" + " ".join(strings)}
+            ]
+
+            completion_1 = await _create_completion(
+                client,
+                cache=cache,
+                model=llm_model,
+                messages=conversation_1,
+                temperature=0.2,
+                max_tokens=40,
+                top_p=0.2
+            )
+
+            conversation_2 = [
+                {"role": "system", "content": "You are an expert financial analyst. Your task is to help me analyze Schedule 14A files and piece together executive compensation. Your goal is to extract data."},
+                {"role": "user", "content": f"Query: For each of these metrics {completion_1}, please give me the proxy target and actual values. Keep your response as short as possible." + "\n Relevant texts:" + ' '.join(strings)}
+            ]
+
+            completion_2 = await _create_completion(
+                client,
+                cache=cache,
+                model=llm_model,
+                messages=conversation_2,
+                temperature=0.2,
+                max_tokens=200,
+                top_p=0.2
+            )
+            return completion_1, completion_2
+
         conversation_3 = [
             {"role": "system", "content": "You are an expert financial analyst. Your task is to help me analyze Schedule 14A files and piece together executive compensation. Your goal is to extract data."},
-            {"role": "user", "content": f"Query {query_text_3}" + "\n Relevant texts:" + ' '.join(strings)}
+            {"role": "user", "content": f"Query {query_text_3}" + "\n Relevant texts:" + ' '.join(strings_3)}
         ]
 
-        completion_3 = client.chat.completions.create(
+        # Stage 3 only needs the retrieved text, so it runs alongside stages 1 -> 2
+        (completion_1, completion_2), completion_3 = await asyncio.gather(metrics_and_targets(), _create_completion(
+            client,
+            cache=cache,
             model=llm_model,
             messages=conversation_3,
             temperature=0.2,
             max_tokens=450,
             top_p=0.2
-        )
+        ))
+
+        print(completion_3)
 
-        print(completion_3.choices[0].message.content)
+        return completion_1, completion_2, completion_3
 
-        return completion_1.choices[0].message.content, completion_2.choices[0].message.content, completion_3.choices[0].message.content
+def extract_full_data_gpt(url, query, api_key, chunk_size=256, overlap=32, embedding_model='text-embedding-3-large', llm_model='gpt-4o', single_shot=True, headers="ENTER EMAIL", embedding_batch_size=256, embedding_concurrency=4, context_tokens=12000, use_cache=True):
+    return asyncio.run(extract_full_data_gpt_async(url, query, api_key, chunk_size=chunk_size, overlap=overlap, embedding_model=embedding_model, llm_model=llm_model, single_shot=single_shot, headers=headers,
+                                                   embedding_batch_size=embedding_batch_size, embedding_concurrency=embedding_concurrency, context_tokens=context_tokens, use_cache=use_cache))
@@ -0,0 +1,151 @@
+import os
+import json
+import time
+import sqlite3
+import argparse
+import threading
+import pandas as pd
+from httpcache import CACHE_DIR
+from companyindex import normalize_ticker
+
+FILING_COLUMNS = ['ticker', 'title', 'form', 'filingDate', 'primaryDocDescription', 'doc_url', 'cik', 'accessionNumber', 'fileNumber', 'filmNumber', 'reportDate']
+
+class FilingStore:
+    '''
+    Local SQLite database of company identifiers, 14A filing metadata and, optionally, extracted filing text.
+
+    Filings are indexed on (ticker, filingDate) and cik so get_sched14a_df can be answered without any
+    network access. sync_state records the newest accession number seen for each ticker, which is where
+    the next incremental sync starts.
+    '''
+    def __init__(self, path=None):
+        self.path = path or os.path.join(CACHE_DIR, 'filings.sqlite')
+        self.lock = threading.Lock()
+        self._db = None
+        self._db_lock = threading.Lock()
+
+    @property
+    def db(self):
+        '''
+        The SQLite database, created with its directory on first use so importing this module touches no disk.
+        '''
+        if self._db is None:
+            with self._db_lock:
+                if self._db is None:
+                    os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                    db = sqlite3.connect(self.path, check_same_thread=False)
+                    db.executescript(f'''
+                        CREATE TABLE IF NOT EXISTS companies (ticker TEXT PRIMARY KEY, cik TEXT, title TEXT);
+                        CREATE INDEX IF NOT EXISTS companies_cik ON companies (cik);
+                        CREATE TABLE IF NOT EXISTS filings ({', '.join(f'{column} TEXT' for column in FILING_COLUMNS)},
+                            PRIMARY KEY (ticker, accessionNumber));
+                        CREATE INDEX IF NOT EXISTS filings_ticker_date ON filings (ticker, filingDate);
+                        CREATE INDEX IF NOT EXISTS filings_cik ON filings (cik);
+                        CREATE TABLE IF NOT EXISTS texts (accessionNumber TEXT PRIMARY KEY, text TEXT, images TEXT, tables TEXT);
+                        CREATE TABLE IF NOT EXISTS sync_state (ticker TEXT PRIMARY KEY, last_accession TEXT, synced_at REAL);
+                    ''')
+                    db.commit()
+                    self._db = db
+        return self._db
+
+    def put_companies(self, companies):
+        '''
+        companies is an iterable of (ticker, cik, title) tuples.
+        '''
+        with self.lock:
+            self.db.executemany('INSERT OR REPLACE INTO companies VALUES (?, ?, ?)', list(companies))
+            self.db.commit()
+
+    def put_filings(self, df):
+        '''
+        Stores rows laid out like the get_sched14a_df result; rows already in the store are replaced.
+        '''
+        if df.empty:
+            return
+        rows = df.reindex(columns=FILING_COLUMNS).astype(object)
+        rows = rows.where(rows.notna(), None)
+        for column in ('filingDate', 'reportDate'):
+            rows[column] = [value.isoformat() if hasattr(value, 'isoformat') else value for value in rows[column]]
+        with self.lock:
+            self.db.executemany(f"INSERT OR REPLACE INTO filings VALUES ({', '.join('?' * len(FILING_COLUMNS))})", rows.itertuples(index=False, name=None))
+            self.db.commit()
+
+    def last_accessions(self, tickers=None):
+        '''
+        Returns {ticker: newest accession number seen by the last sync}.
+        '''
+        with self.lock:
+            rows = self.db.execute('SELECT ticker, last_accession FROM sync_state').fetchall()
+        return {ticker: accession for ticker, accession in rows if tickers is None or ticker in tickers}
+
+    def set_last_accession(self, ticker, accession):
+        with self.lock:
+            self.db.execute('INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?)', (ticker, accession, time.time()))
+            self.db.commit()
+
+    def get_sched14a_df(self, tickers, start_year, end_year):
+        '''
+        Same result as sched14a.get_sched14a_df, answered from the store. Tickers that have never been synced
+        are listed in df.attrs['errors'].
+        '''
+        tickers = list(dict.fromkeys(normalize_ticker(ticker) for ticker in tickers))
+        with self.lock:
+            synced = {ticker for ticker, in self.db.execute(f"SELECT ticker FROM sync_state WHERE ticker IN ({','.join('?' * len(tickers))})", tickers)}
+            rows = self.db.execute(f'''SELECT {', '.join(FILING_COLUMNS)} FROM filings
+                WHERE ticker IN ({','.join('?' * len(tickers))}) AND filingDate BETWEEN ? AND ?
+                ORDER BY ticker, filingDate DESC, accessionNumber DESC''', tickers + [f'{start_year}-01-01', f'{end_year}-12-31']).fetchall()
+
+        df = pd.DataFrame(rows, columns=FILING_COLUMNS)
+        position = {ticker: i for i, ticker in enumerate(tickers)}
+        df = df.iloc[df['ticker'].map(position).argsort(kind='stable')].reset_index(drop=True)
+        for column in ('filingDate', 'reportDate'):
+            df[column] = pd.to_datetime(df[column], errors='coerce').dt.date
+
+        errors = {ticker: 'Ticker not in filings store' for ticker in tickers if ticker not in synced}
+        for ticker, error in errors.items():
+            print(f'Failed to retrieve filings for {ticker}: {error}')
+        df.attrs['errors'] = errors
+        return df
+
+    def put_text(self, accession_number, text, images=None, tables=None):
+        with self.lock:
+            self.db.execute('INSERT OR REPLACE INTO texts VALUES (?, ?, ?, ?)', (
+                accession_number, text, json.dumps(images or []), json.dumps(tables or [])))
+            self.db.commit()
+
+    def get_text(self, accession_number):
+        '''
+        Returns {'Text', 'Images', 'Tables'} like sched14a.extract_text, or None if nothing was stored.
+        '''
+        with self.lock:
+            row = self.db.execute('SELECT text, images, tables FROM texts WHERE accessionNumber = ?', (accession_number,)).fetchone()
+        if row is None:
+            return None
+        return {'Text': row[0], 'Images': json.loads(row[1]), 'Tables': json.loads(row[2])}
+
+    def stats(self):
+        with self.lock:
+            return {table: self.db.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] for table in ('companies', 'filings', 'texts', 'sync_state')}
+
+filing_store = FilingStore()
+
+def main():
+    parser = argparse.ArgumentParser(description='Maintain the local 14A filings store.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    sync_parser = subparsers.add_parser('sync', help='fetch filings newer than the last sync for each ticker')
+    sync_parser.add_argument('tickers', nargs='+')
+    sync_parser.add_argument('--email', required=True, help='contact address sent in the SEC User-Agent')
+    sync_parser.add_argument('--start-year', type=int, default=2000, help='how far back the first sync of a ticker goes')
+    subparsers.add_parser('stats', help='print row counts')
+    args = parser.parse_args()
+
+    if args.command == 'sync':
+        # Imported here because sched14a itself uses this module
+        from sched14a import sync_filings
+        for ticker, added in sync_filings(args.tickers, args.email, start_year=args.start_year).items():
+            print(f'{ticker}: {added} new filings')
+    else:
+        print(filing_store.stats())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+import os
+import gzip
+import json
+import time
+import datetime
+from urllib.parse import urljoin
+from concurrent.futures import ThreadPoolExecutor
+import lxml.html
+import pandas as pd
+from httpcache import CACHE_DIR, http_cache
+
+FORM_IDX_URL = 'https://www.sec.gov/Archives/edgar/full-index/{year}/QTR{quarter}/form.idx'
+FILING_INDEX_URL = 'https://www.sec.gov/Archives/edgar/data/{cik}/{folder}/{accession}-index.htm'
+FILING_INDEX_SUFFIX = '-index.htm'
+INDEX_DIR = os.path.join(CACHE_DIR, 'full_index')
+SCHED14A_FORMS = ('DEF 14A', 'PREC14A')
+INDEX_COLUMNS = ['form', 'companyName', 'cik', 'filingDate', 'accessionNumber', 'fileName']
+
+def parse_form_idx(text, forms=SCHED14A_FORMS):
+    '''
+    Parses the fixed-width form.idx listing into a DataFrame with INDEX_COLUMNS, keeping only rows whose form is in forms.
+    '''
+    lines = text.splitlines()
+    header = next((i for i, line in enumerate(lines) if line.startswith('Form Type')), None)
+    if header is None:
+        raise ValueError('form.idx header not found')
+    # The form type is the only column that can contain spaces besides the company name, so it is cut at the header
+    # offset and the last three columns are split from the right
+    name_start = lines[header].index('Company Name')
+    forms = set(forms)
+
+    rows = []
+    for line in lines[header + 2:]:
+        form = line[:name_start].strip()
+        if form not in forms:
+            continue
+        fields = line[name_start:].rsplit(None, 3)
+        if len(fields) != 4:
+            continue
+        company_name, cik, filing_date, file_name = fields
+        accession_number = os.path.splitext(os.path.basename(file_name))[0]
+        rows.append((form, company_name.strip(), cik.zfill(10), filing_date, accession_number, file_name))
+    return pd.DataFrame(rows, columns=INDEX_COLUMNS)
+
+def _quarter_path(year, quarter, directory):
+    return os.path.join(directory, f'{year}-QTR{quarter}.json.gz')
+
+def _quarter_is_closed(year, quarter, today=None):
+    today = today or datetime.date.today()
+    return (year, quarter) < (today.year, (today.month - 1) // 3 + 1)
+
+def _load_quarter(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        data = json.load(f)
+    return pd.DataFrame(data['columns'], columns=INDEX_COLUMNS), data['fetched_at'], data['closed']
+
+def _save_quarter(path, filings, closed):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = {'fetched_at': time.time(), 'closed': closed, 'columns': {column: filings[column].tolist() for column in INDEX_COLUMNS}}
+    tmp_path = f'{path}.tmp'
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        json.dump(data, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+def get_quarter_filings(year, quarter, headers, ttl=24 * 60 * 60, directory=INDEX_DIR):
+    '''
+    Returns the 14A filings listed in one quarter's form.idx. The filtered table is kept in directory; a closed
+    quarter is never downloaded again, the current one is refreshed once it is older than ttl seconds. A quarter
+    whose index EDGAR hasn't published yet (404 for the current or a future quarter) has no filings.
+    '''
+    path = _quarter_path(year, quarter, directory)
+    cached = None
+    if os.path.exists(path):
+        try:
+            cached = _load_quarter(path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f'Failed to load {path}: {e}')
+    if cached is not None:
+        filings, fetched_at, closed = cached
+        if closed or time.time() - fetched_at < ttl:
+            return filings
+
+    try:
+        response = http_cache.get(FORM_IDX_URL.format(year=year, quarter=quarter), headers=headers)
+        if response.status_code == 404 and not _quarter_is_closed(year, quarter):
+            print(f'The {year} QTR{quarter} index is not published yet, skipping it')
+            return cached[0] if cached is not None else pd.DataFrame(columns=INDEX_COLUMNS)
+        response.raise_for_status()
+        filings = parse_form_idx(response.content.decode('latin-1'))
+        _save_quarter(path, filings, _quarter_is_closed(year, quarter))
+    except Exception as e:
+        if cached is None:
+            raise
+        print(f'Failed to refresh the {year} QTR{quarter} index, using the cached copy: {e}')
+    return filings
+
+def get_sched14a_filings(start_year, end_year, headers, ttl=24 * 60 * 60, directory=INDEX_DIR):
+    '''
+    Returns every DEF 14A / PREC14A filing from start_year through end_year, one form.idx download per quarter
+    at most. Quarters that haven't started yet are skipped.
+    '''
+    today = datetime.date.today()
+    current = (today.year, (today.month - 1) // 3 + 1)
+    quarters = [(year, quarter) for year in range(start_year, end_year + 1) for quarter in range(1, 5) if (year, quarter) <= current]
+    if not quarters:
+        return pd.DataFrame(columns=INDEX_COLUMNS)
+    return pd.concat([get_quarter_filings(year, quarter, headers, ttl=ttl, directory=directory) for year, quarter in quarters], ignore_index=True)
+
+def parse_filing_index(content, url, form=None):
+    '''
+    Returns (document URL, description) of the primary document listed on an EDGAR filing index page
+    (the ...-index.htm next to each filing): the first document of type form, else sequence number 1.
+    Returns None if the page lists neither.
+    '''
+    documents = []
+    for row in lxml.html.fromstring(content).xpath('//table[contains(@class, "tableFile") and @summary="Document Format Files"]//tr[td]'):
+        cells = row.xpath('./td')
+        links = cells[2].xpath('.//a/@href') if len(cells) >= 4 else []
+        if not links:
+            continue
+        # Inline XBRL documents link to the viewer, e.g. /ix?doc=/Archives/edgar/data/...
+        href = links[0].split('/ix?doc=', 1)[-1]
+        sequence, description, document_type = (cells[i].text_content().strip() for i in (0, 1, 3))
+        documents.append((sequence, document_type, urljoin(url, href), description))
+    for sequence, document_type, document_url, description in documents:
+        if form is not None and document_type == form:
+            return document_url, description
+    for sequence, document_type, document_url, description in documents:
+        if sequence == '1':
+            return document_url, description
+    return None
+
+def filing_index_url(cik, accession_number):
+    return FILING_INDEX_URL.format(cik=int(cik), folder=accession_number.replace('-', ''), accession=accession_number)
+
+def submission_url(index_url):
+    # The full submission (<accession>.txt) sits next to the index page
+    return index_url[:-len(FILING_INDEX_SUFFIX)] + '.txt'
+
+def read_filing_index(url, headers, form=None):
+    '''
+    Returns (document URL, description) of the primary document listed on the filing index page at url, or None.
+    '''
+    try:
+        response = http_cache.get(url, headers=headers)
+        response.raise_for_status()
+        return parse_filing_index(response.content, url, form)
+    except Exception as e:
+        print(f'Failed to read the filing index {url}: {e}')
+        return None
+
+def get_primary_document(cik, accession_number, form, headers):
+    '''
+    Returns (document URL, description) of a filing's primary document, read from its index page, or None.
+    '''
+    return read_filing_index(filing_index_url(cik, accession_number), headers, form)
+
+def get_primary_documents(filings, headers, max_workers=8):
+    '''
+    filings has the cik, accessionNumber and form columns of get_sched14a_filings. Looks up every filing's
+    primary document on a bounded thread pool and returns a list of (document URL, description) or None, in
+    the same order. That is one request per filing, so get_sched14a_df only does it when asked to; otherwise
+    resolve_document_url looks up each document when its text is needed. Index pages are immutable archive
+    documents, so each is only downloaded once.
+    '''
+    rows = list(zip(filings['cik'], filings['accessionNumber'], filings['form']))
+    lookup = lambda row: get_primary_document(*row, headers)
+    if max_workers <= 1 or len(rows) <= 1:
+        return [lookup(row) for row in rows]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(rows))) as executor:
+        return list(executor.map(lookup, rows))
+
+def resolve_document_url(url, headers, form=None):
+    '''
+    Returns the primary document of a filing index page URL (the doc_url of source='full_index' filings), or
+    the full submission if the page can't be read. Any other URL is returned unchanged, without a request.
+    '''
+    if not url.endswith(FILING_INDEX_SUFFIX):
+        return url
+    document = read_filing_index(url, headers, form)
+    return document[0] if document else submission_url(url)
@@ -0,0 +1,275 @@
+import os
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+import requests
+from requests.structures import CaseInsensitiveDict
+from httpclient import http_client, endpoint_of
+from metrics import metrics
+
+CACHE_DIR = os.environ.get('SCHED14A_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache'))
+
+# Filed documents never change once they are accepted by EDGAR
+IMMUTABLE_PATHS = ('/Archives/edgar/data/',)
+
+class HttpCache:
+    '''
+    On-disk cache for EDGAR GET requests.
+
+    Bodies are stored zlib-compressed in one file per URL, and an SQLite index keeps the
+    validators and last access time of each entry so the least recently used ones can be
+    evicted once max_bytes is exceeded. URLs under IMMUTABLE_PATHS are served from disk
+    forever; everything else is served from disk for fresh_for seconds and then revalidated
+    with If-None-Match / If-Modified-Since. Network requests go through client, so only misses and
+    revalidations are rate limited.
+    '''
+    def __init__(self, directory=None, max_bytes=2 * 1024 ** 3, fresh_for=600, client=None):
+        self.directory = directory or os.path.join(CACHE_DIR, 'http')
+        self.max_bytes = max_bytes
+        self.fresh_for = fresh_for
+        self.client = client or http_client
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self._db = None
+        self._db_lock = threading.Lock()
+
+    @property
+    def db(self):
+        '''
+        The SQLite index, created with the cache directory on first use so importing this module touches no disk.
+        '''
+        if self._db is None:
+            with self._db_lock:
+                if self._db is None:
+                    os.makedirs(self.directory, exist_ok=True)
+                    db = sqlite3.connect(os.path.join(self.directory, 'index.sqlite'), check_same_thread=False)
+                    db.execute('''CREATE TABLE IF NOT EXISTS entries (
+                        url TEXT PRIMARY KEY, file TEXT, size INTEGER, etag TEXT, last_modified TEXT,
+                        content_type TEXT, validated_at REAL, accessed_at REAL)''')
+                    db.execute('CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)')
+                    db.commit()
+                    self._db = db
+        return self._db
+
+    def _count(self, hit, revalidated=False):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            if revalidated:
+                self.revalidated += 1
+
+    def _is_immutable(self, url):
+        return any(path in url for path in IMMUTABLE_PATHS)
+
+    def _lookup(self, url):
+        with self.lock:
+            return self.db.execute('SELECT file, etag, last_modified, content_type, validated_at FROM entries WHERE url = ?', (url,)).fetchone()
+
+    def _read(self, file):
+        try:
+            with open(os.path.join(self.directory, file), 'rb') as f:
+                return zlib.decompress(f.read())
+        except (OSError, zlib.error):
+            return None
+
+    def _file_name(self, url):
+        return hashlib.sha256(url.encode('utf-8')).hexdigest() + '.z'
+
+    def _store(self, url, response):
+        file = self._file_name(url)
+        compressed = zlib.compress(response.content, 6)
+        with open(os.path.join(self.directory, file), 'wb') as f:
+            f.write(compressed)
+        self._add_entry(url, file, len(compressed), response.headers)
+
+    def _add_entry(self, url, file, size, headers):
+        now = time.time()
+        with self.lock:
+            self.db.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)', (
+                url, file, size, headers.get('ETag'), headers.get('Last-Modified'), headers.get('Content-Type'), now, now))
+            self.db.commit()
+        self._evict()
+
+    def _read_chunks(self, file, chunk_size):
+        decompressor = zlib.decompressobj()
+        with open(os.path.join(self.directory, file), 'rb') as f:
+            while True:
+                compressed = f.read(chunk_size)
+                if not compressed:
+                    break
+                # Cap each chunk at chunk_size; proxy HTML compresses ~20x, so one read can inflate to megabytes
+                while compressed:
+                    chunk = decompressor.decompress(compressed, chunk_size)
+                    compressed = decompressor.unconsumed_tail
+                    if chunk:
+                        yield chunk
+        chunk = decompressor.flush()
+        if chunk:
+            yield chunk
+
+    def _touch(self, url, revalidated=False):
+        now = time.time()
+        with self.lock:
+            if revalidated:
+                self.db.execute('UPDATE entries SET accessed_at = ?, validated_at = ? WHERE url = ?', (now, now, url))
+            else:
+                self.db.execute('UPDATE entries SET accessed_at = ? WHERE url = ?', (now, url))
+            self.db.commit()
+
+    def _evict(self):
+        with self.lock:
+            total = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            # Evict down to 90% of the limit so we don't evict again on the next store
+            target = self.max_bytes * 0.9
+            evicted = []
+            for url, file, size in self.db.execute('SELECT url, file, size FROM entries ORDER BY accessed_at'):
+                if total <= target:
+                    break
+                evicted.append((url, file))
+                total -= size
+            self.db.executemany('DELETE FROM entries WHERE url = ?', [(url,) for url, _ in evicted])
+            self.db.commit()
+        for _, file in evicted:
+            try:
+                os.remove(os.path.join(self.directory, file))
+            except OSError:
+                pass
+
+    def _cached_response(self, url, body, content_type):
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response._content = body
+        response.headers = CaseInsensitiveDict({'Content-Type': content_type} if content_type else {})
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.from_cache = True
+        return response
+
+    def get(self, url, headers=None, **kwargs):
+        '''
+        Drop-in replacement for requests.get that returns a requests.Response, served from disk when possible.
+        '''
+        with metrics.span('fetch'):
+            return self._get(url, headers, **kwargs)
+
+    def _get(self, url, headers, **kwargs):
+        entry = self._lookup(url)
+        request_headers = dict(headers or {})
+
+        if entry:
+            file, etag, last_modified, content_type, validated_at = entry
+            body = self._read(file)
+            if body is not None:
+                if self._is_immutable(url) or time.time() - validated_at < self.fresh_for:
+                    self._count(hit=True)
+                    self._touch(url)
+                    return self._cached_response(url, body, content_type)
+                if etag:
+                    request_headers['If-None-Match'] = etag
+                if last_modified:
+                    request_headers['If-Modified-Since'] = last_modified
+
+        response = self.client.get(url, headers=request_headers, **kwargs)
+
+        if entry and body is not None and response.status_code == 304:
+            self._count(hit=True, revalidated=True)
+            self._touch(url, revalidated=True)
+            return self._cached_response(url, body, content_type)
+
+        self._count(hit=False)
+        response.from_cache = False
+        if response.status_code == 200:
+            self._store(url, response)
+        return response
+
+    def stream(self, url, headers=None, chunk_size=64 * 1024, **kwargs):
+        '''
+        Yields the body of an immutable archive document in chunks without holding all of it in memory.
+        Cached bodies are decompressed incrementally; on a miss the download is written to the cache as it
+        streams. Other URLs go through get() so they are still revalidated.
+        '''
+        if not self._is_immutable(url):
+            response = self.get(url, headers=headers, **kwargs)
+            response.raise_for_status()
+            for start in range(0, len(response.content), chunk_size):
+                yield response.content[start:start + chunk_size]
+            return
+        # Only time spent reading counts towards the fetch stage, not the consumer's work between chunks
+        yield from metrics.timed_iter('fetch', self._stream_archive(url, headers, chunk_size, **kwargs))
+
+    def _stream_archive(self, url, headers, chunk_size, **kwargs):
+        entry = self._lookup(url)
+        if entry and os.path.exists(os.path.join(self.directory, entry[0])):
+            self._count(hit=True)
+            self._touch(url)
+            yield from self._read_chunks(entry[0], chunk_size)
+            return
+
+        self._count(hit=False)
+        response = self.client.get(url, headers=headers, stream=True, **kwargs)
+        response.raise_for_status()
+
+        file = self._file_name(url)
+        tmp_path = os.path.join(self.directory, f'{file}.{threading.get_ident()}.tmp')
+        compressor = zlib.compressobj(6)
+        size = 0
+        downloaded = 0
+        completed = False
+        try:
+            with response, open(tmp_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size):
+                    compressed = compressor.compress(chunk)
+                    f.write(compressed)
+                    size += len(compressed)
+                    downloaded += len(chunk)
+                    yield chunk
+                compressed = compressor.flush()
+                f.write(compressed)
+                size += len(compressed)
+            os.replace(tmp_path, os.path.join(self.directory, file))
+            completed = True
+            self._add_entry(url, file, size, response.headers)
+        finally:
+            metrics.add('downloaded_bytes', downloaded, endpoint=endpoint_of(url))
+            # The consumer stopped early or the download failed, so there is nothing complete to keep
+            if not completed and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def invalidate(self, url):
+        entry = self._lookup(url)
+        with self.lock:
+            self.db.execute('DELETE FROM entries WHERE url = ?', (url,))
+            self.db.commit()
+        if entry:
+            try:
+                os.remove(os.path.join(self.directory, entry[0]))
+            except OSError:
+                pass
+
+    def stats(self):
+        entries, size = 0, 0
+        # Nothing has been cached yet if the index was never opened, and reading stats shouldn't create it
+        if self._db is not None:
+            with self.lock:
+                entries, size = self._db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        with self.lock:
+            hits, misses, revalidated = self.hits, self.misses, self.revalidated
+        requests_served = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'revalidated': revalidated,
+            'hit_rate': hits / requests_served if requests_served else 0.0,
+            'entries': entries,
+            'bytes': size,
+        }
+
+http_cache = HttpCache()
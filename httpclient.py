@@ -0,0 +1,113 @@
+import time
+import bisect
+import threading
+import email.utils
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from ratelimiter import HostRateLimiter
+from metrics import metrics, LATENCY_BUCKETS, _histogram_stats
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+def endpoint_of(url):
+    '''
+    Groups URLs for the latency histograms by host and first path segment, e.g. data.sec.gov/submissions.
+    '''
+    parts = urlsplit(url)
+    segment = parts.path.lstrip('/').split('/', 1)[0]
+    return f'{parts.netloc}/{segment}' if segment else parts.netloc
+
+class HttpClient:
+    '''
+    One pooled, keep-alive requests.Session shared by every EDGAR call.
+
+    Requests get default timeouts and are retried up to retries times with exponential backoff on connection
+    errors and 429/5xx responses, honouring Retry-After. Every attempt, retries included, first waits on
+    rate_limiter (one bucket shared by all SEC hosts), so retries never push the request rate past the limit.
+    Request latency is recorded per endpoint in cumulative histograms, and downloaded bytes in metrics.
+
+    With base_url set, https://host/path is requested as base_url/host/path instead; the offline benchmarks
+    set it on http_client to reach their stand-in server. Caching and rate limiting still see the original URL.
+    '''
+    def __init__(self, rate_limiter=None, pool_size=32, timeout=(10, 60), retries=5, backoff=0.5, max_backoff=60, base_url=None, sleep=time.sleep):
+        self.rate_limiter = rate_limiter
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.base_url = base_url
+        self.sleep = sleep
+        self.session = requests.Session()
+        self.session.headers['Accept-Encoding'] = 'gzip, deflate'
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.lock = threading.Lock()
+        self.latencies = {}
+
+    def _record(self, url, seconds):
+        endpoint = endpoint_of(url)
+        with self.lock:
+            histogram = self.latencies.setdefault(endpoint, {'buckets': [0] * (len(LATENCY_BUCKETS) + 1), 'count': 0, 'sum': 0.0})
+            histogram['buckets'][bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            histogram['count'] += 1
+            histogram['sum'] += seconds
+
+    def _target(self, url):
+        if not self.base_url:
+            return url
+        parts = urlsplit(url)
+        return f"{self.base_url.rstrip('/')}/{parts.netloc}{parts.path}" + (f'?{parts.query}' if parts.query else '')
+
+    def _retry_delay(self, attempt, response=None):
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after:
+            try:
+                return min(max(float(retry_after), 0.0), self.max_backoff)
+            except ValueError:
+                try:
+                    return min(max(email.utils.parsedate_to_datetime(retry_after).timestamp() - time.time(), 0.0), self.max_backoff)
+                except (TypeError, ValueError):
+                    pass
+        return min(self.backoff * 2 ** attempt, self.max_backoff)
+
+    def get(self, url, headers=None, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        start = time.perf_counter()
+        try:
+            for attempt in range(self.retries + 1):
+                if self.rate_limiter is not None:
+                    self.rate_limiter.wait(url)
+                try:
+                    response = self.session.get(self._target(url), headers=headers, **kwargs)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    if attempt == self.retries:
+                        raise
+                    delay = self._retry_delay(attempt)
+                    print(f'Request to {url} failed ({e}), retrying in {delay:.1f}s')
+                else:
+                    if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                        break
+                    delay = self._retry_delay(attempt, response)
+                    response.close()
+                metrics.add('http_retries', endpoint=endpoint_of(url))
+                self.sleep(delay)
+        finally:
+            # Includes retries and backoff; with stream=True this is the time to the response headers
+            self._record(url, time.perf_counter() - start)
+        # Streamed bodies are counted by whoever reads them
+        if not kwargs.get('stream'):
+            metrics.add('downloaded_bytes', len(response.content), endpoint=endpoint_of(url))
+        return response
+
+    def latency_stats(self):
+        '''
+        Returns {endpoint: {'count', 'sum', 'mean', 'buckets': {upper bound: cumulative count}}}.
+        '''
+        with self.lock:
+            return {endpoint: _histogram_stats(histogram) for endpoint, histogram in self.latencies.items()}
+
+# SEC asks for no more than 10 requests per second, across all of its hosts
+http_client = HttpClient(rate_limiter=HostRateLimiter(10, 1))
@@ -0,0 +1,62 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+class JobQueue:
+    '''
+    Runs functions on a shared thread pool and memoizes their futures by key, so a Streamlit rerun
+    picks up work an earlier run started instead of repeating it. Finished results are kept for ttl
+    seconds. Failures are not memoized: a failed job is handed back by the next submit for its key,
+    so that run can report the error, and dropped, so the submit after that runs it again.
+
+    Each queue has its own pool, so long jobs get a queue of their own (summary_queue) and can't hold up the
+    quick lookups on job_queue.
+    '''
+    def __init__(self, max_workers=4, ttl=60 * 60, max_entries=512):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.jobs = {}
+
+    def submit(self, key, fn, *args, **kwargs):
+        '''
+        Returns the future for key, starting fn(*args, **kwargs) if there is no live job for it.
+        '''
+        now = time.time()
+        with self.lock:
+            entry = self.jobs.get(key)
+            if entry is not None:
+                submitted_at, future = entry
+                if future.done() and future.exception() is not None:
+                    del self.jobs[key]
+                    return future
+                # A job still running is never expired, or a rerun would start it a second time
+                if not future.done() or now - submitted_at < self.ttl:
+                    return future
+            future = self.executor.submit(fn, *args, **kwargs)
+            self.jobs[key] = (now, future)
+            self._evict()
+        return future
+
+    def _evict(self):
+        # Drop finished jobs oldest first; running ones are never dropped so their results aren't lost
+        if len(self.jobs) <= self.max_entries:
+            return
+        for key, (_, future) in list(self.jobs.items()):
+            if len(self.jobs) <= self.max_entries:
+                break
+            if future.done():
+                del self.jobs[key]
+
+    def invalidate(self, key=None):
+        with self.lock:
+            if key is None:
+                self.jobs.clear()
+            else:
+                self.jobs.pop(key, None)
+
+# Ticker lookups, which take seconds
+job_queue = JobQueue()
+# AI summaries, which take minutes
+summary_queue = JobQueue(max_workers=2)
@@ -0,0 +1,105 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from httpcache import CACHE_DIR
+
+def _normalize_messages(messages):
+    # Whitespace differences (e.g. re-indented prompts) shouldn't cost another completion
+    return [{'role': message['role'], 'content': re.sub(r'\s+', ' ', message['content']).strip()} for message in messages]
+
+class LLMCache:
+    '''
+    Persistent cache of chat completion results keyed by (model, normalized messages, sampling params).
+    Stores the raw completion text and, once it has been parsed, the JSON dict as well. Entries older
+    than ttl seconds are ignored and replaced on the next store.
+    '''
+    def __init__(self, path=None, ttl=30 * 24 * 60 * 60):
+        self.path = path or os.path.join(CACHE_DIR, 'llm_responses.sqlite')
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._db = None
+        self._db_lock = threading.Lock()
+
+    @property
+    def db(self):
+        '''
+        The SQLite file, created with its directory on first use so importing this module touches no disk.
+        '''
+        if self._db is None:
+            with self._db_lock:
+                if self._db is None:
+                    os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                    db = sqlite3.connect(self.path, check_same_thread=False)
+                    db.execute('''CREATE TABLE IF NOT EXISTS responses (
+                        key TEXT PRIMARY KEY, model TEXT, raw TEXT, parsed TEXT, created_at REAL)''')
+                    db.commit()
+                    self._db = db
+        return self._db
+
+    @staticmethod
+    def key(model, messages, **params):
+        payload = {'model': model, 'messages': _normalize_messages(messages), 'params': params}
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        '''
+        Returns (raw, parsed) for a live entry, where parsed is None if no JSON was stored, or None on a miss.
+        '''
+        with self.lock:
+            row = self.db.execute('SELECT raw, parsed, created_at FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None or (self.ttl is not None and time.time() - row[2] > self.ttl):
+                self.misses += 1
+                return None
+            self.hits += 1
+        return row[0], json.loads(row[1]) if row[1] is not None else None
+
+    def put(self, key, model, raw, parsed=None):
+        with self.lock:
+            self.db.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)', (
+                key, model, raw, json.dumps(parsed) if parsed is not None else None, time.time()))
+            self.db.commit()
+
+    def invalidate(self, key=None, model=None, older_than=None):
+        '''
+        Deletes one entry by key, every entry for a model, and/or entries created more than older_than seconds ago.
+        With no arguments the whole cache is cleared.
+        '''
+        conditions, values = [], []
+        if key is not None:
+            conditions.append('key = ?')
+            values.append(key)
+        if model is not None:
+            conditions.append('model = ?')
+            values.append(model)
+        if older_than is not None:
+            conditions.append('created_at < ?')
+            values.append(time.time() - older_than)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+        with self.lock:
+            deleted = self.db.execute(f'DELETE FROM responses{where}', values).rowcount
+            self.db.commit()
+        return deleted
+
+    def stats(self):
+        entries = 0
+        # Nothing has been cached yet if the file was never opened, and reading stats shouldn't create it
+        if self._db is not None:
+            with self.lock:
+                entries = self._db.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+        with self.lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / lookups if lookups else 0.0,
+            'entries': entries,
+        }
+
+llm_cache = LLMCache()
@@ -0,0 +1,211 @@
+import os
+import time
+import logging
+import bisect
+import threading
+import contextlib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Upper bounds in seconds of the latency histogram buckets, Prometheus style; the last bucket is +Inf
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Pipeline stages timed with metrics.span, in the order a filing goes through them
+STAGES = ('fetch', 'parse', 'chunk', 'embed', 'rank', 'llm')
+
+COUNTER_HELP = {
+    'downloaded_bytes': 'Response bytes downloaded from EDGAR.',
+    'http_retries': 'EDGAR requests retried after a connection error or a 429/5xx response.',
+    'llm_requests': 'Requests sent to the OpenAI API.',
+    'llm_tokens': 'Tokens sent to and received from the OpenAI API.',
+}
+
+def _histogram_stats(histogram, buckets=LATENCY_BUCKETS):
+    cumulative, cumulative_buckets = 0, {}
+    for bound, count in zip(buckets + (float('inf'),), histogram['buckets']):
+        cumulative += count
+        cumulative_buckets[bound] = cumulative
+    return {'count': histogram['count'], 'sum': histogram['sum'], 'mean': histogram['sum'] / histogram['count'] if histogram['count'] else 0.0,
+            'buckets': cumulative_buckets}
+
+class Metrics:
+    '''
+    Process-wide latency histograms per pipeline stage and labelled counters (bytes, tokens, API calls).
+
+    Stages are timed with `with metrics.span('parse'):`, or metrics.timed_iter for generators, where only the
+    time spent producing items counts. Work done in other processes is recorded in those processes, so pools
+    return their timings and the parent passes them to observe (as iter_extract_text does for parsing).
+    '''
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.counters = {}
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            histogram = self.stages.setdefault(stage, {'buckets': [0] * (len(self.buckets) + 1), 'count': 0, 'sum': 0.0})
+            histogram['buckets'][bisect.bisect_left(self.buckets, seconds)] += 1
+            histogram['count'] += 1
+            histogram['sum'] += seconds
+
+    @contextlib.contextmanager
+    def span(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def timed_iter(self, stage, iterable):
+        '''
+        Yields from iterable and records the time spent inside it, but not in the consumer, as one observation.
+        '''
+        iterator = iter(iterable)
+        seconds = 0.0
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    seconds += time.perf_counter() - start
+                yield item
+        finally:
+            self.observe(stage, seconds)
+
+    def add(self, name, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def stage_stats(self):
+        '''
+        Returns {stage: {'count', 'sum', 'mean', 'buckets': {upper bound: cumulative count}}}.
+        '''
+        with self.lock:
+            return {stage: _histogram_stats(histogram, self.buckets) for stage, histogram in self.stages.items()}
+
+    def counter_values(self):
+        '''
+        Returns {name: {labels tuple: value}}.
+        '''
+        with self.lock:
+            return {name: dict(series) for name, series in self.counters.items()}
+
+    def reset(self):
+        with self.lock:
+            self.stages.clear()
+            self.counters.clear()
+
+metrics = Metrics()
+
+def _component_stats():
+    # Imported here because these modules record into metrics themselves
+    from httpclient import http_client
+    from httpcache import http_cache
+    from embeddingstore import embedding_store
+    from llmcache import llm_cache
+    limiter = http_client.rate_limiter
+    buckets = getattr(limiter, 'buckets', {}) if limiter is not None else {}
+    return {
+        'http_latency': http_client.latency_stats(),
+        'caches': {'http': http_cache.stats(), 'embeddings': embedding_store.stats(), 'llm': llm_cache.stats()},
+        'rate_limiter': {host: {'calls': bucket.calls, 'throttled': bucket.throttled, 'wait_seconds': bucket.total_wait}
+                         for host, bucket in list(buckets.items())},
+    }
+
+def snapshot():
+    '''
+    Everything the diagnostics panel shows: stage histograms, counters, per-endpoint HTTP latency,
+    cache hit rates and rate limiter waits.
+    '''
+    return {'stages': metrics.stage_stats(), 'counters': metrics.counter_values(), **_component_stats()}
+
+def _labels(**labels):
+    escaped = {name: str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for name, value in labels.items()}
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped.items()) + '}' if labels else ''
+
+def _bound(bound):
+    return '+Inf' if bound == float('inf') else repr(bound)
+
+def _histogram_lines(name, label, histograms):
+    lines = []
+    for value, histogram in histograms.items():
+        for bound, count in histogram['buckets'].items():
+            lines.append(f'{name}_bucket{_labels(**{label: value, "le": _bound(bound)})} {count}')
+        lines.append(f'{name}_sum{_labels(**{label: value})} {histogram["sum"]}')
+        lines.append(f'{name}_count{_labels(**{label: value})} {histogram["count"]}')
+    return lines
+
+def prometheus_text(prefix='sched14a'):
+    '''
+    Renders snapshot() in the Prometheus text exposition format.
+    '''
+    data = snapshot()
+    lines = [f'# HELP {prefix}_stage_duration_seconds Time spent in each pipeline stage.',
+             f'# TYPE {prefix}_stage_duration_seconds histogram']
+    lines += _histogram_lines(f'{prefix}_stage_duration_seconds', 'stage', data['stages'])
+    lines += [f'# HELP {prefix}_http_request_duration_seconds EDGAR request latency by endpoint, including retries.',
+              f'# TYPE {prefix}_http_request_duration_seconds histogram']
+    lines += _histogram_lines(f'{prefix}_http_request_duration_seconds', 'endpoint', data['http_latency'])
+
+    for name, series in sorted(data['counters'].items()):
+        lines += [f'# HELP {prefix}_{name}_total {COUNTER_HELP.get(name, name)}', f'# TYPE {prefix}_{name}_total counter']
+        lines += [f'{prefix}_{name}_total{_labels(**dict(key))} {value}' for key, value in sorted(series.items())]
+
+    for field, kind in (('hits', 'counter'), ('misses', 'counter'), ('entries', 'gauge')):
+        name = f'{prefix}_cache_{field}' + ('_total' if kind == 'counter' else '')
+        lines += [f'# HELP {name} Cache {field} by cache.', f'# TYPE {name} {kind}']
+        lines += [f'{name}{_labels(cache=cache)} {stats[field]}' for cache, stats in data['caches'].items()]
+
+    for field, help_text in (('calls', 'Requests that went through the rate limiter.'), ('throttled', 'Requests that had to wait for a token.'),
+                             ('wait_seconds', 'Time requests spent waiting for the rate limiter.')):
+        name = f'{prefix}_rate_limiter_{field}_total'
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        lines += [f'{name}{_labels(host=host)} {stats[field]}' for host, stats in data['rate_limiter'].items()]
+    return '\n'.join(lines) + '\n'
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = prometheus_text().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+_server = None
+_server_lock = threading.Lock()
+
+def serve(port=None, host=None):
+    '''
+    Serves prometheus_text() at http://host:port/metrics from a background thread. port defaults to
+    $SCHED14A_METRICS_PORT, and nothing is started without one. host defaults to $SCHED14A_METRICS_HOST,
+    or 127.0.0.1 so the metrics stay local unless a bind address is given. Safe to call on every Streamlit rerun.
+    '''
+    global _server
+    port = port or os.environ.get('SCHED14A_METRICS_PORT')
+    if not port:
+        return None
+    host = host or os.environ.get('SCHED14A_METRICS_HOST', '127.0.0.1')
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, int(port)), _MetricsHandler)
+            except OSError as e:
+                # Remembered so later reruns don't retry and print this again
+                logging.error(f'Failed to start the metrics server on {host}:{port}: {e}')
+                _server = False
+                return None
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+    return _server or None
@@ -1,11 +1,17 @@
 import streamlit as st
-from sched14a import get_sched14a_df
+from sched14a import fetch_sched14a_df
 from extractdata import extract_full_data_gpt
+from jobqueue import summary_queue
+from diagnostics import show_diagnostics
 from datetime import datetime
+import time
+import hashlib
 
 col_names = {'file': 'File', 'ticker': 'Ticker', 'title': 'Company Name', 'filingDate': 'Filing Date', 'form': 'Form', 'primaryDocDescription': 'Document Description', 'cik': 'CIK', 'accessionNumber': 'Accession Number', 'fileNumber': 'File Number', 'filmNumber': 'Film Number', 'reportDate': 'Report Date'}
 
 def main():
+    show_diagnostics()
+
     if "email" not in st.session_state:
         st.session_state.email = ""
 
@@ -48,13 +54,29 @@ Total Compensation $:
 
 Refrain from making any calculations. Only report what is found in the report; if something is not in the report, write NA. Please only return the data for the CEO.""")
 
-        if st.button("Get Schedule 14A Links"):
+        # The submitted request is kept so reruns (including the ones polling the background jobs) don't need the button
+        submitted = st.button("Get Schedule 14A Links")
+        if submitted:
             if not api_key:
                 st.error("Please enter your OpenAI Key.")
             elif tickers_input:
-                tickers = [ticker.strip() for ticker in tickers_input.split(",")]
-                email = st.session_state.email
-                df = get_sched14a_df(tickers, year, year, email)
+                st.session_state.ai_query = (tickers_input, year, query, api_key)
+            else:
+                st.error("Please enter at least one ticker.")
+
+        if "ai_query" in st.session_state:
+            tickers_input, year, query, api_key = st.session_state.ai_query
+            tickers = [ticker.strip() for ticker in tickers_input.split(",") if ticker.strip()]
+            email = st.session_state.email
+            df, pending, errors = fetch_sched14a_df(tickers, year, year, email)
+            for ticker, error in errors.items():
+                st.warning(f"Failed to retrieve filings for {ticker}: {error}")
+
+            if pending:
+                st.info(f"Looking up the filings for {', '.join(pending)}...")
+            elif df.empty:
+                st.error("No Schedule 14A filings were found for that year.")
+            else:
                 df.drop(columns=['filmNumber'], inplace=True)
 
                 df.rename(columns={'doc_url': 'file'}, inplace=True)
@@ -76,13 +98,23 @@ Refrain from making any calculations. Only report what is found in the report; i
                     hide_index=True,
                 )
 
-                st.write('Generating an AI summary of the file above. This may take a few minutes.')
-
-                data = extract_full_data_gpt(df.loc[0, 'File'], query=query, api_key=api_key, headers={'User-Agent': st.session_state.email})
-                st.markdown(data)
-
-            else:
-                st.error("Please enter at least one ticker.")
+                # Keyed on the file, request and a hash of the API key, so reruns reuse a summary that is running or done,
+                # but a session never gets a summary paid for with someone else's key
+                url = df.loc[0, 'File']
+                key_hash = hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+                summary = summary_queue.submit(('full_summary', url, query, key_hash), extract_full_data_gpt, url,
+                                               query=query, api_key=api_key, headers={'User-Agent': email})
+                if not summary.done():
+                    st.write('Generating an AI summary of the file above. This may take a few minutes.')
+                elif summary.exception() is not None:
+                    st.error(f"Failed to generate the summary: {summary.exception()}")
+                else:
+                    st.markdown(summary.result())
+                pending = not summary.done()
+
+            if pending:
+                time.sleep(0.5)
+                st.rerun()
 
 if __name__ == "__main__":
     main()
@@ -1,20 +1,110 @@
 import time
+import asyncio
+import threading
+from urllib.parse import urlsplit
 
 class RateLimiter:
-    def __init__(self, rate_limit, period):
+    '''
+    Token bucket allowing rate_limit calls per period, with up to burst calls back to back.
+    A caller reserves its token under the lock (O(1), tokens may go negative) and then
+    sleeps outside of it, so concurrent callers are spaced out instead of all waking at once.
+    burst defaults to 1, so calls are evenly spaced and no window of length period ever sees
+    more than rate_limit of them.
+    '''
+    def __init__(self, rate_limit, period, burst=1, clock=time.monotonic, sleep=time.sleep):
         self.rate_limit = rate_limit
         self.period = period
-        self.timestamps = []
+        self.burst = burst
+        self.clock = clock
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.tokens = float(self.burst)
+        self.updated = clock()
+
+        # Counters for diagnostics
+        self.calls = 0
+        self.throttled = 0
+        self.total_wait = 0.0
+
+    def _reserve(self):
+        with self.lock:
+            now = self.clock()
+            refill_rate = self.rate_limit / self.period
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * refill_rate)
+            self.updated = now
+            self.tokens -= 1
+            self.calls += 1
+
+            if self.tokens >= 0:
+                return 0.0
+            time_to_wait = -self.tokens / refill_rate
+            self.throttled += 1
+            self.total_wait += time_to_wait
+            return time_to_wait
+
+    def acquire(self):
+        time_to_wait = self._reserve()
+        if time_to_wait > 0:
+            self.sleep(time_to_wait)
+        return time_to_wait
+
+    async def acquire_async(self):
+        time_to_wait = self._reserve()
+        if time_to_wait > 0:
+            await asyncio.sleep(time_to_wait)
+        return time_to_wait
 
     def wait(self):
-        # Remove timestamps outside the current period
-        now = time.time()
-        self.timestamps = [timestamp for timestamp in self.timestamps if now - timestamp < self.period]
-        
-        # Wait if the rate limit is reached
-        if len(self.timestamps) >= self.rate_limit:
-            time_to_wait = self.period - (now - self.timestamps[0])
-            time.sleep(time_to_wait)
-            
-        # Add a new timestamp for the current request
-        self.timestamps.append(time.time())
\ No newline at end of file
+        return self.acquire()
+
+class HostRateLimiter:
+    '''
+    Keeps one RateLimiter bucket per host, created on first use. Hosts under one of shared_domains draw
+    from a single bucket named after the domain, so www.sec.gov, data.sec.gov and efts.sec.gov together
+    stay within SEC's limit.
+    '''
+    def __init__(self, rate_limit, period, burst=1, default_host='www.sec.gov', shared_domains=('sec.gov',), clock=time.monotonic, sleep=time.sleep):
+        self.rate_limit = rate_limit
+        self.period = period
+        self.burst = burst
+        self.default_host = default_host
+        self.shared_domains = shared_domains
+        self.clock = clock
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.buckets = {}
+
+    def key(self, url=None):
+        host = (urlsplit(url).hostname or url) if url else self.default_host
+        for domain in self.shared_domains:
+            if host == domain or host.endswith('.' + domain):
+                return domain
+        return host
+
+    def bucket(self, url=None):
+        host = self.key(url)
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = RateLimiter(self.rate_limit, self.period, burst=self.burst, clock=self.clock, sleep=self.sleep)
+            return self.buckets[host]
+
+    def acquire(self, url=None):
+        return self.bucket(url).acquire()
+
+    async def acquire_async(self, url=None):
+        return await self.bucket(url).acquire_async()
+
+    def wait(self, url=None):
+        return self.acquire(url)
+
+    @property
+    def calls(self):
+        return sum(bucket.calls for bucket in self.buckets.values())
+
+    @property
+    def throttled(self):
+        return sum(bucket.throttled for bucket in self.buckets.values())
+
+    @property
+    def total_wait(self):
+        return sum(bucket.total_wait for bucket in self.buckets.values())
@@ -1,72 +1,324 @@
-from ratelimiter import RateLimiter
+import os
+import re
+import time
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 from edgar import *
-from extractdata import get_text_and_images
-
-rate_limiter = RateLimiter(10, 1)
-s = requests.Session()
+from extractdata import parse_html
+from metrics import metrics
+from fullindex import get_sched14a_filings, get_primary_documents, filing_index_url, submission_url, resolve_document_url
+from companyindex import normalize_ticker
+from filingstore import filing_store
+from jobqueue import job_queue
 
 pd.options.display.float_format = (lambda x: "{:,.0f}".format(x) if int(x)==x else "{:,.2f}".format(x))
 
-def get_sched14a_df(tickers, start_year, end_year, email):
-    tickers = [ticker.upper() for ticker in tickers]
-    headers = {'User-Agent': email}
-    identifiers = get_companyIdentifiers(headers=headers)
-    tickers_data = identifiers[identifiers['ticker'].isin(tickers)]
+def _fetch_allForms(headers, cik, start_year=None, end_year=None, paginate=True):
+    # All workers share http_client's rate limiter, so the pool as a whole stays under SEC's 10 req/s
+    try:
+        submissionMetadata = get_submissionMetadata(headers=headers, cik=cik)
+        if paginate:
+            return get_allForms(submissionMetadata, headers=headers, start_year=start_year, end_year=end_year), None
+        return get_allForms(submissionMetadata), None
+    except Exception as e:
+        return None, e
+
+def get_allForms_for_ciks(headers, ciks, start_year=None, end_year=None, paginate=True, max_workers=8):
+    '''
+    Fetches the filings of each CIK on a bounded thread pool.
+    Returns a list of (allForms, error) tuples in the same order as ciks.
+    '''
+    fetch = lambda cik: _fetch_allForms(headers, cik, start_year=start_year, end_year=end_year, paginate=paginate)
+    if max_workers <= 1 or len(ciks) <= 1:
+        return [fetch(cik) for cik in ciks]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(ciks))) as executor:
+        return list(executor.map(fetch, ciks))
+
+SCHED14A_DESCRIPTIONS = ['DEF 14A', 'PREC14A', 'FORM DEF 14A', 'FORM PREC14A', 'DEFINITIVE PROXY STATEMENT']
+SCHED14A_COLUMNS = ['ticker', 'title', 'form', 'filingDate', 'primaryDocDescription', 'doc_url', 'cik', 'accessionNumber', 'fileNumber', 'filmNumber', 'reportDate']
 
-    exec_comp_form_data = []
+def _build_sched14a_df(frames, start_year, end_year):
+    '''
+    frames is a list of (ticker, cik, title, allForms) tuples. All companies are filtered, dated and
+    linked in one vectorized pass; rows keep the ticker order and are newest first within each ticker.
+    '''
+    if not frames:
+        return pd.DataFrame(columns=SCHED14A_COLUMNS)
 
-    for ticker in tickers_data['ticker'].tolist():
-        company_data = get_allForms(get_submissionMetadata(headers=headers, cik=get_cik(ticker=ticker, companyIdentifiers=tickers_data)))
+    forms = pd.concat([allForms for _, _, _, allForms in frames], keys=range(len(frames)), names=['position', None])
+    position = forms.index.get_level_values('position').to_numpy()
+    forms = forms.reset_index(drop=True)
+    forms['position'] = position
 
-        descriptions = ['DEF 14A', 'PREC14A', 'FORM DEF 14A', 'FORM PREC14A', 'DEFINITIVE PROXY STATEMENT']
-        pattern = '|'.join(descriptions)
-        exec_comp = company_data[company_data['form'].str.contains('14A', na=False) & company_data['primaryDocDescription'].str.contains(pattern, na=False)]
+    is_sched14a = forms['form'].str.contains('14A', na=False) & forms['primaryDocDescription'].str.contains('|'.join(SCHED14A_DESCRIPTIONS), na=False)
+    forms = forms[is_sched14a]
 
-        exec_comp.loc[:, 'filingDate'] = pd.to_datetime(exec_comp['filingDate'], errors='coerce').dt.date
-        exec_comp.loc[:, 'reportDate'] = pd.to_datetime(exec_comp['reportDate'], errors='coerce').dt.date
+    filing_date = pd.to_datetime(forms['filingDate'], errors='coerce')
+    forms = forms[filing_date.dt.year.between(start_year, end_year)].copy()
+    forms['filingDate'] = filing_date
+    forms['reportDate'] = pd.to_datetime(forms['reportDate'], errors='coerce')
 
-        exec_comp_sorted = exec_comp.sort_values(by='filingDate', ascending=False)
+    # Attach the identifiers with one positional lookup instead of a filter per row
+    position = forms['position'].to_numpy()
+    forms['ticker'] = np.array([ticker for ticker, _, _, _ in frames], dtype=object)[position]
+    forms['cik'] = np.array([cik for _, cik, _, _ in frames], dtype=object)[position]
+    forms['title'] = np.array([title for _, _, title, _ in frames], dtype=object)[position]
 
-        exec_comp_sorted['filingDate'] = pd.to_datetime(exec_comp_sorted['filingDate'], errors='coerce')
-        filtered_df = exec_comp_sorted[(exec_comp_sorted['filingDate'].notnull()) & (exec_comp_sorted['filingDate'].dt.year.between(start_year, end_year))]
+    forms['doc_url'] = ('https://www.sec.gov/Archives/edgar/data/' + forms['cik'] + '/'
+                        + forms['accessionNumber'].str.replace('-', '', regex=False) + '/' + forms['primaryDocument'])
 
-        if not filtered_df.empty:
-            most_recent_report = filtered_df.copy()
-            for idx, row in most_recent_report.iterrows():
-                row['ticker'] = ticker
-                row['title'] = tickers_data[tickers_data['ticker'] == ticker]['title'].values[0]
-                row['cik'] = tickers_data[tickers_data['ticker'] == ticker]['cik_str'].values[0]
+    forms = forms.sort_values(['position', 'filingDate'], ascending=[True, False], kind='stable')
+    forms['filingDate'] = forms['filingDate'].dt.date
+    forms['reportDate'] = forms['reportDate'].dt.date
 
-                cik = row['cik']
-                accession_number = row['accessionNumber'].replace('-','')
-                primary_document_link = row['primaryDocument']
-                
-                row['doc_url'] = f'https://www.sec.gov/Archives/edgar/data/{cik}/{accession_number}/{primary_document_link}'
-                exec_comp_form_data.append(row.to_dict())
+    return forms.reindex(columns=SCHED14A_COLUMNS).reset_index(drop=True)
 
-    exec_comp_forms_df = pd.DataFrame(exec_comp_form_data)
-    column_order = ['ticker', 'title', 'form', 'filingDate', 'primaryDocDescription', 'doc_url', 'cik', 'accessionNumber', 'fileNumber', 'filmNumber', 'reportDate']
+def _build_sched14a_df_from_index(filings, companies, start_year, end_year):
+    '''
+    filings comes from fullindex.get_sched14a_filings and companies is a list of (ticker, cik, title) tuples.
+    Rows are laid out like _build_sched14a_df. form.idx has no primary document, so doc_url is the filing's
+    index page, which names it (see fullindex.resolve_document_url).
+    '''
+    companies = pd.DataFrame(companies, columns=['ticker', 'cik', 'title'])
+    companies['position'] = np.arange(len(companies))
+    # A merge keeps one row per ticker when several tickers share a CIK, as the per-company path does
+    forms = companies.merge(filings, on='cik')
 
-    exec_comp_forms_df['filingDate'] = pd.to_datetime(exec_comp_forms_df['filingDate'], errors='coerce')
-    exec_comp_forms_df['reportDate'] = pd.to_datetime(exec_comp_forms_df['reportDate'], errors='coerce')
-    exec_comp_forms_df['filingDate'] = exec_comp_forms_df['filingDate'].dt.date
-    exec_comp_forms_df['reportDate'] = exec_comp_forms_df['reportDate'].dt.date
+    filing_date = pd.to_datetime(forms['filingDate'], errors='coerce')
+    forms = forms[filing_date.dt.year.between(start_year, end_year)].copy()
+    forms['filingDate'] = filing_date
+    forms['doc_url'] = [filing_index_url(cik, accession) for cik, accession in zip(forms['cik'], forms['accessionNumber'])]
 
-    exec_comp_forms_df = exec_comp_forms_df.reindex(columns=column_order)
+    forms = forms.sort_values(['position', 'filingDate', 'accessionNumber'], ascending=[True, False, False], kind='stable')
+    forms['filingDate'] = forms['filingDate'].dt.date
+
+    return forms.reindex(columns=SCHED14A_COLUMNS).reset_index(drop=True)
+
+def get_sched14a_df(tickers, start_year, end_year, email, max_workers=8, paginate=True, source='submissions', store=filing_store,
+                    resolve_documents=False):
+    '''
+    paginate also searches the older submissions files when filings.recent doesn't reach back to start_year.
+    source='full_index' finds the filings in EDGAR's quarterly form.idx files instead of requesting each
+    company's submissions, so any number of tickers costs at most one index download per quarter. form.idx
+    doesn't name the primary document, so doc_url is the filing index page and primaryDocDescription is empty;
+    iter_extract_text looks the document up when it needs the text. resolve_documents=True looks every
+    document up now instead, at one more request per filing, which on a wide universe is more than the
+    submissions path makes.
+    source='store' answers from the local filings store without touching the network; see sync_filings.
+    '''
+    # BRK.B, brk/b and BRK-B are one ticker, stored and looked up as EDGAR writes it
+    tickers = list(dict.fromkeys(normalize_ticker(ticker) for ticker in tickers))
+    if source == 'store':
+        return store.get_sched14a_df(tickers, start_year, end_year)
+
+    headers = {'User-Agent': email}
+    company_index = get_company_index(headers)
+
+    errors = {ticker: 'Ticker not found' for ticker in tickers if ticker not in company_index}
+    found_tickers = [ticker for ticker in tickers if ticker not in errors]
+    identifiers = [company_index.lookup(ticker) for ticker in found_tickers]
+
+    if source == 'full_index':
+        filings = get_sched14a_filings(start_year, end_year, headers)
+        companies = [(ticker, cik, title) for ticker, (cik, title) in zip(found_tickers, identifiers)]
+        exec_comp_forms_df = _build_sched14a_df_from_index(filings, companies, start_year, end_year)
+        if resolve_documents:
+            documents = get_primary_documents(exec_comp_forms_df, headers, max_workers=max_workers)
+            # A filing whose index page couldn't be read falls back to the full submission
+            exec_comp_forms_df['doc_url'] = [document[0] if document else submission_url(url) for document, url in zip(documents, exec_comp_forms_df['doc_url'])]
+            exec_comp_forms_df['primaryDocDescription'] = [document[1] if document else None for document in documents]
+        for ticker, error in errors.items():
+            print(f'Failed to retrieve filings for {ticker}: {error}')
+        exec_comp_forms_df.attrs['errors'] = errors
+        return exec_comp_forms_df
+
+    all_forms = get_allForms_for_ciks(headers, [cik for cik, _ in identifiers], start_year=start_year, end_year=end_year, paginate=paginate, max_workers=max_workers)
+
+    frames = []
+    for ticker, (cik, title), (company_data, error) in zip(found_tickers, identifiers, all_forms):
+        if error is not None:
+            errors[ticker] = str(error)
+        elif company_data is not None and not company_data.empty:
+            frames.append((ticker, cik, title, company_data))
+
+    exec_comp_forms_df = _build_sched14a_df(frames, start_year, end_year)
+
+    for ticker, error in errors.items():
+        print(f'Failed to retrieve filings for {ticker}: {error}')
+    exec_comp_forms_df.attrs['errors'] = errors
 
     return exec_comp_forms_df
 
-def extract_text(exec_comp_forms_df, email):
+def fetch_sched14a_df(tickers, start_year, end_year, email, queue=job_queue, **kwargs):
+    '''
+    Non-blocking get_sched14a_df for the Streamlit pages: starts one background job per ticker on queue,
+    reusing any job an earlier rerun started or finished for the same years, and returns right away with
+    (filings found so far, tickers still loading, {ticker: error}). A failed ticker is reported once and
+    looked up again by the next call.
+    '''
+    tickers = list(dict.fromkeys(normalize_ticker(ticker) for ticker in tickers))
+    futures = {ticker: queue.submit(('sched14a', ticker, start_year, end_year, tuple(sorted(kwargs.items()))), get_sched14a_df,
+                                       [ticker], start_year, end_year, email, **kwargs)
+               for ticker in tickers}
+    frames, pending, errors = [], [], {}
+    for ticker, future in futures.items():
+        if not future.done():
+            pending.append(ticker)
+        elif future.exception() is not None:
+            errors[ticker] = str(future.exception())
+        else:
+            frames.append(future.result())
+            errors.update(future.result().attrs.get('errors', {}))
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=SCHED14A_COLUMNS)
+    return df, pending, errors
+
+def _sync_ticker(headers, cik, last_accession, start_year, end_year):
+    submissionMetadata = get_submissionMetadata(headers=headers, cik=cik)
+    allForms = get_allForms(submissionMetadata)
+    accessions = allForms['accessionNumber'].tolist() if not allForms.empty else []
+    if last_accession is not None and last_accession in accessions:
+        # filings.recent is newest first, so everything above the last-seen accession is new
+        allForms = allForms.iloc[:accessions.index(last_accession)]
+    else:
+        # First sync, or more filings since the last one than filings.recent holds
+        allForms = get_allForms(submissionMetadata, headers=headers, start_year=start_year, end_year=end_year)
+    return allForms, accessions[0] if accessions else last_accession
+
+def sync_filings(tickers, email, start_year=2000, store=filing_store, max_workers=8):
+    '''
+    Brings the filings store up to date for each ticker. The first sync of a ticker reads its whole history back
+    to start_year; later ones only read filings.recent and keep what is newer than the last-seen accession number.
+    Returns {ticker: number of 14A filings added}.
+    '''
+    tickers = list(dict.fromkeys(normalize_ticker(ticker) for ticker in tickers))
     headers = {'User-Agent': email}
+    company_index = get_company_index(headers)
+    end_year = pd.Timestamp.now().year
+
+    companies = []
+    for ticker in tickers:
+        if ticker in company_index:
+            companies.append((ticker,) + company_index.lookup(ticker))
+        else:
+            print(f'Failed to sync {ticker}: Ticker not found')
+    store.put_companies(companies)
+    last_accessions = store.last_accessions(set(tickers))
+
+    def sync(company):
+        ticker, cik, _ = company
+        try:
+            return _sync_ticker(headers, cik, last_accessions.get(ticker), start_year, end_year), None
+        except Exception as e:
+            return None, e
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(companies)))) as executor:
+        results = list(executor.map(sync, companies))
+
+    added = {}
+    for (ticker, cik, title), (result, error) in zip(companies, results):
+        if error is not None:
+            print(f'Failed to sync {ticker}: {error}')
+            continue
+        allForms, last_accession = result
+        filings = _build_sched14a_df([(ticker, cik, title, allForms)], start_year, end_year) if not allForms.empty else pd.DataFrame(columns=SCHED14A_COLUMNS)
+        store.put_filings(filings)
+        store.set_last_accession(ticker, last_accession)
+        added[ticker] = len(filings)
+    return added
+
+# The cover page ends with the SEC's address; its spelling varies between filers
+COVER_PAGE_END = re.compile(r'Washington,?\s*D\.?\s*C\.?,?\s*20549', re.IGNORECASE)
+
+def _strip_cover_page(text):
+    match = COVER_PAGE_END.search(text)
+    return text[match.end():] if match else text
+
+def _download_document(url, headers, form=None):
+    # Filings found through the full index point at their index page until the text is needed
+    url = resolve_document_url(url, headers, form)
+    response = http_cache.get(url, headers=headers)
+    response.raise_for_status()
+    return url, response.content
+
+def _download_and_parse(url, headers, form=None):
+    url, content = _download_document(url, headers, form)
+    return _parse_document(content, url)
+
+def _parse_document(content, url, record=True):
+    text, images, tables = parse_html(content, url, record=record)
+    return {'Text': _strip_cover_page(text), 'Images': images, 'Tables': tables}
+
+def _parse_document_timed(content, url):
+    # Runs in the parse pool, so it leaves metrics alone and the parent records the returned seconds
+    start = time.perf_counter()
+    result = _parse_document(content, url, record=False)
+    return result, time.perf_counter() - start
+
+# The parse pool starts while the download threads run, and a forked worker could inherit a lock one of them
+# holds (metrics, logging, sqlite), so workers come from a fork server, or are spawned where there is none
+_PARSE_POOL_CONTEXT = multiprocessing.get_context('forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+
+def iter_extract_text(exec_comp_forms_df, email, download_workers=8, parse_workers=None, store=None):
+    '''
+    Downloads the filings on a rate-limited thread pool and parses them on a process pool as the downloads land,
+    yielding (accessionNumber, {'Text', 'Images', 'Tables'}) in completion order. parse_workers defaults to the
+    number of cores; with parse_workers=1 documents are parsed on the download threads instead. Filings already
+    in store are served from it and new ones are saved to it. Failures are printed and skipped.
+    '''
+    headers = {'User-Agent': email}
+    filings = exec_comp_forms_df.drop_duplicates('accessionNumber')
+    urls = dict(zip(filings['accessionNumber'], filings['doc_url']))
+    forms = dict(zip(filings['accessionNumber'], filings['form'])) if 'form' in filings else {}
+
+    if store is not None:
+        for accession in list(urls):
+            data = store.get_text(accession)
+            if data is not None:
+                del urls[accession]
+                yield accession, data
+    if not urls:
+        return
 
-    links = exec_comp_forms_df['doc_url'].tolist()
-    tickers = exec_comp_forms_df['ticker'].tolist()
+    parse_workers = parse_workers or os.cpu_count() or 1
+    if parse_workers <= 1:
+        fetch = lambda accession: _download_and_parse(urls[accession], headers, forms.get(accession))
+        parsers = None
+    else:
+        fetch = lambda accession: _download_document(urls[accession], headers, forms.get(accession))
+        parsers = ProcessPoolExecutor(max_workers=min(parse_workers, len(urls)), mp_context=_PARSE_POOL_CONTEXT)
 
-    data = {}
+    with ThreadPoolExecutor(max_workers=min(download_workers, len(urls))) as downloads:
+        stage = {downloads.submit(fetch, accession): (accession, 'download') for accession in urls}
+        pending = set(stage)
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    accession, step = stage.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f'Failed to extract {urls[accession]}: {e}')
+                        continue
+                    if parsers is not None and step == 'download':
+                        url, content = result
+                        parse_future = parsers.submit(_parse_document_timed, content, url)
+                        stage[parse_future] = (accession, 'parse')
+                        pending.add(parse_future)
+                        continue
+                    if step == 'parse':
+                        result, seconds = result
+                        metrics.observe('parse', seconds)
+                    if store is not None:
+                        store.put_text(accession, result['Text'], result['Images'], result['Tables'])
+                    yield accession, result
+        finally:
+            if parsers is not None:
+                parsers.shutdown(cancel_futures=True)
 
-    for idx, link in enumerate(links):
-        text, images, tables = get_text_and_images(link, headers)
-        text = text.split('Washington, D.C. 20549')[1]
-        data[tickers[idx]] = {'Text': text, 'Images': images, 'Tables': tables}
-    
-    return data
+def extract_text(exec_comp_forms_df, email, download_workers=8, parse_workers=None, store=None):
+    '''
+    Returns {accessionNumber: {'Text', 'Images', 'Tables'}} in the row order of exec_comp_forms_df.
+    '''
+    data = dict(iter_extract_text(exec_comp_forms_df, email, download_workers=download_workers, parse_workers=parse_workers, store=store))
+    return {accession: data[accession] for accession in exec_comp_forms_df['accessionNumber'] if accession in data}
@@ -0,0 +1,101 @@
+import os
+import sys
+import json
+import random
+import hashlib
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+
+# Modules live at the repository root; keep their on-disk caches out of the user's cache directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['SCHED14A_CACHE_DIR'] = tempfile.mkdtemp(prefix='sched14a-tests-')
+
+class FakeOpenAI:
+    '''
+    Minimal stand-in for the OpenAI embeddings and chat completions endpoints. Records every request body,
+    answers embeddings in shuffled order (the API only promises the index field), fails the next requests
+    with the statuses queued in failures, and tracks how many requests were in flight at once.
+    '''
+    def __init__(self, delay=0.0, reply='{"answer": "ok"}'):
+        self.delay = delay
+        self.reply = reply
+        self.requests = []
+        self.failures = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def embedding(text, dim=8):
+        digest = hashlib.sha256(text.encode('utf-8')).digest()
+        return [(byte - 128) / 128 for byte in digest[:dim]]
+
+    def handle(self, path, body):
+        with self.lock:
+            self.requests.append((path, body))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            failure = self.failures.pop(0) if self.failures else None
+        try:
+            if self.delay:
+                threading.Event().wait(self.delay)
+            if failure is not None:
+                return failure, {'error': {'message': 'try again', 'type': 'server_error'}}
+            if path.endswith('/embeddings'):
+                inputs = body['input'] if isinstance(body['input'], list) else [body['input']]
+                data = [{'object': 'embedding', 'index': i, 'embedding': self.embedding(text)} for i, text in enumerate(inputs)]
+                random.shuffle(data)
+                return 200, {'object': 'list', 'data': data, 'model': body['model'], 'usage': {'prompt_tokens': len(inputs), 'total_tokens': len(inputs)}}
+            reply = self.reply(body) if callable(self.reply) else self.reply
+            return 200, {'id': 'chatcmpl-test', 'object': 'chat.completion', 'created': 0, 'model': body['model'],
+                         'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': reply}}],
+                         'usage': {'prompt_tokens': 10, 'completion_tokens': 5, 'total_tokens': 15}}
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def bodies(self, suffix):
+        return [body for path, body in self.requests if path.endswith(suffix)]
+
+@pytest.fixture
+def openai_server():
+    fake = FakeOpenAI()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            status, payload = fake.handle(self.path, body)
+            raw = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    fake.url = f'http://127.0.0.1:{server.server_address[1]}/v1'
+    yield fake
+    server.shutdown()
+    server.server_close()
+
+class WhitespaceEncoding:
+    '''
+    Stands in for tiktoken's encodings, which are downloaded on first use: one token per word.
+    '''
+    def encode(self, text):
+        return text.split()
+
+    def decode(self, tokens):
+        return ' '.join(tokens)
+
+@pytest.fixture
+def word_tokens(monkeypatch):
+    import extractdata
+    monkeypatch.setattr(extractdata, '_get_encoding', lambda model: WhitespaceEncoding())
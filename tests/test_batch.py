@@ -0,0 +1,7 @@
+from batch import read_tickers
+
+def test_read_tickers_normalizes_and_deduplicates(tmp_path):
+    path = tmp_path / 'tickers.txt'
+    path.write_text('# Universe\nbrk.b, AAPL\n\nBRK-B  # same company\nBF/B\n')
+    # Spelled like get_sched14a_df's errors, so failed tickers are matched when checkpointing
+    assert read_tickers(path) == ['BRK-B', 'AAPL', 'BF-B']
@@ -0,0 +1,40 @@
+import asyncio
+from openai import AsyncOpenAI
+import extractdata
+from extractdata import deduplicate_chunks, chunk_text, extract_full_data_gpt_async
+
+BOILERPLATE = ('The Compensation Committee reviewed the base salary, annual bonus and long-term incentive awards '
+               'of each named executive officer for fiscal {year} against the peer group described above.')
+
+def test_exact_and_formatting_duplicates_are_dropped():
+    chunks = ['Base salary was $1,000,000.', 'base salary was $1,000,000', 'BASE  SALARY WAS 1,000,000!', 'Bonus was $2,000,000.']
+    assert deduplicate_chunks(chunks) == ['Base salary was $1,000,000.', 'Bonus was $2,000,000.']
+
+def test_near_duplicates_with_small_edits_are_dropped():
+    chunks = [BOILERPLATE.format(year=2023), BOILERPLATE.format(year=2023).replace('above', 'above.'), 'An unrelated paragraph about director fees.']
+    assert deduplicate_chunks(chunks) == [chunks[0], chunks[2]]
+    # One changed word out of thirty still shares most shingles, but not 90% of them
+    edited = BOILERPLATE.format(year=2024)
+    assert deduplicate_chunks([chunks[0], edited]) == [chunks[0], edited]
+    assert deduplicate_chunks([chunks[0], edited], threshold=0.6) == [chunks[0]]
+
+def test_different_chunks_sharing_phrases_are_kept():
+    chunks = ['The CEO received a bonus of $1,200,000 based on revenue of $5 billion.',
+              'The CFO received a bonus of $600,000 based on free cash flow of $1 billion.']
+    assert deduplicate_chunks(chunks) == chunks
+
+def test_chunk_text_packs_and_deduplicates(word_tokens):
+    blocks = [BOILERPLATE.format(year=2023), 'Salary $1,000,000.', BOILERPLATE.format(year=2023), 'Bonus $2,000,000.']
+    chunks = chunk_text(blocks, max_tokens=40)
+    assert chunks == [BOILERPLATE.format(year=2023) + ' Salary $1,000,000. Bonus $2,000,000.']
+
+def test_document_without_chunks_returns_the_error_string(openai_server, monkeypatch, word_tokens):
+    url = 'https://www.sec.gov/Archives/edgar/data/1/000000000124000001/proxy.htm'
+    monkeypatch.setattr(extractdata, 'iter_text_and_images', lambda *args, **kwargs: iter([('text', 'No numbers here.')]))
+
+    async def run():
+        async with AsyncOpenAI(api_key='test', base_url=openai_server.url, max_retries=0) as client:
+            return await extract_full_data_gpt_async(url, 'CEO pay', 'test', client=client, use_cache=False)
+
+    assert asyncio.run(run()) == f'ERROR WITH URL {url}'
+    assert openai_server.requests == []
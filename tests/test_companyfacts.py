@@ -0,0 +1,39 @@
+import pandas as pd
+import edgar
+from edgar import _companyFactsFrame, get_companyFactsDataFrame
+
+COMPANY_FACTS = {'facts': {'us-gaap': {
+    'Revenues': {'label': 'Revenues', 'units': {'USD': [
+        {'start': '2022-09-25', 'end': '2023-09-30', 'val': 383285000000, 'accn': '0000320193-23-000106', 'fy': 2023, 'fp': 'FY', 'form': '10-K', 'filed': '2023-11-03', 'frame': 'CY2023'},
+        {'start': '2023-09-24', 'end': '2024-09-28', 'val': 391035000000, 'accn': '0000320193-24-000123', 'fy': 2024, 'fp': 'FY', 'form': '10-K', 'filed': '2024-11-01'},
+    ]}},
+    'Assets': {'label': 'Assets', 'units': {'USD': [
+        {'end': '2024-09-28', 'val': 364980000000, 'accn': '0000320193-24-000123', 'fy': 2024, 'fp': 'FY', 'form': '10-K', 'filed': '2024-11-01', 'frame': 'CY2024Q3I'},
+        # Repeated in a later filing: dropped as a duplicate of (fact, end, val)
+        {'end': '2024-09-28', 'val': 364980000000, 'accn': '0000320193-25-000008', 'fy': 2025, 'fp': 'Q1', 'form': '10-Q', 'filed': '2025-01-31'},
+    ]}},
+}}}
+
+def test_facts_are_flattened():
+    df = _companyFactsFrame(COMPANY_FACTS['facts']['us-gaap'])
+    assert df.index.tolist() == [pd.Timestamp('2023-09-30'), pd.Timestamp('2024-09-28'), pd.Timestamp('2024-09-28')]
+    assert df['fact'].astype(str).tolist() == ['Revenues', 'Revenues', 'Assets']
+    assert df['val'].tolist() == [383285000000, 391035000000, 364980000000]
+    assert df['start'].tolist()[:2] == [pd.Timestamp('2022-09-25'), pd.Timestamp('2023-09-24')] and pd.isna(df['start'].iloc[2])
+    assert df['frame'].tolist() == ['CY2023', None, 'CY2024Q3I']
+    assert list(df['fact'].cat.categories) == ['Assets', 'Revenues']
+
+def test_memoized_frame_is_copied_for_each_caller(monkeypatch):
+    calls = []
+    monkeypatch.setattr(edgar, 'get_companyFactsData', lambda headers, cik: calls.append(cik) or COMPANY_FACTS)
+    monkeypatch.setattr(edgar, '_companyFactsFrames', {})
+
+    df, labels = get_companyFactsDataFrame({}, '0000320193')
+    df['val'] = 0
+    df.drop(df.index, inplace=True)
+    labels['Revenues'] = 'changed'
+
+    df, labels = get_companyFactsDataFrame({}, '0000320193')
+    assert calls == ['0000320193']
+    assert df['val'].tolist() == [383285000000, 391035000000, 364980000000]
+    assert labels == {'Revenues': 'Revenues', 'Assets': 'Assets'}
@@ -0,0 +1,76 @@
+import json
+import asyncio
+import openai
+import pytest
+from openai import AsyncOpenAI
+import extractdata
+from extractdata import _create_completion, extract_lite_data_batch_async
+from llmcache import LLMCache
+
+MESSAGES = [{'role': 'user', 'content': 'Who is the CEO?'}]
+
+def complete(server, **kwargs):
+    async def run():
+        async with AsyncOpenAI(api_key='test', base_url=server.url, max_retries=0) as client:
+            return await _create_completion(client, model='gpt-4o', messages=MESSAGES, **kwargs)
+    return asyncio.run(run())
+
+def test_transient_errors_are_retried(openai_server):
+    openai_server.failures = [500, 429, 503]
+    assert complete(openai_server, cache=None, backoff=0.001) == '{"answer": "ok"}'
+    assert len(openai_server.bodies('/chat/completions')) == 4
+
+def test_gives_up_after_retries(openai_server):
+    openai_server.failures = [500] * 3
+    with pytest.raises(openai.InternalServerError):
+        complete(openai_server, cache=None, retries=2, backoff=0.001)
+    assert len(openai_server.bodies('/chat/completions')) == 3
+
+def test_client_errors_are_not_retried(openai_server):
+    openai_server.failures = [400]
+    with pytest.raises(openai.BadRequestError):
+        complete(openai_server, cache=None, backoff=0.001)
+    assert len(openai_server.bodies('/chat/completions')) == 1
+
+def test_batch_runs_filings_concurrently_within_the_limit(openai_server, monkeypatch):
+    openai_server.delay = 0.1
+    openai_server.reply = lambda body: json.dumps({'CEO name': body['messages'][1]['content'].rsplit(':', 1)[-1].strip()})
+    monkeypatch.setenv('OPENAI_BASE_URL', openai_server.url)
+    # Each filing's R2 text is just its URL, so every completion can be matched to its filing
+    monkeypatch.setattr(extractdata, 'get_text_and_images', lambda url, headers: (url.split('/')[-2], [], []))
+    urls = [f'https://www.sec.gov/Archives/edgar/data/1/{i:018d}/proxy.htm' for i in range(12)] * 2
+
+    results = asyncio.run(extract_lite_data_batch_async(urls, 'test', {'User-Agent': 'test'}, max_concurrency=4, use_cache=False))
+
+    assert len(openai_server.bodies('/chat/completions')) == 12
+    assert 1 < openai_server.max_in_flight <= 4
+    assert results == {url: {'CEO name': url.split('/')[-2]} for url in urls}
+
+def test_completions_are_served_from_cache(openai_server, tmp_path):
+    cache = LLMCache(path=str(tmp_path / 'llm.sqlite'))
+    assert complete(openai_server, cache=cache, parse_json=True) == ('{"answer": "ok"}', {'answer': 'ok'})
+    assert complete(openai_server, cache=cache, parse_json=True) == ('{"answer": "ok"}', {'answer': 'ok'})
+    assert complete(openai_server, cache=cache) == '{"answer": "ok"}'
+    assert len(openai_server.bodies('/chat/completions')) == 1
+
+def test_unparsable_replies_are_not_cached(openai_server, tmp_path):
+    cache = LLMCache(path=str(tmp_path / 'llm.sqlite'))
+    openai_server.reply = 'Sure! Here is the JSON you asked for'
+    assert complete(openai_server, cache=cache, parse_json=True) == ('Sure! Here is the JSON you asked for', None)
+    openai_server.reply = '{"answer": "ok"}'
+    assert complete(openai_server, cache=cache, parse_json=True) == ('{"answer": "ok"}', {'answer': 'ok'})
+    assert complete(openai_server, cache=cache, parse_json=True) == ('{"answer": "ok"}', {'answer': 'ok'})
+    assert len(openai_server.bodies('/chat/completions')) == 2
+
+def test_plain_text_entries_are_parsed_for_json_callers(openai_server, tmp_path):
+    cache = LLMCache(path=str(tmp_path / 'llm.sqlite'))
+    assert complete(openai_server, cache=cache) == '{"answer": "ok"}'
+    assert complete(openai_server, cache=cache, parse_json=True) == ('{"answer": "ok"}', {'answer': 'ok'})
+    assert len(openai_server.bodies('/chat/completions')) == 1
+
+    # Text that never parses is requested again rather than replayed as a failure
+    cache = LLMCache(path=str(tmp_path / 'other.sqlite'))
+    openai_server.reply = 'not json'
+    complete(openai_server, cache=cache)
+    complete(openai_server, cache=cache, parse_json=True)
+    assert len(openai_server.bodies('/chat/completions')) == 3
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from openai import OpenAI
+from embeddingstore import EmbeddingStore
+from extractdata import get_embeddings
+
+pytestmark = pytest.mark.usefixtures('word_tokens')
+
+def client_for(server):
+    return OpenAI(api_key='test', base_url=server.url, max_retries=0)
+
+def test_batches_by_count_and_keeps_input_order(openai_server):
+    texts = [f'chunk number {i}' for i in range(10)]
+    embeddings = get_embeddings(client_for(openai_server), texts, batch_size=3, max_concurrency=4, store=None)
+
+    assert sorted(len(body['input']) for body in openai_server.bodies('/embeddings')) == [1, 3, 3, 3]
+    sent = [text for body in openai_server.bodies('/embeddings') for text in body['input']]
+    assert sorted(sent) == sorted(texts)
+    # The server answers each batch in shuffled order and batches finish in any order
+    for text, embedding in zip(texts, embeddings):
+        assert embedding.dtype == np.float32
+        np.testing.assert_allclose(embedding, openai_server.embedding(text))
+
+def test_batches_by_tokens(openai_server):
+    # Three words each, so at most two texts fit in seven tokens
+    texts = [f'word word {i}' for i in range(5)]
+    get_embeddings(client_for(openai_server), texts, batch_size=100, max_batch_tokens=7, store=None)
+    batches = sorted(body['input'] for body in openai_server.bodies('/embeddings'))
+    assert batches == [texts[0:2], texts[2:4], texts[4:5]]
+
+def test_only_missing_texts_are_sent(openai_server, tmp_path):
+    store = EmbeddingStore(directory=str(tmp_path))
+    client = client_for(openai_server)
+    first = get_embeddings(client, ['a', 'b', 'c'], store=store)
+    assert len(openai_server.bodies('/embeddings')) == 1
+
+    texts = ['c', 'd', 'a', 'e']
+    embeddings = get_embeddings(client, texts, store=store)
+    assert openai_server.bodies('/embeddings')[-1]['input'] == ['d', 'e']
+    np.testing.assert_allclose(embeddings[0], first[2])
+    for text, embedding in zip(texts, embeddings):
+        np.testing.assert_allclose(embedding, openai_server.embedding(text), rtol=1e-6)
+
+    get_embeddings(client, texts, store=store)
+    assert len(openai_server.bodies('/embeddings')) == 2
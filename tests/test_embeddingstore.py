@@ -0,0 +1,47 @@
+import os
+import threading
+import numpy as np
+from embeddingstore import EmbeddingStore
+
+def test_directory_is_created_on_first_use(tmp_path):
+    directory = tmp_path / 'embeddings'
+    store = EmbeddingStore(directory=str(directory))
+    assert store.stats()['entries'] == 0
+    assert not directory.exists()
+
+    store.put_many('model', ['a'], [[1, 0]])
+    assert os.path.exists(directory / 'index.sqlite')
+    assert store.stats()['entries'] == 1
+
+def test_put_and_get_in_order(tmp_path):
+    store = EmbeddingStore(directory=str(tmp_path))
+    store.put_many('model', ['a', 'b'], [[1, 0], [0, 1]])
+    a, missing, b = store.get_many('model', ['a', 'x', 'b'])
+    np.testing.assert_array_equal(a, [1, 0])
+    np.testing.assert_array_equal(b, [0, 1])
+    assert missing is None
+    assert store.get_many('other model', ['a']) == [None]
+
+def test_reinserted_key_points_at_the_new_vector(tmp_path):
+    store = EmbeddingStore(directory=str(tmp_path))
+    store.put_many('model', ['a', 'b'], [[1, 0], [0, 1]])
+    store.put_many('model', ['a'], [[2, 2]])
+    np.testing.assert_array_equal(store.get_many('model', ['a'])[0], [2, 2])
+    np.testing.assert_array_equal(store.get_many('model', ['b'])[0], [0, 1])
+    assert store.stats()['entries'] == 2
+
+def test_counters_are_exact_under_concurrency(tmp_path):
+    store = EmbeddingStore(directory=str(tmp_path))
+    store.put_many('model', ['a', 'b'], [[1, 0], [0, 1]])
+
+    def worker():
+        for _ in range(50):
+            store.get_many('model', ['a', 'b', 'c'])
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = store.stats()
+    assert (stats['hits'], stats['misses']) == (8 * 50 * 2, 8 * 50)
@@ -0,0 +1,46 @@
+import os
+import sys
+import datetime
+import subprocess
+import pandas as pd
+from filingstore import FilingStore
+from sched14a import get_sched14a_df, SCHED14A_COLUMNS
+
+def make_store(tmp_path):
+    store = FilingStore(path=str(tmp_path / 'filings.sqlite'))
+    store.put_companies([('BRK-B', '0001067983', 'BERKSHIRE HATHAWAY INC')])
+    store.put_filings(pd.DataFrame([{
+        'ticker': 'BRK-B', 'title': 'BERKSHIRE HATHAWAY INC', 'form': 'DEF 14A', 'filingDate': datetime.date(2024, 3, 15),
+        'primaryDocDescription': 'DEF 14A', 'doc_url': 'https://www.sec.gov/Archives/edgar/data/1067983/000119312524067012/d642316ddef14a.htm',
+        'cik': '0001067983', 'accessionNumber': '0001193125-24-067012', 'fileNumber': '001-14905', 'filmNumber': '24752019',
+        'reportDate': None}], columns=SCHED14A_COLUMNS))
+    store.set_last_accession('BRK-B', '0001193125-24-067012')
+    return store
+
+def test_store_lookups_normalize_tickers(tmp_path):
+    store = make_store(tmp_path)
+    for spelling in ('BRK-B', 'brk.b', 'BRK/B', ' Brk.B '):
+        df = get_sched14a_df([spelling], 2020, 2024, 'tests@example.com', source='store', store=store)
+        assert df['accessionNumber'].tolist() == ['0001193125-24-067012']
+        assert df.attrs['errors'] == {}
+
+def test_spellings_of_one_ticker_are_deduplicated(tmp_path):
+    store = make_store(tmp_path)
+    df = get_sched14a_df(['BRK.B', 'brk-b', 'AAPL'], 2020, 2024, 'tests@example.com', source='store', store=store)
+    assert df['ticker'].tolist() == ['BRK-B']
+    assert df.attrs['errors'] == {'AAPL': 'Ticker not in filings store'}
+
+def test_database_is_created_on_first_use(tmp_path):
+    path = tmp_path / 'store' / 'filings.sqlite'
+    store = FilingStore(path=str(path))
+    assert not path.parent.exists()
+    assert store.get_text('0001193125-24-067012') is None
+    assert os.path.exists(path)
+
+def test_importing_the_pipeline_writes_nothing(tmp_path):
+    # The module-level caches and stores open their files on first use, so a read-only checkout can import them
+    cache_dir = tmp_path / 'cache'
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, '-c', 'import sched14a, extractdata, batch'], cwd=root, check=True,
+                   env=dict(os.environ, SCHED14A_CACHE_DIR=str(cache_dir)))
+    assert not cache_dir.exists()
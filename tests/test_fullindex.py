@@ -0,0 +1,102 @@
+import os
+import datetime
+import pandas as pd
+import pytest
+import requests
+import fullindex
+from fullindex import get_quarter_filings, get_primary_documents, parse_filing_index, resolve_document_url
+from sched14a import _build_sched14a_df_from_index
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+HEADERS = {'User-Agent': 'tests@example.com'}
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name), 'rb') as f:
+        return f.read()
+
+class FakeCache:
+    def __init__(self, pages):
+        self.pages = pages
+        self.requested = []
+
+    def get(self, url, headers=None, **kwargs):
+        self.requested.append(url)
+        response = requests.Response()
+        response.url = url
+        response.status_code, response._content = self.pages.get(url, (404, b'Not Found'))
+        return response
+
+@pytest.fixture
+def edgar(monkeypatch):
+    cache = FakeCache({
+        fullindex.FORM_IDX_URL.format(year=2023, quarter=4): (200, read_fixture('form.idx')),
+        'https://www.sec.gov/Archives/edgar/data/320193/000130817924000010/0001308179-24-000010-index.htm': (200, read_fixture('def14a-index.htm')),
+    })
+    monkeypatch.setattr(fullindex, 'http_cache', cache)
+    return cache
+
+def test_form_idx_rows_are_filtered_and_parsed(edgar, tmp_path):
+    filings = get_quarter_filings(2023, 4, HEADERS, directory=str(tmp_path))
+    assert filings.to_dict('records') == [
+        {'form': 'DEF 14A', 'companyName': 'APPLE INC', 'cik': '0000320193', 'filingDate': '2024-01-11',
+         'accessionNumber': '0001308179-24-000010', 'fileName': 'edgar/data/320193/0001308179-24-000010.txt'},
+        {'form': 'DEF 14A', 'companyName': 'MICROSOFT CORP', 'cik': '0000789019', 'filingDate': '2023-10-18',
+         'accessionNumber': '0001193125-23-258654', 'fileName': 'edgar/data/789019/0001193125-23-258654.txt'},
+        {'form': 'DEF 14A', 'companyName': 'WALGREENS BOOTS ALLIANCE, INC.', 'cik': '0001618921', 'filingDate': '2023-12-01',
+         'accessionNumber': '0001308179-23-001024', 'fileName': 'edgar/data/1618921/0001308179-23-001024.txt'},
+        {'form': 'PREC14A', 'companyName': 'DISNEY WALT CO', 'cik': '0001744489', 'filingDate': '2023-12-28',
+         'accessionNumber': '0001193125-23-304367', 'fileName': 'edgar/data/1744489/0001193125-23-304367.txt'},
+    ]
+
+def test_closed_quarter_is_read_from_disk_afterwards(edgar, tmp_path):
+    first = get_quarter_filings(2023, 4, HEADERS, directory=str(tmp_path))
+    second = get_quarter_filings(2023, 4, HEADERS, directory=str(tmp_path))
+    pd.testing.assert_frame_equal(first, second)
+    assert len(edgar.requested) == 1
+
+def test_unpublished_quarters_are_skipped(edgar, tmp_path):
+    today = datetime.date.today()
+    current = (today.year, (today.month - 1) // 3 + 1)
+    for year, quarter in (current, (today.year + 1, 1)):
+        filings = get_quarter_filings(year, quarter, HEADERS, directory=str(tmp_path))
+        assert filings.empty and list(filings.columns) == fullindex.INDEX_COLUMNS
+    # Nothing is saved, so the next call checks again
+    assert os.listdir(tmp_path) == []
+
+def test_missing_closed_quarter_raises(edgar, tmp_path):
+    with pytest.raises(requests.HTTPError):
+        get_quarter_filings(2023, 3, HEADERS, directory=str(tmp_path))
+
+def test_primary_document_comes_from_the_filing_index():
+    url = 'https://www.sec.gov/Archives/edgar/data/320193/000130817924000010/0001308179-24-000010-index.htm'
+    assert parse_filing_index(read_fixture('def14a-index.htm'), url, 'DEF 14A') == (
+        'https://www.sec.gov/Archives/edgar/data/320193/000130817924000010/laap2024_def14a.htm', 'DEF 14A')
+    # Without a matching type the first document in sequence is the primary one
+    assert parse_filing_index(read_fixture('def14a-index.htm'), url, 'DEF 14A/A')[0].endswith('/laap2024_def14a.htm')
+    assert parse_filing_index(b'<html><body>No tables</body></html>', url, 'DEF 14A') is None
+
+def test_primary_documents_keep_filing_order(edgar, tmp_path):
+    filings = get_quarter_filings(2023, 4, HEADERS, directory=str(tmp_path))
+    documents = get_primary_documents(filings, HEADERS, max_workers=4)
+    assert documents[0] == ('https://www.sec.gov/Archives/edgar/data/320193/000130817924000010/laap2024_def14a.htm', 'DEF 14A')
+    # The other index pages are missing from the fake EDGAR
+    assert documents[1:] == [None, None, None]
+
+def test_index_filings_point_at_their_index_page_without_requests(edgar, tmp_path):
+    filings = get_quarter_filings(2023, 4, HEADERS, directory=str(tmp_path))
+    df = _build_sched14a_df_from_index(filings, [('AAPL', '0000320193', 'Apple Inc.')], 2023, 2024)
+    assert df['doc_url'].tolist() == ['https://www.sec.gov/Archives/edgar/data/320193/000130817924000010/0001308179-24-000010-index.htm']
+    # Only form.idx was downloaded
+    assert len(edgar.requested) == 1
+
+def test_index_page_is_resolved_when_the_document_is_needed(edgar):
+    index_url = 'https://www.sec.gov/Archives/edgar/data/320193/000130817924000010/0001308179-24-000010-index.htm'
+    assert resolve_document_url(index_url, HEADERS, 'DEF 14A') == 'https://www.sec.gov/Archives/edgar/data/320193/000130817924000010/laap2024_def14a.htm'
+    # An unreadable index page falls back to the full submission
+    missing = 'https://www.sec.gov/Archives/edgar/data/789019/000119312523258654/0001193125-23-258654-index.htm'
+    assert resolve_document_url(missing, HEADERS, 'DEF 14A') == 'https://www.sec.gov/Archives/edgar/data/789019/000119312523258654/0001193125-23-258654.txt'
+    # Primary documents from the submissions path are used as they are
+    document = 'https://www.sec.gov/Archives/edgar/data/320193/000130817924000010/laap2024_def14a.htm'
+    requested = len(edgar.requested)
+    assert resolve_document_url(document, HEADERS) == document
+    assert len(edgar.requested) == requested
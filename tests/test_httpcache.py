@@ -0,0 +1,131 @@
+import os
+import sys
+import threading
+import pytest
+import requests
+from httpcache import HttpCache
+from httpclient import HttpClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+import standin
+from standin import StandInServer
+
+class FakeClient:
+    def __init__(self):
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def get(self, url, headers=None, **kwargs):
+        with self.lock:
+            self.calls += 1
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response._content = f'body of {url}'.encode('utf-8')
+        response.headers['Content-Type'] = 'text/plain'
+        return response
+
+def test_directory_is_created_on_first_use(tmp_path):
+    directory = tmp_path / 'http'
+    cache = HttpCache(directory=str(directory), client=FakeClient())
+    assert not directory.exists()
+    assert cache.stats()['entries'] == 0
+    assert not directory.exists()
+
+    cache.get('https://www.sec.gov/Archives/edgar/data/1/a.htm')
+    assert os.path.exists(directory / 'index.sqlite')
+    assert cache.stats()['entries'] == 1
+
+def test_counters_are_exact_under_concurrency(tmp_path):
+    client = FakeClient()
+    cache = HttpCache(directory=str(tmp_path), client=client)
+    urls = [f'https://www.sec.gov/Archives/edgar/data/1/{i}.htm' for i in range(8)]
+    for url in urls:
+        cache.get(url)
+
+    def worker():
+        for _ in range(25):
+            for url in urls:
+                assert cache.get(url).content == f'body of {url}'.encode('utf-8')
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = cache.stats()
+    assert client.calls == len(urls)
+    assert stats['misses'] == len(urls)
+    assert stats['hits'] == 8 * 25 * len(urls)
+
+@pytest.fixture
+def edgar(tmp_path):
+    fixtures = tmp_path / 'fixtures'
+    server = StandInServer(str(fixtures)).start()
+    server.write = lambda url, content: standin._write(str(fixtures), url, content)
+    server.requests = lambda: sum(server.snapshot()[0].values())
+    server.client = HttpClient(rate_limiter=None, base_url=server.url)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+SUBMISSIONS_URL = 'https://data.sec.gov/submissions/CIK0000320193.json'
+ARCHIVE_URL = 'https://www.sec.gov/Archives/edgar/data/320193/000130817924000010/laap2024_def14a.htm'
+
+def test_stale_entries_are_revalidated_with_their_etag(edgar, tmp_path):
+    edgar.write(SUBMISSIONS_URL, '{"cik": "320193", "filings": 1}')
+    cache = HttpCache(directory=str(tmp_path / 'http'), fresh_for=0, client=edgar.client)
+    assert cache.get(SUBMISSIONS_URL).json() == {'cik': '320193', 'filings': 1}
+
+    # Unchanged: a 304 with no body, answered from disk
+    response = cache.get(SUBMISSIONS_URL)
+    assert response.from_cache and response.json() == {'cik': '320193', 'filings': 1}
+    assert edgar.snapshot()[1]['data.sec.gov/submissions'] == len('{"cik": "320193", "filings": 1}')
+
+    # Changed: the new body replaces the entry
+    edgar.write(SUBMISSIONS_URL, '{"cik": "320193", "filings": 2}')
+    response = cache.get(SUBMISSIONS_URL)
+    assert not response.from_cache and response.json()['filings'] == 2
+    assert cache.get(SUBMISSIONS_URL).json()['filings'] == 2
+    assert edgar.requests() == 4
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['revalidated']) == (2, 2, 2)
+
+def test_fresh_entries_are_served_without_a_request(edgar, tmp_path):
+    edgar.write(SUBMISSIONS_URL, '{}')
+    cache = HttpCache(directory=str(tmp_path / 'http'), fresh_for=600, client=edgar.client)
+    cache.get(SUBMISSIONS_URL)
+    assert cache.get(SUBMISSIONS_URL).from_cache
+    assert edgar.requests() == 1
+
+def test_archive_documents_are_never_revalidated(edgar, tmp_path):
+    body = '<html><body>' + 'Compensation Discussion and Analysis. ' * 5000 + '</body></html>'
+    edgar.write(ARCHIVE_URL, body)
+    cache = HttpCache(directory=str(tmp_path / 'http'), fresh_for=0, client=edgar.client)
+    # Streamed on the first request and written to the cache as it arrives
+    assert b''.join(cache.stream(ARCHIVE_URL, chunk_size=4096)) == body.encode('utf-8')
+    assert b''.join(cache.stream(ARCHIVE_URL, chunk_size=4096)) == body.encode('utf-8')
+    response = cache.get(ARCHIVE_URL)
+    assert response.from_cache and response.text == body
+    assert edgar.requests() == 1
+    assert cache.stats()['revalidated'] == 0
+
+def test_least_recently_used_entries_are_evicted(edgar, tmp_path):
+    urls = [f'https://www.sec.gov/Archives/edgar/data/1/{name}.htm' for name in 'abc']
+    for url in urls:
+        # Random bytes don't compress, so each entry takes about 1000 bytes
+        edgar.write(url, os.urandom(1000))
+    cache = HttpCache(directory=str(tmp_path / 'http'), max_bytes=2500, client=edgar.client)
+    a, b, c = urls
+    cache.get(a)
+    cache.get(b)
+    cache.get(a)
+    # Storing c passes the limit, and b is the least recently used
+    cache.get(c)
+    assert cache.stats()['entries'] == 2
+    assert len([name for name in os.listdir(tmp_path / 'http') if name.endswith('.z')]) == 2
+    requests_before = edgar.requests()
+    assert cache.get(a).from_cache and cache.get(c).from_cache
+    assert edgar.requests() == requests_before
+    assert not cache.get(b).from_cache
@@ -0,0 +1,87 @@
+import socket
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+import requests
+from httpclient import HttpClient
+
+class CountingLimiter:
+    def __init__(self):
+        self.urls = []
+
+    def wait(self, url=None):
+        self.urls.append(url)
+        return 0.0
+
+@pytest.fixture
+def edgar_server():
+    '''
+    Answers each GET with the next (status, headers) in responses, then with 200 once they run out.
+    '''
+    state = {'responses': [], 'requests': 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            state['requests'] += 1
+            status, headers = state['responses'].pop(0) if state['responses'] else (200, {})
+            body = b'ok' if status == 200 else b'busy'
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    state['url'] = f'http://127.0.0.1:{server.server_address[1]}'
+    yield state
+    server.shutdown()
+    server.server_close()
+
+def make_client(limiter, sleeps, **kwargs):
+    return HttpClient(rate_limiter=limiter, sleep=sleeps.append, **kwargs)
+
+def test_every_attempt_takes_a_token(edgar_server):
+    limiter, sleeps = CountingLimiter(), []
+    edgar_server['responses'] = [(503, {}), (429, {'Retry-After': '3'}), (500, {})]
+    client = make_client(limiter, sleeps, base_url=edgar_server['url'], backoff=0.5)
+    url = 'https://data.sec.gov/submissions/CIK0000320193.json'
+
+    response = client.get(url)
+    assert response.status_code == 200 and response.content == b'ok'
+    assert edgar_server['requests'] == 4
+    assert limiter.urls == [url] * 4
+    # Exponential backoff, except where the server said how long to wait
+    assert sleeps == [0.5, 3.0, 2.0]
+    assert client.latency_stats()['data.sec.gov/submissions']['count'] == 1
+
+def test_last_response_is_returned_when_retries_run_out(edgar_server):
+    limiter, sleeps = CountingLimiter(), []
+    edgar_server['responses'] = [(503, {})] * 3
+    client = make_client(limiter, sleeps, base_url=edgar_server['url'], retries=2)
+    assert client.get('https://www.sec.gov/Archives/edgar/data/1/').status_code == 503
+    assert len(limiter.urls) == 3 and len(sleeps) == 2
+
+def test_other_errors_are_not_retried(edgar_server):
+    limiter, sleeps = CountingLimiter(), []
+    edgar_server['responses'] = [(404, {})]
+    client = make_client(limiter, sleeps, base_url=edgar_server['url'])
+    assert client.get('https://www.sec.gov/missing').status_code == 404
+    assert len(limiter.urls) == 1 and sleeps == []
+
+def test_connection_errors_are_retried():
+    # A port nothing listens on
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    limiter, sleeps = CountingLimiter(), []
+    client = make_client(limiter, sleeps, base_url=f'http://127.0.0.1:{port}', retries=3, backoff=0.25, timeout=1)
+    with pytest.raises(requests.ConnectionError):
+        client.get('https://www.sec.gov/')
+    assert len(limiter.urls) == 4
+    assert sleeps == [0.25, 0.5, 1.0]
@@ -0,0 +1,68 @@
+import threading
+import pytest
+from jobqueue import JobQueue
+
+def test_running_and_finished_jobs_are_shared():
+    queue = JobQueue(max_workers=2)
+    release = threading.Event()
+    calls = []
+
+    def job(value):
+        calls.append(value)
+        release.wait(5)
+        return value * 2
+
+    first = queue.submit('key', job, 21)
+    assert queue.submit('key', job, 21) is first
+    release.set()
+    assert first.result() == 42
+    assert queue.submit('key', job, 21) is first
+    assert calls == [21]
+
+def test_failed_jobs_are_reported_once_then_run_again():
+    queue = JobQueue(max_workers=1)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError('EDGAR is down')
+        return 'ok'
+
+    failed = queue.submit('key', flaky)
+    with pytest.raises(RuntimeError):
+        failed.result()
+    # The next caller still sees the failure, so it can show it
+    assert queue.submit('key', flaky) is failed
+    retried = queue.submit('key', flaky)
+    assert retried is not failed
+    assert retried.result() == 'ok'
+    assert queue.submit('key', flaky) is retried
+    assert len(attempts) == 2
+
+def test_finished_jobs_expire():
+    queue = JobQueue(max_workers=1, ttl=0)
+    first = queue.submit('key', lambda: 1)
+    first.result()
+    assert queue.submit('key', lambda: 2).result() == 2
+
+def test_running_jobs_do_not_expire():
+    queue = JobQueue(max_workers=2, ttl=0)
+    release = threading.Event()
+    running = queue.submit('key', release.wait, 5)
+    assert queue.submit('key', release.wait, 5) is running
+    release.set()
+    running.result()
+
+def test_long_jobs_on_their_own_queue_leave_lookups_free():
+    from jobqueue import job_queue, summary_queue
+    assert summary_queue.executor is not job_queue.executor
+    release = threading.Event()
+    summaries = [summary_queue.submit(('summary', i), release.wait, 5) for i in range(8)]
+    try:
+        assert job_queue.submit(('lookup', 'test'), lambda: 'CMCSA').result(timeout=5) == 'CMCSA'
+    finally:
+        release.set()
+        job_queue.invalidate(('lookup', 'test'))
+    for summary in summaries:
+        summary.result()
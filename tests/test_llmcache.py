@@ -0,0 +1,40 @@
+import os
+import threading
+from llmcache import LLMCache
+
+def test_file_is_created_on_first_use(tmp_path):
+    path = tmp_path / 'llm' / 'responses.sqlite'
+    cache = LLMCache(path=str(path))
+    assert cache.stats()['entries'] == 0
+    assert not path.parent.exists()
+
+    cache.put('a', 'model', 'raw')
+    assert os.path.exists(path)
+    assert cache.stats()['entries'] == 1
+
+def test_put_and_get(tmp_path):
+    cache = LLMCache(path=str(tmp_path / 'llm.sqlite'))
+    messages = [{'role': 'user', 'content': 'What was the CEO paid?'}]
+    key = LLMCache.key('gpt-4o', messages, temperature=0)
+    assert cache.get(key) is None
+    cache.put(key, 'gpt-4o', '{"total": 1}', {'total': 1})
+    assert cache.get(key) == ('{"total": 1}', {'total': 1})
+    # Whitespace in the prompt doesn't change the key
+    assert LLMCache.key('gpt-4o', [{'role': 'user', 'content': '  What was the  CEO paid?\n'}], temperature=0) == key
+
+def test_counters_are_exact_under_concurrency(tmp_path):
+    cache = LLMCache(path=str(tmp_path / 'llm.sqlite'))
+    cache.put('a', 'model', 'raw')
+
+    def worker():
+        for _ in range(50):
+            cache.get('a')
+            cache.get('missing')
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (8 * 50, 8 * 50)
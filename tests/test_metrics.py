@@ -0,0 +1,82 @@
+import urllib.request
+import pandas as pd
+import pytest
+import metrics as metrics_module
+import sched14a
+from metrics import Metrics, metrics, prometheus_text, serve
+
+@pytest.fixture
+def clean_metrics():
+    metrics.reset()
+    yield metrics
+    metrics.reset()
+
+def test_histogram_buckets_are_cumulative_and_inclusive():
+    recorder = Metrics(buckets=(0.1, 1.0, 10.0))
+    for seconds in (0.05, 0.1, 0.5, 1.0, 3.0, 60.0):
+        recorder.observe('parse', seconds)
+    stats = recorder.stage_stats()['parse']
+    # An observation equal to a bound falls in that bound's bucket, as Prometheus' le does
+    assert stats['buckets'] == {0.1: 2, 1.0: 4, 10.0: 5, float('inf'): 6}
+    assert stats['count'] == 6
+    assert stats['sum'] == pytest.approx(64.65)
+    assert stats['mean'] == pytest.approx(64.65 / 6)
+
+def test_timed_iter_counts_only_time_spent_producing():
+    recorder = Metrics()
+    for _ in recorder.timed_iter('chunk', range(3)):
+        pass
+    assert recorder.stage_stats()['chunk']['count'] == 1
+
+def test_prometheus_text(clean_metrics):
+    clean_metrics.observe('parse', 0.2)
+    clean_metrics.observe('parse', 7.0)
+    clean_metrics.add('llm_tokens', 120, direction='sent', model='gpt-4o')
+    clean_metrics.add('downloaded_bytes', 10, endpoint='www.sec.gov/"Archives"')
+    lines = prometheus_text().splitlines()
+
+    assert '# TYPE sched14a_stage_duration_seconds histogram' in lines
+    assert 'sched14a_stage_duration_seconds_bucket{stage="parse",le="0.1"} 0' in lines
+    assert 'sched14a_stage_duration_seconds_bucket{stage="parse",le="0.25"} 1' in lines
+    assert 'sched14a_stage_duration_seconds_bucket{stage="parse",le="10.0"} 2' in lines
+    assert 'sched14a_stage_duration_seconds_bucket{stage="parse",le="+Inf"} 2' in lines
+    assert 'sched14a_stage_duration_seconds_sum{stage="parse"} 7.2' in lines
+    assert 'sched14a_stage_duration_seconds_count{stage="parse"} 2' in lines
+
+    assert '# HELP sched14a_llm_tokens_total Tokens sent to and received from the OpenAI API.' in lines
+    assert '# TYPE sched14a_llm_tokens_total counter' in lines
+    assert 'sched14a_llm_tokens_total{direction="sent",model="gpt-4o"} 120' in lines
+    assert 'sched14a_downloaded_bytes_total{endpoint="www.sec.gov/\\"Archives\\""} 10' in lines
+    assert '# TYPE sched14a_cache_entries gauge' in lines
+    assert any(line.startswith('sched14a_cache_hits_total{cache="http"} ') for line in lines)
+
+def test_serve_binds_localhost_by_default(monkeypatch, clean_metrics):
+    monkeypatch.setattr(metrics_module, '_server', None)
+    monkeypatch.delenv('SCHED14A_METRICS_HOST', raising=False)
+    # Port 0 picks a free port
+    monkeypatch.setenv('SCHED14A_METRICS_PORT', '0')
+    server = serve()
+    try:
+        host, port = server.server_address
+        assert host == '127.0.0.1'
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics', timeout=5) as response:
+            assert b'sched14a_stage_duration_seconds' in response.read()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_pool_parse_timings_are_recorded_in_the_parent(monkeypatch, clean_metrics):
+    filings = pd.DataFrame({'accessionNumber': ['0000000001-24-000001', '0000000001-24-000002'],
+                            'doc_url': ['https://www.sec.gov/a.htm', 'https://www.sec.gov/b.htm']})
+    monkeypatch.setattr(sched14a, '_download_document', lambda url, headers, form=None: (url, b'<html><body><p>Compensation</p></body></html>'))
+    results = dict(sched14a.iter_extract_text(filings, 'tests@example.com', parse_workers=2))
+    assert sorted(results) == list(filings['accessionNumber'])
+    assert all('Compensation' in result['Text'] for result in results.values())
+    assert metrics.stage_stats()['parse']['count'] == 2
+
+def test_parse_pool_workers_are_not_forked_and_leave_metrics_alone(clean_metrics):
+    # The pool starts while download threads hold locks, which a forked worker would inherit
+    assert sched14a._PARSE_POOL_CONTEXT.get_start_method() != 'fork'
+    result, seconds = sched14a._parse_document_timed(b'<html><body><p>Compensation</p></body></html>', 'https://www.sec.gov/a.htm')
+    assert 'Compensation' in result['Text'] and seconds > 0
+    assert 'parse' not in metrics.stage_stats()
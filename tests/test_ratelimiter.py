@@ -0,0 +1,102 @@
+import asyncio
+import threading
+import pytest
+from ratelimiter import RateLimiter, HostRateLimiter
+
+class FakeClock:
+    '''
+    Time stands still unless a test advances it; sleeps are recorded instead of taken.
+    '''
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        with self.lock:
+            self.sleeps.append(seconds)
+
+def run_concurrently(fn, n):
+    barrier = threading.Barrier(n)
+    waits = []
+    lock = threading.Lock()
+
+    def worker():
+        barrier.wait()
+        wait = fn()
+        with lock:
+            waits.append(wait)
+
+    threads = [threading.Thread(target=worker) for _ in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(waits)
+
+def test_concurrent_callers_are_spaced_evenly():
+    clock = FakeClock()
+    limiter = RateLimiter(10, 1, clock=clock, sleep=clock.sleep)
+    waits = run_concurrently(limiter.acquire, 32)
+
+    # One token up front, then one every 0.1s: the i-th caller goes at i/10 seconds
+    assert waits == pytest.approx([i / 10 for i in range(32)])
+    assert sorted(clock.sleeps) == pytest.approx(waits[1:])
+    assert limiter.calls == 32
+    assert limiter.throttled == 31
+
+def test_no_second_exceeds_the_limit():
+    clock = FakeClock()
+    limiter = RateLimiter(10, 1, clock=clock, sleep=clock.sleep)
+    starts = run_concurrently(limiter.acquire, 32)
+    for window in range(4):
+        assert sum(window <= start < window + 1 for start in starts) <= 10
+
+def test_tokens_refill_over_time():
+    clock = FakeClock()
+    limiter = RateLimiter(10, 1, burst=3, clock=clock, sleep=clock.sleep)
+    assert [limiter.acquire() for _ in range(3)] == [0, 0, 0]
+    assert limiter.acquire() == pytest.approx(0.1)
+    clock.now = 10.0
+    # Idle time refills no more than burst tokens
+    assert [limiter.acquire() for _ in range(3)] == [0, 0, 0]
+    assert limiter.acquire() == pytest.approx(0.1)
+
+def test_sec_hosts_share_one_bucket():
+    clock = FakeClock()
+    limiter = HostRateLimiter(10, 1, clock=clock, sleep=clock.sleep)
+    urls = ['https://www.sec.gov/Archives/edgar/data/320193/', 'https://data.sec.gov/submissions/CIK0000320193.json',
+            'https://efts.sec.gov/LATEST/search-index', 'https://sec.gov/files/company_tickers.json']
+    lock = threading.Lock()
+    counter = iter(range(32))
+
+    def acquire():
+        with lock:
+            url = urls[next(counter) % len(urls)]
+        return limiter.acquire(url)
+
+    waits = run_concurrently(acquire, 32)
+    assert list(limiter.buckets) == ['sec.gov']
+    assert waits == pytest.approx([i / 10 for i in range(32)])
+    assert limiter.calls == 32
+
+def test_other_hosts_get_their_own_bucket():
+    clock = FakeClock()
+    limiter = HostRateLimiter(10, 1, clock=clock, sleep=clock.sleep)
+    assert limiter.acquire('https://www.sec.gov/') == 0
+    assert limiter.acquire('https://example.com/') == 0
+    assert limiter.acquire('https://notsec.gov/') == 0
+    assert sorted(limiter.buckets) == ['example.com', 'notsec.gov', 'sec.gov']
+
+def test_async_callers_share_the_bucket():
+    clock = FakeClock()
+    limiter = RateLimiter(10, 1, clock=clock, sleep=clock.sleep)
+
+    async def main():
+        return await asyncio.gather(*[limiter.acquire_async() for _ in range(5)])
+
+    # Real asyncio sleeps here, but only 0.4s in total
+    assert sorted(asyncio.run(main())) == pytest.approx([0, 0.1, 0.2, 0.3, 0.4])
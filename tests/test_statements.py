@@ -0,0 +1,87 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from edgar import _get_statementData, _get_statementFrame, _unitMultipliers, _rowMultiplier
+
+# R2 and R4 of Apple's 10-K for fiscal 2024 (accession 0000320193-24-000123): the balance sheet in "$ in Millions"
+# and the statement of operations in "shares in Thousands, $ in Millions"
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name), 'rb') as f:
+        return f.read()
+
+def statement_frame(content):
+    columns, values, dates = _get_statementData(content)
+    return pd.DataFrame(values, index=[column.removeprefix('us-gaap_') for column in columns], columns=dates)
+
+@pytest.mark.parametrize('header, multipliers', [
+    ('$ in Millions', (1000.0, 1.0)),
+    ('$ in Thousands', (1.0, 1.0)),
+    ('shares in Thousands, $ in Millions', (1000.0, 1.0)),
+    ('shares in Millions, $ in Millions', (1000.0, 1000.0)),
+    ('In Millions, except Per Share data, unless otherwise specified', (1000.0, 1000.0)),
+    ('In Millions, except Share data in Thousands, unless otherwise specified', (1000.0, 1.0)),
+    ('In Thousands, except Share data, unless otherwise specified', (1.0, 1.0)),
+    ('USD ($)', (1.0, 1.0)),
+])
+def test_unit_multipliers(header, multipliers):
+    assert _unitMultipliers(header) == multipliers
+
+@pytest.mark.parametrize('concept, multiplier', [
+    ('us-gaap_NetIncomeLoss', 1000.0),
+    ('us-gaap_EarningsPerShareDiluted', 1.0),
+    ('us-gaap_IncomeLossFromContinuingOperationsPerBasicShare', 1.0),
+    ('us-gaap_WeightedAverageNumberOfDilutedSharesOutstanding', 2.0),
+    ('us-gaap_CommonStockSharesOutstanding', 2.0),
+    ('us-gaap_StockRepurchasedDuringPeriodShares', 2.0),
+    ('us-gaap_StockIssuedDuringPeriodSharesNewIssues', 2.0),
+    # Dollar concepts that mention shares
+    ('us-gaap_ProceedsFromIssuanceOfSharesUnderIncentiveAndShareBasedCompensationPlansIncludingStockOptions', 1000.0),
+    ('us-gaap_PaymentsRelatedToTaxWithholdingForShareBasedCompensation', 1000.0),
+    ('us-gaap_StockIssuedDuringPeriodValueShareBasedCompensation', 1000.0),
+])
+def test_row_multiplier(concept, multiplier):
+    assert _rowMultiplier(concept, 1000.0, 2.0) == multiplier
+
+def test_statement_of_operations_in_millions():
+    df = statement_frame(read_fixture('R4.htm'))
+    assert list(df.columns) == list(pd.to_datetime(['2024-09-28', '2023-09-30', '2022-09-24']))
+    fy2024 = df[pd.Timestamp('2024-09-28')]
+    # Dollar amounts in thousands
+    assert fy2024['RevenueFromContractWithCustomerExcludingAssessedTax'] == 391_035_000
+    assert fy2024['NetIncomeLoss'] == 93_736_000
+    assert df.loc['NonoperatingIncomeExpense'].tolist() == [269_000, -565_000, -334_000]
+    # Per-share amounts and share counts as stated
+    assert df.loc['EarningsPerShareBasic'].tolist() == [6.11, 6.16, 6.15]
+    assert df.loc['EarningsPerShareDiluted'].tolist() == [6.08, 6.13, 6.11]
+    assert fy2024['WeightedAverageNumberOfSharesOutstandingBasic'] == 15_343_783
+    assert np.isnan(df.loc['EarningsPerShareAbstract']).all()
+
+def test_balance_sheet_in_millions():
+    df = statement_frame(read_fixture('R2.htm'))
+    assert df.loc['Assets'].tolist() == [364_980_000, 352_583_000]
+    assert df.loc['RetainedEarningsAccumulatedDeficit'].tolist() == [-19_154_000, -214_000]
+    assert df.loc['LiabilitiesAndStockholdersEquity'].tolist() == df.loc['Assets'].tolist()
+    assert np.isnan(df.loc['CommitmentsAndContingencies']).all()
+
+def test_dollar_concepts_mentioning_shares_are_scaled_as_dollars():
+    content = read_fixture('R2.htm').replace(b'us-gaap_CommercialPaper', b'us-gaap_ProceedsFromIssuanceOfSharesUnderIncentiveAndShareBasedCompensationPlansIncludingStockOptions')
+    df = statement_frame(content)
+    assert df.loc['ProceedsFromIssuanceOfSharesUnderIncentiveAndShareBasedCompensationPlansIncludingStockOptions'].tolist() == [9_967_000, 5_985_000]
+
+def test_unless_otherwise_specified_scales_share_cells_but_not_per_share_cells():
+    # Shares are in millions like the amounts here, so they are brought to thousands too
+    content = read_fixture('R4.htm').replace(b'shares in Thousands, $ in Millions', b'In Millions, except Per Share data, unless otherwise specified')
+    df = statement_frame(content)
+    fy2024 = df[pd.Timestamp('2024-09-28')]
+    assert fy2024['RevenueFromContractWithCustomerExcludingAssessedTax'] == 391_035_000
+    assert fy2024['EarningsPerShareBasic'] == 6.11
+    assert fy2024['WeightedAverageNumberOfDilutedSharesOutstanding'] == 15_408_095_000
+
+def test_statement_frame_drops_empty_duplicate_rows():
+    df = _get_statementFrame(read_fixture('R2.htm'), '0000320193-24-000123')
+    # The abstract and commitments rows are all NaN, so only the first of them is kept
+    assert df.isna().all(axis=1).sum() == 1
+    assert df.loc['us-gaap_Assets'].tolist() == [364_980_000, 352_583_000]
@@ -0,0 +1,46 @@
+from lxml import etree
+from extractdata import _StreamingProxyHTMLTarget
+
+def parse(html, **kwargs):
+    target = _StreamingProxyHTMLTarget('https://www.sec.gov/Archives/edgar/data/1/a.htm', 1, **kwargs)
+    parser = etree.HTMLParser(target=target, huge_tree=True)
+    events = []
+    # Feed in small pieces, as iter_text_and_images does, and check what is buffered along the way
+    for start in range(0, len(html), 256):
+        parser.feed(html[start:start + 256])
+        assert sum(target.table_lengths) <= 3 * (kwargs.get('max_table_chars', 256 * 1024) + 64)
+        events.extend(target.events)
+        target.events.clear()
+    parser.close()
+    events.extend(target.events)
+    return events
+
+def rows(n, prefix='cell'):
+    return ''.join(f'<tr><td>{prefix} {i}</td></tr>' for i in range(n))
+
+def test_small_tables_come_through_as_table_events():
+    events = parse(f'<p>Intro</p><table>{rows(3)}</table><p>Outro</p>', tables_in_text=False)
+    assert events == [('text', 'Intro'), ('table', 'cell 0 cell 1 cell 2'), ('text', 'Outro')]
+
+def test_oversized_table_is_flushed_as_text():
+    events = parse(f'<p>Intro</p><table>{rows(1000)}</table><p>Outro</p>', tables_in_text=False, max_table_chars=1000)
+    assert not [value for kind, value in events if kind == 'table']
+    text = [value for kind, value in events if kind == 'text']
+    assert text[0] == 'Intro' and text[-1] == 'Outro'
+    assert '\n'.join(text[1:-1]).split('\n') == [f'cell {i}' for i in range(1000)]
+
+def test_oversized_table_with_tables_in_text_keeps_text_once():
+    events = parse(f'<table>{rows(1000)}</table>', max_table_chars=1000)
+    assert not [value for kind, value in events if kind == 'table']
+    assert '\n'.join(value for _, value in events).split('\n') == [f'cell {i}' for i in range(1000)]
+
+def test_nested_table_after_spill_is_buffered_again():
+    html = f'<table>{rows(1000)}<tr><td><table>{rows(2, "inner")}</table></td></tr></table>'
+    events = parse(html, tables_in_text=False, max_table_chars=1000)
+    assert [value for kind, value in events if kind == 'table'] == ['inner 0 inner 1']
+    assert 'inner 0' not in '\n'.join(value for kind, value in events if kind == 'text')
+
+def test_tables_beyond_max_depth_are_part_of_their_parent():
+    html = '<table><tr><td>a<table><tr><td>b<table><tr><td>c</td></tr></table></td></tr></table></td></tr></table>'
+    events = parse(html, tables_in_text=False, max_table_depth=2)
+    assert [value for kind, value in events if kind == 'table'] == ['b c', 'a b c']